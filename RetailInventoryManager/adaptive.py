@@ -0,0 +1,148 @@
+"""
+Adaptive scheduling for the sales check and sync jobs.
+
+The fixed sales_interval_minutes / sync_interval_minutes are the starting point. After every
+scheduled run the jobs ask AdaptiveSchedule for the next interval:
+- Sales check: the interval shrinks while get_orders_since keeps returning orders and backs off
+  while it returns nothing, within sales_min/max_interval_minutes.
+- Sync: the interval stretches when the previous run took a large share of it, within
+  sync_interval_minutes and sync_max_interval_minutes. A scheduled sync is delayed when the previous
+  run is still going or Fishbowl latency is elevated, unless the last good sync is already older than
+  the max interval (or there is no recorded good sync).
+"""
+
+from datetime import datetime
+import threading
+from typing import Optional
+
+from config import Config
+from data import InventoryData
+from common.Clients.Fishbowl.FishbowlSession import FISHBOWL_CALL_SECONDS
+
+# sales check interval multipliers
+SHRINK_FACTOR = 0.5
+BACKOFF_FACTOR = 1.5
+# a sync taking more than this share of its interval stretches the next interval
+SLOW_RUN_SHARE = 0.5
+
+
+class AdaptiveSchedule:
+    """
+    Computes the next run interval (in minutes) of the sales check and sync jobs.
+    Settings are read from the data config on every decision so dashboard changes apply right away.
+    """
+
+    def __init__(self, data: InventoryData = None):
+        self.data = data or InventoryData()
+        self.lock = threading.Lock()
+        self._sales_interval = None
+        self._sync_interval = None
+        self._last_sync_success = None
+        self._latency_mark = None
+        self._last_decision = None
+
+    def settings(self) -> dict:
+        config = self.data.get_config()
+        sales_interval = config.get('sales_interval_minutes', Config.SALES_INTERVAL_MINUTES)
+        sync_interval = config.get('sync_interval_minutes', Config.SYNC_INTERVAL_MINUTES)
+        return {
+            'enabled': config.get('adaptive_scheduling', Config.ADAPTIVE_SCHEDULING),
+            'sales_interval_minutes': sales_interval,
+            'sales_min_interval_minutes': min(config.get('sales_min_interval_minutes', Config.SALES_MIN_INTERVAL_MINUTES), sales_interval),
+            'sales_max_interval_minutes': max(config.get('sales_max_interval_minutes', Config.SALES_MAX_INTERVAL_MINUTES), sales_interval),
+            'sync_interval_minutes': sync_interval,
+            'sync_max_interval_minutes': max(config.get('sync_max_interval_minutes', Config.SYNC_MAX_INTERVAL_MINUTES), sync_interval),
+            'sync_delay_minutes': config.get('sync_delay_minutes', Config.SYNC_DELAY_MINUTES),
+            'fishbowl_latency_threshold_seconds': config.get('fishbowl_latency_threshold_seconds',
+                                                             Config.FISHBOWL_LATENCY_THRESHOLD_SECONDS)
+        }
+
+    def fishbowl_latency(self) -> Optional[float]:
+        '''
+        Average Fishbowl query latency (seconds) since the previous call, taken from the call metrics.
+        None when no queries ran in between.
+        '''
+        summary = FISHBOWL_CALL_SECONDS.summary(endpoint='data-query')
+        with self.lock:
+            previous = self._latency_mark or {'count': 0, 'sum': 0.0}
+            self._latency_mark = summary
+        count = summary['count'] - previous['count']
+        if count <= 0:
+            return None
+        return (summary['sum'] - previous['sum']) / count
+
+    def next_sales_interval(self, orders_found: int) -> Optional[float]:
+        ''' Returns the next sales check interval in minutes, or None when adaptive scheduling is off. '''
+        settings = self.settings()
+        if not settings['enabled']:
+            return None
+        with self.lock:
+            current = self._sales_interval or settings['sales_interval_minutes']
+            factor = SHRINK_FACTOR if orders_found > 0 else BACKOFF_FACTOR
+            self._sales_interval = min(max(current * factor, settings['sales_min_interval_minutes']),
+                                       settings['sales_max_interval_minutes'])
+            return self._sales_interval
+
+    def next_sync_interval(self, success: bool, duration_seconds: float) -> Optional[float]:
+        ''' Returns the next sync interval in minutes, or None when adaptive scheduling is off. '''
+        settings = self.settings()
+        if not settings['enabled']:
+            return None
+        with self.lock:
+            if success:
+                self._last_sync_success = datetime.now()
+            base = settings['sync_interval_minutes']
+            duration_minutes = duration_seconds / 60
+            interval = base
+            if duration_minutes > base * SLOW_RUN_SHARE:
+                interval = duration_minutes / SLOW_RUN_SHARE
+            self._sync_interval = min(interval, settings['sync_max_interval_minutes'])
+            return self._sync_interval
+
+    def last_sync_success(self) -> Optional[datetime]:
+        ''' Last good sync seen by this process, seeded from the data config (last_sync_run) after a restart. '''
+        with self.lock:
+            if self._last_sync_success is None:
+                last_run = self.data.get_config().get('last_sync_run')
+                if last_run:
+                    self._last_sync_success = datetime.fromisoformat(last_run)
+            return self._last_sync_success
+
+    def sync_decision(self, previous_running: bool) -> tuple:
+        '''
+        Decides whether a scheduled sync should run now.
+        Returns (run, delay_minutes, reason). delay_minutes is how long to postpone when run is False.
+        '''
+        settings = self.settings()
+        if not settings['enabled']:
+            return True, None, 'adaptive scheduling disabled'
+
+        latency = self.fishbowl_latency()
+        last_success = self.last_sync_success()
+        # no recorded good sync at all counts as overdue, so a latency delay can never hold the sync back for good
+        overdue = last_success is None or \
+            (datetime.now() - last_success).total_seconds() / 60 >= settings['sync_max_interval_minutes']
+
+        if previous_running:
+            decision = (False, settings['sync_delay_minutes'], 'previous sync is still running')
+        elif latency is not None and latency > settings['fishbowl_latency_threshold_seconds'] and not overdue:
+            decision = (False, settings['sync_delay_minutes'],
+                        f'Fishbowl latency is elevated ({latency:.1f}s average per query)')
+        else:
+            decision = (True, None, 'ok')
+        with self.lock:
+            self._last_decision = {'at': datetime.now().isoformat(), 'run': decision[0], 'reason': decision[2]}
+        return decision
+
+    def get_state(self) -> dict:
+        ''' Current adaptive intervals and settings, for the job status endpoints. '''
+        settings = self.settings()
+        last_success = self.last_sync_success()
+        with self.lock:
+            return {
+                'settings': settings,
+                'sales_interval_minutes': self._sales_interval or settings['sales_interval_minutes'],
+                'sync_interval_minutes': self._sync_interval or settings['sync_interval_minutes'],
+                'last_sync_success': last_success.isoformat() if last_success else None,
+                'last_sync_decision': self._last_decision
+            }
@@ -1,20 +1,36 @@
-from flask import Flask, render_template, request, jsonify, session, redirect, url_for, flash
+from flask import Flask, render_template, request, jsonify, session, redirect, url_for, flash, Response, stream_with_context
 from functools import wraps
-from apscheduler.schedulers.background import BackgroundScheduler
 from datetime import datetime
+import csv
+import hmac
+import io
 import logging
 
 from config import Config
-from data import InventoryData, ErrorLogger
+from data import InventoryData, ErrorLogger, SyncCheckpoint, JobHistory
 from sync import FishbowlSync
+from metrics import instrument_app, render_metrics, CONTENT_TYPE
+from job_ids import SYNC_JOB_ID, SALES_JOB_ID, CATALOG_JOB_ID
+from profiling import sample_stacks, ProfilerBusy
+from worker_client import WorkerClient, WorkerUnavailable
+from bulkhead import Bulkhead, BulkheadRejected
+from feed import InventoryFeed
+from exports import EXPORTS, FORMATS, stream_export
 
 app = Flask(__name__)
 app.config.from_object(Config)
+instrument_app(app)
 
 # Initialize
 data = InventoryData()
 error_logger = ErrorLogger()
+sync_checkpoint = SyncCheckpoint()
+job_history = JobHistory()
 sync_manager = FishbowlSync()
+inventory_feed = InventoryFeed(data)
+# caps the request threads that can be waiting on Fishbowl, the rest of the dashboard stays responsive
+fishbowl_bulkhead = Bulkhead('fishbowl', Config.FISHBOWL_WEB_MAX_CONCURRENT, Config.FISHBOWL_WEB_MAX_QUEUE,
+                             Config.FISHBOWL_WEB_TIMEOUT_SECONDS)
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
@@ -22,132 +38,45 @@ logger = logging.getLogger(__name__)
 
 
 # ------------------------------ background scheduler --------------------------------- #
-scheduler = BackgroundScheduler()
-SYNC_JOB = None
-SALES_JOB = None
+# The sync and sales jobs run in the scheduler worker process (worker.py), the web process only talks
+# to it over IPC. In elected mode the web process that wins the leader election runs them, in embedded
+# mode the web process owns the scheduler. Either way they are started by start_scheduler(), importing
+# the app never starts the jobs.
+if Config.SCHEDULER_MODE == 'embedded':
+    from worker import JobRunner
+    job_runner = JobRunner()
+else:
+    job_runner = WorkerClient()
+
+def start_scheduler():
+    """Starts the embedded scheduler or joins the leader election. In worker mode the worker process owns the jobs"""
+    if Config.SCHEDULER_MODE == 'embedded':
+        job_runner.start()
+    elif Config.SCHEDULER_MODE == 'elected':
+        from worker import start_elected
+        start_elected()
 
 def remove_job(job_name:str) -> bool:
-    """ removes the job from the default store. """
-    job_removed = False
-    global SYNC_JOB
-    global SALES_JOB
-    
-    if job_name == "fishbowl_sales":
-            if scheduler.get_job('fishbowl_sales') is not None:
-                    # attempt both methods to remove the job if not init
-                    try:
-                        scheduler.remove_job('fishbowl_sales', 'default')
-                        job_removed = True
-                    except:
-                        try:
-                            SALES_JOB.remove()
-                            job_removed = True
-                        except Exception as e:
-                            print(f"\n WARNING UNABLE TO REMOVE THE SALES JOB: {e} \n ")
-                            error_logger.log_error(
-                                error_type='scheduler_error',
-                                message=f"Failed to remove sales job: {str(e)}",
-                                source='app.py:remove_job',
-                                details={'job_name': 'fishbowl_sales', 'error': str(e)}
-                            )
-            else:
-                job_removed = True
-
-    else:
-            if scheduler.get_job('fishbowl_sync') is not None:
-                # attempt both methods to remove the job if not init
-                try:
-                    scheduler.remove_job('fishbowl_sync', 'default')
-                    job_removed = True
-                except:
-                    try:
-                        SYNC_JOB.remove()
-                        job_removed = True
-                    except Exception as e:
-                        print(f"\n WARNING UNABLE TO REMOVE THE PREVIOUS SYNC JOB: {e} \n ")
-                        error_logger.log_error(
-                            error_type='scheduler_error',
-                            message=f"Failed to remove sync job: {str(e)}",
-                            source='app.py:remove_job',
-                            details={'job_name': 'fishbowl_sync', 'error': str(e)}
-                        )
-            else:
-                job_removed = True
-
-    return job_removed
-
-def get_sync_interval():
-    """Dynamically get sync interval from config"""
-    config = data.get_config()
-    return config.get('sync_interval_minutes', Config.SYNC_INTERVAL_MINUTES)
-
-def get_sales_interval():
-    """Dynamically get sales check interval from config"""
-    config = data.get_config()
-    return config.get('sales_interval_minutes', Config.SALES_INTERVAL_MINUTES)
+    """ removes the job from the persistent job store. """
+    try:
+        return job_runner.remove_job(job_name)
+    except Exception as e:
+        print(f"\n WARNING UNABLE TO REMOVE THE {job_name} JOB: {e} \n ")
+        error_logger.log_error(
+            error_type='scheduler_error',
+            message=f"Failed to remove job {job_name}: {str(e)}",
+            source='app.py:remove_job',
+            details={'job_name': job_name, 'error': str(e)}
+        )
+        return False
 
 def reschedule_sync():
-    """Reschedule the sync job with new interval"""
-
-    # attempt both methods to remove the job if not init
-    global SYNC_JOB
-    job_removed = remove_job("fishbowl_sync")
-    
-    # create a new job in the scheduler. Allows init to create the first job.
-    if not SYNC_JOB or job_removed is True:
-        interval = get_sync_interval()
-        job = scheduler.add_job(
-            func=sync_manager.determine_sync,
-            trigger='interval',
-            minutes=interval,
-            id='fishbowl_sync',
-            name='Sync Fishbowl inventory',
-            replace_existing=True
-        )
-        logger.info(f"Sync job scheduled with {interval} minute interval")
-        # return the new job only if the previous was removed. 
-        scheduler.print_jobs()
-        print('\n')
-        return job
-    else:
-        # return the existing job.
-        print(" \n WARNING UNABLE TO REMOVE THE PREVIOUS SYNC JOB SCHEDULE \n ")
-        return SYNC_JOB
+    """Reschedule the sync job with the interval from the config. Returns the interval"""
+    return job_runner.reschedule(SYNC_JOB_ID)
 
 def reschedule_sales():
-    """Reschedule the sync job with new interval"""
-
-    # attempt both methods to remove the job if not init
-    global SALES_JOB
-    job_removed = remove_job("fishbowl_sales")
-    
-    # create a new job in the scheduler. Allows init to create the first job.
-    if not SALES_JOB or job_removed is True:
-        interval = get_sales_interval()
-        job = scheduler.add_job(
-            func=sync_manager.run_sales_check,
-            trigger='interval',
-            minutes=interval,
-            id='fishbowl_sales',
-            name='Sync Fishbowl Sales',
-            replace_existing=True
-        )
-        logger.info(f"Sales check job scheduled with {interval} minute interval")
-        # return the new job only if the previous was removed. 
-        return job
-    else:
-        # return the existing job.
-        print(" \n WARNING UNABLE TO REMOVE THE PREVIOUS SALES JOB SCHEDULE \n ")
-        return SALES_JOB
-
-# Initial schedule
-config = data.get_config()
-mode = config["inventory_method"]
-# only enabling the sales job on start if method is manual.
-if mode == 'manual':
-    SALES_JOB = reschedule_sales()
-SYNC_JOB = reschedule_sync()
-scheduler.start()
+    """Reschedule the sales check job with the interval from the config. Returns the interval"""
+    return job_runner.reschedule(SALES_JOB_ID)
 
 # ---------------------------------- Routes ------------------------------------------- #
 
@@ -160,6 +89,15 @@ def login_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+# Admin only decorator, use after login_required
+def admin_required(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if session.get('username') != Config.ADMIN_USERNAME:
+            return jsonify({'error': 'Admin access required'}), 403
+        return f(*args, **kwargs)
+    return decorated_function
+
 @app.route('/login', methods=['GET', 'POST'])
 def login():
     if request.method == 'POST':
@@ -193,19 +131,17 @@ def logout():
 def index():
     skus = data.get_all_skus()
     config = data.get_config()
-
-    # Calculate stats
-    total_skus = len(skus)
-    sold_out = sum(1 for s in skus.values() if s['available_qty'] <= 0)
-    low_stock = sum(1 for s in skus.values() if 0 < s['available_qty'] <= 10)
+    inventory_stats = data.get_stats()
 
     return render_template('index.html',
                          skus=skus,
                          config=config,
                          stats={
-                             'total': total_skus,
-                             'sold_out': sold_out,
-                             'low_stock': low_stock
+                             'total': inventory_stats['total_skus'],
+                             'sold_out': inventory_stats['sold_out'],
+                             'low_stock': inventory_stats['low_stock'],
+                             'sold_out_threshold': inventory_stats['sold_out_threshold'],
+                             'low_stock_threshold': inventory_stats['low_stock_threshold']
                          })
 
 @app.route('/how-to')
@@ -253,6 +189,33 @@ def api_update_config():
             updates['sales_interval_minutes'] = interval
             requires_restart = True
             logger.info(f"Sales interval changed to: {interval} minutes by {session.get('username')}")
+
+        for threshold in ['sold_out_threshold', 'low_stock_threshold']:
+            if threshold in req_data:
+                updates[threshold] = int(req_data[threshold])
+
+        if 'sales_ingestion_mode' in req_data:
+            if req_data['sales_ingestion_mode'] not in ['timestamp', 'watermark']:
+                return jsonify({'error': 'Invalid sales ingestion mode'}), 400
+            updates['sales_ingestion_mode'] = req_data['sales_ingestion_mode']
+
+        if 'adaptive_scheduling' in req_data:
+            updates['adaptive_scheduling'] = str(req_data['adaptive_scheduling']).lower() == 'true'
+
+        for bound in ['sales_min_interval_minutes', 'sales_max_interval_minutes', 'sync_max_interval_minutes', 'sync_delay_minutes']:
+            if bound in req_data:
+                value = int(req_data[bound])
+                if value < 1 or value > 1440:
+                    return jsonify({'error': f'{bound} must be between 1 and 1440 minutes'}), 400
+                updates[bound] = value
+
+        if 'fishbowl_latency_threshold_seconds' in req_data:
+            updates['fishbowl_latency_threshold_seconds'] = float(req_data['fishbowl_latency_threshold_seconds'])
+
+        sold_out_threshold = updates.get('sold_out_threshold', data.get_stats()['sold_out_threshold'])
+        low_stock_threshold = updates.get('low_stock_threshold', data.get_stats()['low_stock_threshold'])
+        if low_stock_threshold < sold_out_threshold:
+            return jsonify({'error': 'Low stock threshold must be greater than or equal to the sold out threshold'}), 400
         
         data.update_config(updates)
         
@@ -278,8 +241,7 @@ def api_update_config():
 @login_required
 def api_reschedule_sales():
     try:
-        reschedule_sales()
-        interval = get_sales_interval()
+        interval = reschedule_sales()
         return jsonify({
             'success': True,
             'message': f'Sales check rescheduled to run every {interval} minutes'
@@ -300,8 +262,7 @@ def api_reschedule_sales():
 @login_required
 def api_reschedule_sync():
     try:
-        reschedule_sync()
-        interval = get_sync_interval()
+        interval = reschedule_sync()
         return jsonify({
             'success': True,
             'message': f'Sync rescheduled to run every {interval} minutes'
@@ -322,7 +283,7 @@ def api_reschedule_sync():
 @login_required
 def api_remove_job():
     try:
-        result = remove_job('fishbowl_sales')
+        result = remove_job(SALES_JOB_ID)
 
         return jsonify({
             'success': True,
@@ -388,6 +349,142 @@ def api_add_sku():
         )
         return jsonify({'error': str(e)}), 500
 
+def _read_bulk_rows() -> list:
+    """Reads the bulk import rows from an uploaded CSV file, a text/csv body or a JSON list"""
+    upload = request.files.get('file')
+    if upload is not None:
+        text = upload.read().decode('utf-8-sig')
+    elif request.mimetype == 'text/csv':
+        text = request.get_data(as_text=True)
+    else:
+        req_data = request.get_json()
+        return req_data if isinstance(req_data, list) else (req_data or {}).get('skus', [])
+
+    reader = csv.DictReader(io.StringIO(text))
+    return [{(key or '').strip().lower(): (value or '').strip() for key, value in row.items()} for row in reader]
+
+@app.route('/api/skus/bulk', methods=['POST'])
+@login_required
+def api_bulk_add_skus():
+    """
+    Bulk SKU onboarding. Accepts a CSV (upload field 'file' or a text/csv body) or a JSON list of
+    {sku, product_name, available_qty, notes}. Every SKU is validated against Fishbowl in bulk and all
+    valid SKUs are added in one data store write. ?dry_run=true validates without adding.
+    Returns a result per row.
+    """
+    try:
+        rows = _read_bulk_rows()
+        if not rows:
+            return jsonify({'error': 'No SKUs provided'}), 400
+        if len(rows) > Config.BULK_IMPORT_MAX_ROWS:
+            return jsonify({'error': f'At most {Config.BULK_IMPORT_MAX_ROWS} SKUs per import'}), 400
+        dry_run = request.args.get('dry_run', 'false').lower() == 'true'
+
+        existing_skus = data.get_all_skus()
+        results = []
+        candidates = {}
+        for index, row in enumerate(rows, start=1):
+            sku = str(row.get('sku') or '').strip().upper()
+            product_name = str(row.get('product_name') or '').strip()
+            result = {'row': index, 'sku': sku, 'status': 'invalid', 'message': None}
+            results.append(result)
+
+            if not sku or not product_name:
+                result['message'] = 'SKU and product name required'
+                continue
+            try:
+                available_qty = int(row.get('available_qty') or 0)
+            except (TypeError, ValueError):
+                result['message'] = f"Invalid quantity {row.get('available_qty')}"
+                continue
+            if sku in candidates:
+                result['status'] = 'duplicate'
+                result['message'] = f"Duplicate of row {candidates[sku]['row']}"
+                continue
+            if sku in existing_skus:
+                result['status'] = 'exists'
+                result['message'] = 'SKU already exists'
+                continue
+
+            candidates[sku] = {
+                'row': index,
+                'sku': sku,
+                'product_name': product_name,
+                'available_qty': available_qty,
+                'notes': str(row.get('notes') or '').strip()
+            }
+
+        # answer from the catalog mirror first, only unknown SKUs go to Fishbowl
+        catalog = sync_manager.catalog
+        found = {}
+        unresolved = []
+        for sku in candidates:
+            record = catalog.lookup(sku)
+            if record is not None:
+                if record['product_active'] and record['part_active']:
+                    found[sku] = {'part_num': record['part_num'], 'is_serialized': record['is_serialized']}
+            elif not catalog.is_known_miss(sku):
+                unresolved.append(sku)
+
+        if unresolved:
+            validation = fishbowl_bulkhead.call(sync_manager.get_skus_info, unresolved,
+                                                timeout=Config.BULK_IMPORT_TIMEOUT_SECONDS)
+            if not validation['success']:
+                return jsonify({'success': False, 'error': validation['message']}), 503
+            found.update(validation['found'])
+            for sku in unresolved:
+                if sku not in found:
+                    catalog.remember_miss(sku)
+
+        valid_rows = []
+        for sku, candidate in candidates.items():
+            result = results[candidate['row'] - 1]
+            if sku not in found:
+                result['status'] = 'not_found'
+                result['message'] = f'Did not find {sku} as an active part and product in Fishbowl.'
+                continue
+            candidate['sn_flag'] = found[sku]['is_serialized']
+            candidate['part_num'] = found[sku]['part_num']
+            result['status'] = 'valid'
+            valid_rows.append(candidate)
+
+        if valid_rows and not dry_run:
+            outcome = data.add_skus(valid_rows, modified_by=session.get('username', 'unknown'))
+            for candidate in valid_rows:
+                result = results[candidate['row'] - 1]
+                if candidate['sku'] in outcome['added']:
+                    result['status'] = 'added'
+                else:
+                    result['status'] = 'exists'
+                    result['message'] = 'SKU already exists'
+            logger.info(f"Bulk import of {len(outcome['added'])} SKUs by {session.get('username')}")
+
+        added = sum(1 for result in results if result['status'] == 'added')
+        return jsonify({
+            'success': True,
+            'dry_run': dry_run,
+            'added': added,
+            'valid': sum(1 for result in results if result['status'] in ('valid', 'added')),
+            'rejected': sum(1 for result in results if result['status'] not in ('valid', 'added')),
+            'results': results
+        })
+
+    except BulkheadRejected as e:
+        logger.warning(f"Bulk SKU import rejected: {e}")
+        response = jsonify({'success': False, 'error': str(e)})
+        response.headers['Retry-After'] = '5'
+        return response, 503
+    except Exception as e:
+        logger.error(f"Error in bulk SKU import: {e}")
+        error_logger.log_error(
+            error_type='api_error',
+            message=f"Failed to bulk import SKUs: {str(e)}",
+            source='app.py:api_bulk_add_skus',
+            details={'error': str(e)},
+            user=session.get('username', 'unknown')
+        )
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/sku-check', methods=['POST'])
 @login_required
 def api_sku_check():
@@ -398,9 +495,15 @@ def api_sku_check():
         if not sku:
             return jsonify({'error': 'SKU and product name required'}), 400
         
-        result = sync_manager.get_sku_info(sku)
+        # served from the catalog mirror, Fishbowl is only asked (inside the bulkhead) on a miss
+        result = sync_manager.check_sku(sku, fallback=lambda sku: fishbowl_bulkhead.call(sync_manager.get_sku_info, sku))
         return jsonify(result)
 
+    except BulkheadRejected as e:
+        logger.warning(f"SKU check for {sku} rejected: {e}")
+        response = jsonify({'success': False, 'validated_sku': False, 'error': str(e), 'message': str(e)})
+        response.headers['Retry-After'] = '5'
+        return response, 503
     except Exception as e:
         logger.error(f"Error validating new SKU: {e}")
         error_logger.log_error(
@@ -412,6 +515,43 @@ def api_sku_check():
         )
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/catalog', methods=['GET'])
+@login_required
+def api_get_catalog():
+    """Catalog mirror status, ?prefix=ABC returns the active SKUs starting with ABC"""
+    try:
+        prefix = request.args.get('prefix', '').strip().upper()
+        limit = min(request.args.get('limit', 20, type=int), 200)
+        return jsonify({
+            'success': True,
+            'stats': sync_manager.catalog.get_stats(),
+            'matches': sync_manager.catalog.search(prefix, limit=limit) if prefix else []
+        })
+    except Exception as e:
+        logger.error(f"Error fetching catalog: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/catalog/refresh', methods=['POST'])
+@login_required
+def api_refresh_catalog():
+    """Runs the catalog refresh job now"""
+    try:
+        result = job_runner.run_job(CATALOG_JOB_ID)
+        return jsonify(result)
+    except WorkerUnavailable as e:
+        logger.error(f"Error refreshing catalog: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 503
+    except Exception as e:
+        logger.error(f"Error refreshing catalog: {e}")
+        error_logger.log_error(
+            error_type='api_error',
+            message=f"Failed to refresh catalog: {str(e)}",
+            source='app.py:api_refresh_catalog',
+            details={'error': str(e)},
+            user=session.get('username', 'unknown')
+        )
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 @app.route('/api/skus/<sku>', methods=['PUT'])
 @login_required
 def api_update_sku(sku):
@@ -473,8 +613,11 @@ def api_delete_sku(sku):
 @login_required
 def api_sync():
     try:
-        result = sync_manager.determine_sync()
+        result = job_runner.run_job(SYNC_JOB_ID)
         return jsonify(result)
+    except WorkerUnavailable as e:
+        logger.error(f"Error triggering sync: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 503
     except Exception as e:
         logger.error(f"Error triggering sync: {e}")
         error_logger.log_error(
@@ -490,8 +633,11 @@ def api_sync():
 @login_required
 def api_check():
     try:
-        result = sync_manager.run_sales_check()
+        result = job_runner.run_job(SALES_JOB_ID)
         return jsonify(result)
+    except WorkerUnavailable as e:
+        logger.error(f"Error triggering sales check: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 503
     except Exception as e:
         logger.error(f"Error triggering sales check: {e}")
         error_logger.log_error(
@@ -507,13 +653,159 @@ def api_check():
 @login_required
 def api_status():
     config = data.get_config()
+    webhooks = None
+    try:
+        scheduler_status = job_runner.status()
+        scheduler_running = scheduler_status['running']
+        webhooks = scheduler_status.get('webhooks')
+        scheduler_error = None
+    except Exception as e:
+        scheduler_running = False
+        scheduler_error = str(e)
     return jsonify({
         'last_sync_run': config.get('last_sync_run'),
         'sync_interval_minutes': config.get('sync_interval_minutes'),
-        'scheduler_running': scheduler.running
+        'scheduler_mode': Config.SCHEDULER_MODE,
+        'scheduler_running': scheduler_running,
+        'scheduler_error': scheduler_error,
+        'fishbowl_bulkhead': fishbowl_bulkhead.state(),
+        'sync_checkpoint': sync_checkpoint.get_status(),
+        'webhooks': webhooks
     })
 
 
+@app.route('/api/stats', methods=['GET'])
+@login_required
+def api_get_stats():
+    """Get the materialized inventory and error stats"""
+    try:
+        return jsonify({
+            'success': True,
+            'inventory': data.get_stats(),
+            'errors': error_logger.get_stats()
+        })
+    except Exception as e:
+        logger.error(f"Error fetching stats: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """
+    Prometheus scrape endpoint. Requires 'Authorization: Bearer <METRICS_TOKEN>', without a configured token
+    only scrapes from the local machine are answered.
+    ?process=worker returns the scheduler worker's metrics (job, sync phase and Fishbowl metrics).
+    """
+    if Config.METRICS_TOKEN:
+        token = request.headers.get('Authorization', '').removeprefix('Bearer ')
+        if not hmac.compare_digest(token.encode(), Config.METRICS_TOKEN.encode()):
+            return Response('Unauthorized\n', status=401, mimetype='text/plain')
+    elif request.remote_addr not in ('127.0.0.1', '::1'):
+        return Response('Forbidden: set METRICS_TOKEN to scrape from another host\n', status=403, mimetype='text/plain')
+    if request.args.get('process') == 'worker':
+        try:
+            return Response(job_runner.metrics(), content_type=CONTENT_TYPE)
+        except WorkerUnavailable as e:
+            return Response(f'{e}\n', status=503, mimetype='text/plain')
+    return Response(render_metrics(), content_type=CONTENT_TYPE)
+
+
+def _feed_authorized() -> bool:
+    token = request.headers.get('Authorization', '').removeprefix('Bearer ')
+    return any(hmac.compare_digest(token.encode(), allowed.encode()) for allowed in Config.FEED_TOKENS)
+
+
+@app.route('/feed/inventory', methods=['GET'])
+def feed_inventory():
+    """
+    Read-only inventory feed for downstream consumers. Requires 'Authorization: Bearer <token>' with one of
+    FEED_TOKENS. Returns the full snapshot, or with ?since=<version> only the SKUs changed / deleted after
+    that version. The inventory version is the ETag, so If-None-Match polls answer 304 until something changes.
+    """
+    if not Config.FEED_TOKENS:
+        return jsonify({'error': 'Inventory feed is not enabled'}), 404
+    if not _feed_authorized():
+        return jsonify({'error': 'Unauthorized'}), 401
+    try:
+        since = request.args.get('since')
+        try:
+            since = int(since) if since not in (None, '') else None
+        except ValueError:
+            return jsonify({'error': 'since must be an inventory version number'}), 400
+
+        version, body = inventory_feed.get(since)
+        etag = f'"{version}"'
+        headers = {'ETag': etag, 'Cache-Control': 'no-cache', 'Vary': 'Accept-Encoding'}
+        if request.headers.get('If-None-Match') == etag:
+            return Response(status=304, headers=headers)
+        if body.gzipped is not None and 'gzip' in request.accept_encodings:
+            headers['Content-Encoding'] = 'gzip'
+            return Response(body.gzipped, mimetype='application/json', headers=headers)
+        return Response(body.body, mimetype='application/json', headers=headers)
+    except Exception as e:
+        logger.error(f"Error serving the inventory feed: {e}")
+        error_logger.log_error(
+            error_type='feed_error',
+            message=f"Failed to serve the inventory feed: {str(e)}",
+            source='app.py:feed_inventory',
+            details={'error': str(e)}
+        )
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/admin/profile', methods=['POST'])
+@login_required
+@admin_required
+def api_profile():
+    """
+    Profile the running server or a single sync run and return the text report.
+    ?target=server&seconds=N samples every thread's stack for N seconds (max 60).
+    ?target=sync runs one sync under cProfile.
+    """
+    try:
+        target = request.args.get('target', 'server')
+        if target == 'server':
+            seconds = request.args.get('seconds', 10, type=float)
+            report = sample_stacks(seconds)
+        elif target == 'sync':
+            result, report = job_runner.profile_job(SYNC_JOB_ID)
+            report = f"Sync result: {result}\n\n{report}"
+        else:
+            return jsonify({'error': "target must be 'server' or 'sync'"}), 400
+
+        logger.info(f"Profile of {target} taken by {session.get('username')}")
+        return Response(report, mimetype='text/plain')
+    except ProfilerBusy as e:
+        return jsonify({'error': str(e)}), 409
+    except Exception as e:
+        logger.error(f"Error profiling {request.args.get('target')}: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/jobs/history', methods=['GET'])
+@login_required
+def api_get_job_history():
+    """Get the run history of the scheduled jobs, with per job summary stats"""
+    try:
+        limit = request.args.get('limit', 50, type=int)
+        job_id = request.args.get('job_id')
+
+        try:
+            status = job_runner.status()
+        except WorkerUnavailable as e:
+            status = {'jobs': [], 'adaptive': None, 'error': str(e)}
+
+        return jsonify({
+            'success': True,
+            'history': job_history.get_history(limit=limit, job_id=job_id),
+            'summary': job_history.get_summary(),
+            'adaptive': status['adaptive'],
+            'scheduled': status['jobs'],
+            'scheduler_error': status.get('error')
+        })
+    except Exception as e:
+        logger.error(f"Error fetching job history: {e}")
+        return jsonify({'error': str(e)}), 500
 
 # Error log endpoints
 @app.route('/api/errors', methods=['GET'])
@@ -694,6 +986,41 @@ def api_clear_logs():
         logger.error(f"Error clearing audit logs: {e}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/export/<name>', methods=['GET'])
+@login_required
+def api_export(name):
+    """
+    Streams the skus, logs (audit log) or errors export. ?format=csv (default) or ndjson, ?gzip=true to
+    compress, ?unresolved_only=true for the errors export.
+    """
+    fmt = request.args.get('format', 'csv')
+    compress = request.args.get('gzip') == 'true'
+    if name not in EXPORTS:
+        return jsonify({'error': f'Unknown export {name}, expected one of {", ".join(EXPORTS)}'}), 404
+    if fmt not in FORMATS:
+        return jsonify({'error': f'Unknown format {fmt}, expected one of {", ".join(FORMATS)}'}), 400
+    try:
+        filename = f"{name}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.{fmt}{'.gz' if compress else ''}"
+        chunks = stream_export(name, fmt, compress, request.args.to_dict(), data, error_logger,
+                               user=session.get('username', 'unknown'))
+        logger.info(f"{name} export ({fmt}) started by {session.get('username')}")
+        return Response(
+            stream_with_context(chunks),
+            mimetype='application/gzip' if compress else FORMATS[fmt],
+            headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+        )
+    except Exception as e:
+        logger.error(f"Error exporting {name}: {e}")
+        error_logger.log_error(
+            error_type='export_error',
+            message=f"Failed to export {name}: {str(e)}",
+            source='app.py:api_export',
+            details={'export': name, 'format': fmt, 'error': str(e)},
+            user=session.get('username', 'unknown')
+        )
+        return jsonify({'error': str(e)}), 500
+
 if __name__ == '__main__':
+    start_scheduler()
     app.run(debug=True, host='0.0.0.0', port=5000)
     
\ No newline at end of file
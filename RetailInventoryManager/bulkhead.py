@@ -0,0 +1,87 @@
+"""
+Bulkhead for the Fishbowl calls made from web request threads.
+
+A slow Fishbowl (or a login stuck in its retry sleep) must not tie up every waitress thread. Calls go
+through a small dedicated thread pool: at most max_concurrent calls run at once, at most max_queue more
+wait for a slot, and the request thread gives up after timeout seconds. Anything beyond that is rejected
+right away with BulkheadFull, so the route can answer 503 instead of hanging.
+"""
+
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+import threading
+
+from metrics import BULKHEAD_INFLIGHT, BULKHEAD_REJECTED, start_timings, stop_timings, record_timing
+
+
+class BulkheadRejected(Exception):
+    """Base class for calls the bulkhead did not complete"""
+    pass
+
+
+class BulkheadFull(BulkheadRejected):
+    """Raised when every slot and queue position is taken"""
+    pass
+
+
+class BulkheadTimeout(BulkheadRejected):
+    """Raised when a call did not finish (or start) within the timeout. The call keeps its slot until it finishes"""
+    pass
+
+
+def _timed_call(func, args, kwargs) -> tuple:
+    ''' Runs func on a pool thread and returns (result, its timings), the timing collector is per thread. '''
+    start_timings()
+    try:
+        return func(*args, **kwargs), stop_timings()
+    except BaseException:
+        stop_timings()
+        raise
+
+
+class Bulkhead:
+    def __init__(self, name: str, max_concurrent: int, max_queue: int, timeout: float):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrent, thread_name_prefix=f'bulkhead-{name}')
+        self._admission = threading.BoundedSemaphore(max_concurrent + max_queue)
+
+    def _release(self, future):
+        self._admission.release()
+        BULKHEAD_INFLIGHT.dec(bulkhead=self.name)
+
+    def call(self, func, *args, timeout: float = None, **kwargs):
+        '''
+        Runs func(*args, **kwargs) inside the bulkhead and returns its result.
+        Raises BulkheadFull when saturated and BulkheadTimeout when the call takes longer than the timeout.
+        '''
+        if not self._admission.acquire(blocking=False):
+            BULKHEAD_REJECTED.inc(bulkhead=self.name, reason='full')
+            raise BulkheadFull(f'Too many {self.name} calls in progress, try again shortly')
+
+        BULKHEAD_INFLIGHT.inc(bulkhead=self.name)
+        future = self._executor.submit(_timed_call, func, args, kwargs)
+        future.add_done_callback(self._release)
+
+        timeout = timeout or self.timeout
+        try:
+            result, timings = future.result(timeout=timeout)
+        except FutureTimeout:
+            # still queued: drop it. already running: let it finish in the pool, it holds its slot until then
+            reason = 'queue_timeout' if future.cancel() else 'timeout'
+            BULKHEAD_REJECTED.inc(bulkhead=self.name, reason=reason)
+            raise BulkheadTimeout(f'{self.name} did not answer within {timeout} seconds')
+        # hand the pool thread's timings (the fishbowl one in the Server-Timing header) back to the request thread
+        for name, seconds in timings.items():
+            record_timing(name, seconds)
+        return result
+
+    def state(self) -> dict:
+        return {
+            'name': self.name,
+            'max_concurrent': self.max_concurrent,
+            'max_queue': self.max_queue,
+            'timeout': self.timeout,
+            'in_flight': BULKHEAD_INFLIGHT.get(bulkhead=self.name)
+        }
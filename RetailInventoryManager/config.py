@@ -38,8 +38,101 @@ class Config:
     # Sync settings
     SYNC_INTERVAL_MINUTES = int(os.getenv('SYNC_INTERVAL_MINUTES', '5'))
     SALES_INTERVAL_MINUTES = int(os.getenv('SYNC_INTERVAL_MINUTES', '5'))
+    # 'timestamp' re-aggregates orders since last_check_run, 'watermark' ingests new soitem ids in keyset pages
+    SALES_INGESTION_MODE = os.getenv('SALES_INGESTION_MODE', 'timestamp').lower()
+    SALES_PAGE_SIZE = int(os.getenv('SALES_PAGE_SIZE', '500'))
+    # watermark mode re-reads the lines this far below the watermark (ids) and on orders issued this recently
+    # (minutes), so lines committed out of id order, late issued orders and qty edits are still picked up
+    SALES_LOOKBACK_IDS = int(os.getenv('SALES_LOOKBACK_IDS', '500'))
+    SALES_LOOKBACK_MINUTES = float(os.getenv('SALES_LOOKBACK_MINUTES', '60'))
+
+    # Adaptive scheduling bounds (see adaptive.py)
+    ADAPTIVE_SCHEDULING = os.getenv('ADAPTIVE_SCHEDULING', 'False').lower() == 'true'
+    SALES_MIN_INTERVAL_MINUTES = int(os.getenv('SALES_MIN_INTERVAL_MINUTES', '5'))
+    SALES_MAX_INTERVAL_MINUTES = int(os.getenv('SALES_MAX_INTERVAL_MINUTES', '240'))
+    SYNC_MAX_INTERVAL_MINUTES = int(os.getenv('SYNC_MAX_INTERVAL_MINUTES', '60'))
+    SYNC_DELAY_MINUTES = int(os.getenv('SYNC_DELAY_MINUTES', '2'))
+    FISHBOWL_LATENCY_THRESHOLD_SECONDS = float(os.getenv('FISHBOWL_LATENCY_THRESHOLD_SECONDS', '10'))
+
+    # Dashboard stat thresholds (qty at or below the threshold counts towards the bucket)
+    SOLD_OUT_THRESHOLD = int(os.getenv('SOLD_OUT_THRESHOLD', '0'))
+    LOW_STOCK_THRESHOLD = int(os.getenv('LOW_STOCK_THRESHOLD', '10'))
     
+    # Prometheus scrape token for /metrics (only local scrapes are answered when unset)
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+
     # Data files
     DATA_FILE = os.getenv('DATA_FILE', 'RetailInventoryManager/inventory.json')
     ERROR_LOG_FILE = os.getenv('ERROR_LOG_FILE', 'RetailInventoryManager/error_log.json')
-    
\ No newline at end of file
+    JOB_STORE_FILE = os.getenv('JOB_STORE_FILE', 'RetailInventoryManager/jobs.json')
+    JOB_HISTORY_FILE = os.getenv('JOB_HISTORY_FILE', 'RetailInventoryManager/job_history.json')
+    CATALOG_FILE = os.getenv('CATALOG_FILE', 'RetailInventoryManager/catalog.json')
+    SYNC_CHECKPOINT_FILE = os.getenv('SYNC_CHECKPOINT_FILE', 'RetailInventoryManager/sync_checkpoint.json')
+    SYNC_PREFETCH_FILE = os.getenv('SYNC_PREFETCH_FILE', 'RetailInventoryManager/sync_prefetch.json')
+
+    # Scheduler policies
+    JOB_HISTORY_LIMIT = int(os.getenv('JOB_HISTORY_LIMIT', '500'))
+    JOB_MISFIRE_GRACE_SECONDS = int(os.getenv('JOB_MISFIRE_GRACE_SECONDS', '300'))
+    # a failed sync resumes from its last good phase while the checkpoint is younger than this
+    SYNC_CHECKPOINT_MAX_AGE_MINUTES = float(os.getenv('SYNC_CHECKPOINT_MAX_AGE_MINUTES', '15'))
+    # skip the Fishbowl import when the import matrix is identical to the last imported one
+    SYNC_SKIP_UNCHANGED_IMPORTS = os.getenv('SYNC_SKIP_UNCHANGED_IMPORTS', 'True').lower() == 'true'
+
+    # run the Fishbowl inventory queries SYNC_PREFETCH_LEAD_MINUTES before each scheduled sync,
+    # the sync only revalidates them (inventory log marker) before the import
+    SYNC_PREFETCH_ENABLED = os.getenv('SYNC_PREFETCH_ENABLED', 'False').lower() == 'true'
+    SYNC_PREFETCH_LEAD_MINUTES = float(os.getenv('SYNC_PREFETCH_LEAD_MINUTES', '5'))
+    SYNC_PREFETCH_MAX_AGE_MINUTES = float(os.getenv('SYNC_PREFETCH_MAX_AGE_MINUTES', '15'))
+    # location groups the sync queries read (comma separated). Only their stock movements make a prefetch stale
+    SYNC_MARKER_LOCATION_GROUPS = [name.strip() for name in os.getenv('SYNC_MARKER_LOCATION_GROUPS', '').split(',') if name.strip()]
+
+    # Scheduler worker (see worker.py). 'worker' runs the jobs in the separate worker process,
+    # 'elected' in whichever web process wins the leader election, 'embedded' inside the (single) web process.
+    SCHEDULER_MODE = os.getenv('SCHEDULER_MODE', 'worker').lower()
+    START_WORKER = os.getenv('START_WORKER', 'True').lower() == 'true'
+    WORKER_HOST = os.getenv('WORKER_HOST', '127.0.0.1')
+    WORKER_PORT = int(os.getenv('WORKER_PORT', '5001'))
+    # shared secret of the worker IPC. Required when the worker runs on its own (START_WORKER=False),
+    # prod_server.py otherwise makes one for each run
+    WORKER_AUTHKEY = os.getenv('WORKER_AUTHKEY', '')
+    WORKER_TIMEOUT_SECONDS = float(os.getenv('WORKER_TIMEOUT_SECONDS', '900'))
+    WORKER_STATUS_TIMEOUT_SECONDS = float(os.getenv('WORKER_STATUS_TIMEOUT_SECONDS', '10'))
+
+    # Multi-process serving. WEB_WORKERS web processes share one port, and a file lock elects the one
+    # process that runs the scheduled jobs (the worker, or a web process with SCHEDULER_MODE=elected).
+    WEB_WORKERS = int(os.getenv('WEB_WORKERS', '1'))
+    WEB_THREADS = int(os.getenv('WEB_THREADS', '6'))
+    LEADER_LOCK_FILE = os.getenv('LEADER_LOCK_FILE', 'RetailInventoryManager/scheduler.lock')
+    LEADER_RETRY_SECONDS = float(os.getenv('LEADER_RETRY_SECONDS', '10'))
+    DATA_LOCK_TIMEOUT_SECONDS = float(os.getenv('DATA_LOCK_TIMEOUT_SECONDS', '30'))
+
+    # Bulkhead for Fishbowl calls made from web requests (see bulkhead.py)
+    FISHBOWL_WEB_MAX_CONCURRENT = int(os.getenv('FISHBOWL_WEB_MAX_CONCURRENT', '2'))
+    FISHBOWL_WEB_MAX_QUEUE = int(os.getenv('FISHBOWL_WEB_MAX_QUEUE', '4'))
+    FISHBOWL_WEB_TIMEOUT_SECONDS = float(os.getenv('FISHBOWL_WEB_TIMEOUT_SECONDS', '30'))
+
+    # Bulk SKU onboarding (/api/skus/bulk)
+    BULK_IMPORT_MAX_ROWS = int(os.getenv('BULK_IMPORT_MAX_ROWS', '5000'))
+    BULK_IMPORT_TIMEOUT_SECONDS = float(os.getenv('BULK_IMPORT_TIMEOUT_SECONDS', '120'))
+
+    # Local product catalog mirror (see ProductCatalog in data.py)
+    CATALOG_REFRESH_MINUTES = int(os.getenv('CATALOG_REFRESH_MINUTES', '30'))
+    CATALOG_FULL_REFRESH_HOURS = float(os.getenv('CATALOG_FULL_REFRESH_HOURS', '24'))
+    CATALOG_NEGATIVE_TTL_SECONDS = float(os.getenv('CATALOG_NEGATIVE_TTL_SECONDS', '300'))
+    
+    # Read-only inventory feed (/feed/inventory, see feed.py). Comma separated bearer tokens, disabled when unset
+    FEED_TOKENS = [token.strip() for token in os.getenv('FEED_TOKENS', '').split(',') if token.strip()]
+    FEED_GZIP = os.getenv('FEED_GZIP', 'True').lower() == 'true'
+    # deleted SKUs remembered for since= deltas, older versions get a full snapshot
+    FEED_TOMBSTONE_LIMIT = int(os.getenv('FEED_TOMBSTONE_LIMIT', '1000'))
+
+    # Change webhooks (see webhooks.py). Comma separated target URLs, disabled when unset
+    WEBHOOK_TARGETS = [url.strip() for url in os.getenv('WEBHOOK_TARGETS', '').split(',') if url.strip()]
+    WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET', '')     # signs payloads (X-Inventory-Signature) when set
+    WEBHOOK_STATE_FILE = os.getenv('WEBHOOK_STATE_FILE', 'RetailInventoryManager/webhooks.json')
+    WEBHOOK_EVENT_LIMIT = int(os.getenv('WEBHOOK_EVENT_LIMIT', '5000'))
+    WEBHOOK_BATCH_SECONDS = float(os.getenv('WEBHOOK_BATCH_SECONDS', '2'))
+    WEBHOOK_BATCH_MAX_EVENTS = int(os.getenv('WEBHOOK_BATCH_MAX_EVENTS', '500'))
+    WEBHOOK_POLL_SECONDS = float(os.getenv('WEBHOOK_POLL_SECONDS', '1'))
+    WEBHOOK_TIMEOUT_SECONDS = float(os.getenv('WEBHOOK_TIMEOUT_SECONDS', '10'))
+    WEBHOOK_BACKOFF_MAX_SECONDS = float(os.getenv('WEBHOOK_BACKOFF_MAX_SECONDS', '300'))
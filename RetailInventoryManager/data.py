@@ -1,22 +1,136 @@
+import bisect
+import copy
 import json
 import os
 import time
-from datetime import datetime
-from typing import Dict, Optional
+from datetime import datetime, timedelta
+from functools import wraps
+from typing import Dict, Iterator, Optional
 from config import Config
 import threading
 import requests
 from dotenv import load_dotenv
+from filelock import FileLock
 import base64
+from metrics import DATASTORE_SECONDS, DATASTORE_BYTES, EMAIL_SEND_SECONDS
 
 load_dotenv()
 
+
+def _exclusive(method):
+    '''
+    Holds the store's file lock for the whole read-modify-write, so concurrent threads and other
+    processes (multi-worker web serving, the scheduler worker) can't interleave and lose updates.
+    The lock is reentrant, nested _read_data/_write_data calls don't block.
+    '''
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.file_lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+def _file_version(filepath: str) -> Optional[tuple]:
+    ''' Cheap change marker for a data file. Atomic replaces give the file a new inode / mtime. '''
+    try:
+        stat = os.stat(filepath)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+
+class _JsonStore:
+    """
+    Base of the single-file JSON stores: a thread lock plus the shared file lock, reads retried while
+    another writer replaces the file and writes that go through a temp file and an atomic os.replace.
+    Subclasses set store_name (the datastore metrics label) and override _initial_data.
+    """
+    store_name = 'store'
+    indent: Optional[int] = 2
+
+    def __init__(self, filepath: str):
+        self.filepath = filepath
+        self.lock = threading.Lock()
+        self.file_lock = FileLock(filepath + '.lock', timeout=Config.DATA_LOCK_TIMEOUT_SECONDS)
+
+    def _initial_data(self) -> Optional[dict]:
+        """Content of a new file, also what a read returns while the file does not exist"""
+        return None
+
+    @_exclusive
+    def _ensure_file_exists(self):
+        """Create the file from _initial_data if it is missing or not valid JSON"""
+        if os.path.exists(self.filepath):
+            try:
+                with open(self.filepath, 'r') as f:
+                    content = f.read().strip()
+                    if content:
+                        json.loads(content)
+                        return
+            except (json.JSONDecodeError, IOError):
+                pass
+
+        with open(self.filepath, 'w') as f:
+            json.dump(self._initial_data(), f, indent=2)
+
+    def _read_data(self):
+        """Read the store with retry logic"""
+        with self.lock:
+            if not os.path.exists(self.filepath):
+                return self._initial_data()
+            max_retries = 5
+            for attempt in range(max_retries):
+                try:
+                    with DATASTORE_SECONDS.time(store=self.store_name, op='read'):
+                        with open(self.filepath, 'r') as f:
+                            content = f.read()
+                        data = json.loads(content)
+                    DATASTORE_BYTES.observe(len(content), store=self.store_name, op='read')
+                    return data
+                except (IOError, json.JSONDecodeError) as e:
+                    if attempt < max_retries - 1:
+                        time.sleep(0.1)
+                    else:
+                        raise
+
+    @_exclusive
+    def _write_data(self, data: dict):
+        """Write the store atomically"""
+        with self.lock:
+            max_retries = 5
+            for attempt in range(max_retries):
+                try:
+                    temp_file = self.filepath + '.tmp'
+                    with DATASTORE_SECONDS.time(store=self.store_name, op='write'):
+                        content = json.dumps(data, indent=self.indent)
+                        with open(temp_file, 'w') as f:
+                            f.write(content)
+                        os.replace(temp_file, self.filepath)
+                    DATASTORE_BYTES.observe(len(content), store=self.store_name, op='write')
+                    break
+                except IOError as e:
+                    if attempt < max_retries - 1:
+                        time.sleep(0.1)
+                    else:
+                        raise
+
+
 class InventoryData:
+    store_name = 'inventory'
+
+    # materialized stats per data file, shared by every instance in the process so reads never touch disk
+    # unless another process changed the file (tracked by _stats_version).
+    _stats_cache: Dict[str, dict] = {}
+    _stats_version: Dict[str, tuple] = {}
+
     def __init__(self, filepath: str = Config.DATA_FILE):
         self.filepath = filepath
         self.lock = threading.Lock()
+        self.file_lock = FileLock(filepath + '.lock', timeout=Config.DATA_LOCK_TIMEOUT_SECONDS)
         self._ensure_file_exists()
+        self._ensure_stats()
     
+    @_exclusive
     def _ensure_file_exists(self):
         # Check if file exists and is valid
         if os.path.exists(self.filepath):
@@ -38,8 +152,11 @@ class InventoryData:
                 "auto_sync_enabled": False,
                 "inventory_method": "manual",  # Add this line
                 "sales_interval_minutes": 180,
-                "last_check_run": None
+                "last_check_run": None,
+                "sold_out_threshold": Config.SOLD_OUT_THRESHOLD,
+                "low_stock_threshold": Config.LOW_STOCK_THRESHOLD
             },
+            "inventory_stats": self._empty_stats(),
             "audit_log_stats": {
                 "total_logs": 0,
                 "last_log": None
@@ -54,8 +171,11 @@ class InventoryData:
             max_retries = 5
             for attempt in range(max_retries):
                 try:
-                    with open(self.filepath, 'r') as f:
-                        data = json.load(f)
+                    with DATASTORE_SECONDS.time(store=self.store_name, op='read'):
+                        with open(self.filepath, 'r') as f:
+                            content = f.read()
+                        data = json.loads(content)
+                    DATASTORE_BYTES.observe(len(content), store=self.store_name, op='read')
                     return data
                 except (IOError, json.JSONDecodeError) as e:
                     if attempt < max_retries - 1:
@@ -63,6 +183,7 @@ class InventoryData:
                     else:
                         raise
     
+    @_exclusive
     def _write_data(self, data: dict):
         with self.lock:
             max_retries = 5
@@ -70,20 +191,173 @@ class InventoryData:
                 try:
                     # Write to temp file first, then rename (atomic operation)
                     temp_file = self.filepath + '.tmp'
-                    with open(temp_file, 'w') as f:
-                        json.dump(data, f, indent=2)
+                    with DATASTORE_SECONDS.time(store=self.store_name, op='write'):
+                        content = json.dumps(data, indent=2)
+                        with open(temp_file, 'w') as f:
+                            f.write(content)
                     
-                    # Atomic rename
-                    if os.path.exists(self.filepath):
-                        os.replace(temp_file, self.filepath)
-                    else:
-                        os.rename(temp_file, self.filepath)
+                        # Atomic rename
+                        if os.path.exists(self.filepath):
+                            os.replace(temp_file, self.filepath)
+                        else:
+                            os.rename(temp_file, self.filepath)
+                    DATASTORE_BYTES.observe(len(content), store=self.store_name, op='write')
                     break
                 except IOError as e:
                     if attempt < max_retries - 1:
                         time.sleep(0.1)
                     else:
                         raise
+
+            if 'inventory_stats' in data:
+                InventoryData._stats_cache[self.filepath] = copy.deepcopy(data['inventory_stats'])
+                InventoryData._stats_version[self.filepath] = _file_version(self.filepath)
+
+    # ------------------------------ materialized stats ------------------------------- #
+    @staticmethod
+    def _empty_stats() -> dict:
+        return {
+            'total_skus': 0,
+            'sold_out': 0,
+            'low_stock': 0,
+            'orders_processed': 0,
+            'user_edits': {},
+            'sold_out_threshold': Config.SOLD_OUT_THRESHOLD,
+            'low_stock_threshold': Config.LOW_STOCK_THRESHOLD
+        }
+
+    @staticmethod
+    def _stock_bucket(qty: Optional[int], stats: dict) -> Optional[str]:
+        ''' returns the stat bucket a quantity falls into, or None if it is in stock. '''
+        if qty is None:
+            return None
+        if qty <= stats['sold_out_threshold']:
+            return 'sold_out'
+        if qty <= stats['low_stock_threshold']:
+            return 'low_stock'
+        return None
+
+    def _build_stats(self, data: dict) -> dict:
+        '''
+        Full scan of the SKUs to (re)build the stat buckets. Only used when the file has no stats yet
+        or the thresholds change, the running counters (orders, user edits) are carried over.
+        '''
+        config = data.get('config', {})
+        previous = data.get('inventory_stats') or {}
+        stats = self._empty_stats()
+        stats['orders_processed'] = previous.get('orders_processed', 0)
+        stats['user_edits'] = previous.get('user_edits', {})
+        stats['sold_out_threshold'] = config.get('sold_out_threshold', Config.SOLD_OUT_THRESHOLD)
+        stats['low_stock_threshold'] = config.get('low_stock_threshold', Config.LOW_STOCK_THRESHOLD)
+
+        skus = data.get('skus', {})
+        stats['total_skus'] = len(skus)
+        for sku_data in skus.values():
+            bucket = self._stock_bucket(sku_data.get('available_qty'), stats)
+            if bucket:
+                stats[bucket] += 1
+        return stats
+
+    @_exclusive
+    def _ensure_stats(self):
+        ''' Loads the stats block, building it for data files created before stats were materialized. '''
+        version = _file_version(self.filepath)
+        data = self._read_data()
+        if 'inventory_stats' not in data:
+            data['inventory_stats'] = self._build_stats(data)
+            self._write_data(data)
+        else:
+            InventoryData._stats_cache[self.filepath] = copy.deepcopy(data['inventory_stats'])
+            InventoryData._stats_version[self.filepath] = version
+
+    def _track_qty(self, data: dict, old_qty: Optional[int], new_qty: Optional[int]):
+        ''' Moves a SKU between stat buckets. None means the SKU did not exist before / no longer exists. '''
+        stats = data['inventory_stats']
+        old_bucket = self._stock_bucket(old_qty, stats)
+        new_bucket = self._stock_bucket(new_qty, stats)
+        if old_bucket == new_bucket:
+            return
+        if old_bucket:
+            stats[old_bucket] -= 1
+        if new_bucket:
+            stats[new_bucket] += 1
+
+    def _track_edit(self, data: dict, user: str):
+        user_edits = data['inventory_stats']['user_edits']
+        user_edits[user] = user_edits.get(user, 0) + 1
+
+    # -------------------------------- change versions -------------------------------- #
+    def _record_change(self, data: dict, sku: str, action: str, user: str, previous_qty: int = None) -> int:
+        '''
+        Bumps the inventory version and stamps the SKU with it, or keeps a tombstone for a deleted SKU, so
+        the inventory feed can answer "what changed since version N". Tombstones past FEED_TOMBSTONE_LIMIT
+        are dropped and the floor moves up: older versions only get a full snapshot.
+
+        With webhook targets configured the change is also appended to the event outbox in the same write
+        (see webhooks.py), keeping the last WEBHOOK_EVENT_LIMIT events.
+        '''
+        changes = data.setdefault('changes', {'version': 0, 'floor': 0, 'tombstones': []})
+        changes['version'] += 1
+        deleted = action == 'delete'
+        tombstones = [t for t in changes['tombstones'] if t['sku'] != sku]
+        if deleted:
+            tombstones.append({'sku': sku, 'version': changes['version']})
+            drop = len(tombstones) - Config.FEED_TOMBSTONE_LIMIT
+            if drop > 0:
+                changes['floor'] = tombstones[drop - 1]['version']
+                del tombstones[:drop]
+        else:
+            data['skus'][sku]['version'] = changes['version']
+        changes['tombstones'] = tombstones
+
+        if Config.WEBHOOK_TARGETS:
+            events = changes.setdefault('events', [])
+            events.append({
+                'version': changes['version'],
+                'sku': sku,
+                'action': action,
+                'available_qty': None if deleted else data['skus'][sku]['available_qty'],
+                'previous_qty': previous_qty,
+                'user': user,
+                'timestamp': datetime.now().isoformat()
+            })
+            del events[:-Config.WEBHOOK_EVENT_LIMIT]
+        return changes['version']
+
+    def get_events(self, after_version: int, limit: int) -> Dict:
+        '''
+        Change events after a version, oldest first, from the event outbox.
+        Returns {'version', 'events', 'oldest'} where oldest is the first version still retained (None when empty).
+        '''
+        data = self._read_data()
+        changes = data.get('changes', {})
+        events = changes.get('events', [])
+        index = bisect.bisect_right([event['version'] for event in events], after_version)
+        return {
+            'version': changes.get('version', 0),
+            'events': events[index:index + limit],
+            'oldest': events[0]['version'] if events else None
+        }
+
+    def get_changes(self) -> Dict:
+        '''
+        SKUs and change versions from one read of the data file:
+        {'version', 'floor', 'tombstones': [{'sku', 'version'}], 'skus': {sku: sku_data}}
+        '''
+        data = self._read_data()
+        changes = data.get('changes', {'version': 0, 'floor': 0, 'tombstones': []})
+        return dict(changes, skus=data.get('skus', {}))
+
+    def get_stats(self) -> dict:
+        ''' Returns the materialized inventory stats (O(1), served from memory while the file is unchanged). '''
+        if InventoryData._stats_version.get(self.filepath) != _file_version(self.filepath):
+            self._ensure_stats()
+        return copy.deepcopy(InventoryData._stats_cache[self.filepath])
+
+    def get_version(self) -> Optional[list]:
+        ''' Change marker of the inventory file, it changes with every write. '''
+        version = _file_version(self.filepath)
+        return list(version) if version else None
     
     def get_all_skus(self) -> Dict:
         data = self._read_data()
@@ -93,10 +367,38 @@ class InventoryData:
         skus = self.get_all_skus()
         return skus.get(sku)
     
+    @_exclusive
     def add_sku(self, sku: str, product_name: str, available_qty: int, 
                 modified_by: str = 'system', notes: str = '', sn_flag:bool = False, part_num:str=None) -> Dict:
         data = self._read_data()
-        
+        sku_data = self._insert_sku(data, sku, product_name, available_qty, modified_by, notes, sn_flag, part_num)
+        self._write_data(data)
+        return sku_data
+
+    @_exclusive
+    def add_skus(self, rows: list, modified_by: str = 'system') -> Dict:
+        '''
+        Adds many SKUs in one read/write of the data file. Each row is a dict with the add_sku arguments
+        (sku, product_name, available_qty, notes, sn_flag, part_num). SKUs that already exist are left alone.
+        Returns {'added': {sku: sku_data}, 'existing': [sku, ...]}.
+        '''
+        data = self._read_data()
+        added = {}
+        existing = []
+        for row in rows:
+            sku = row['sku']
+            if sku in data['skus']:
+                existing.append(sku)
+                continue
+            added[sku] = self._insert_sku(data, sku, row['product_name'], row['available_qty'], modified_by,
+                                          row.get('notes', ''), row.get('sn_flag', False), row.get('part_num'))
+        if added:
+            self._write_data(data)
+        return {'added': added, 'existing': existing}
+
+    def _insert_sku(self, data: dict, sku: str, product_name: str, available_qty: int,
+                    modified_by: str, notes: str, sn_flag: bool, part_num: str) -> Dict:
+        ''' Adds (or replaces) a SKU in the loaded data, with its stats and audit log entry. '''
         sku_data = {
             'product_name': product_name,
             'available_qty': available_qty,
@@ -109,7 +411,13 @@ class InventoryData:
             'orders_processed': 0
         }
         
+        old_qty = data['skus'][sku]['available_qty'] if sku in data['skus'] else None
+        if old_qty is None:
+            data['inventory_stats']['total_skus'] += 1
         data['skus'][sku] = sku_data
+        self._track_qty(data, old_qty, available_qty)
+        self._track_edit(data, modified_by)
+        self._record_change(data, sku, 'add', modified_by, old_qty)
         
         # Add audit log entry
         data['audit_log'].insert(0,{
@@ -124,25 +432,30 @@ class InventoryData:
         # Update stats
         data['audit_log_stats']['total_logs'] += 1
         data['audit_log_stats']['last_log'] = datetime.now().isoformat()
-        
-        self._write_data(data)
         return sku_data
     
+    @_exclusive
     def update_sku(self, sku: str, updates: Dict, modified_by: str = 'system') -> Optional[Dict]:
         data = self._read_data()
         
         if sku not in data['skus']:
             return None
         
+        old_qty = data['skus'][sku]['available_qty']
+
         # Update fields
         for key, value in updates.items():
             if key in ['product_name', 'available_qty', 'notes']:
                 data['skus'][sku][key] = value
         
+        self._track_qty(data, old_qty, data['skus'][sku]['available_qty'])
+        self._track_edit(data, modified_by)
+
         data['skus'][sku]['initial_qty'] = updates['available_qty']
         data['skus'][sku]['orders_processed'] = 0
         data['skus'][sku]['last_modified'] = datetime.now().isoformat()
         data['skus'][sku]['modified_by'] = modified_by
+        self._record_change(data, sku, 'update', modified_by, old_qty)
         
         # Add audit log entry
         data['audit_log'].insert(0,{
@@ -161,6 +474,7 @@ class InventoryData:
         self._write_data(data)
         return data['skus'][sku]
     
+    @_exclusive
     def delete_sku(self, sku: str, modified_by: str = 'system') -> bool:
         data = self._read_data()
         
@@ -168,6 +482,10 @@ class InventoryData:
             return False
         
         deleted_data = data['skus'].pop(sku)
+        data['inventory_stats']['total_skus'] -= 1
+        self._track_qty(data, deleted_data['available_qty'], None)
+        self._track_edit(data, modified_by)
+        self._record_change(data, sku, 'delete', modified_by, deleted_data['available_qty'])
         
         # Add audit log entry
         data['audit_log'].insert(0, {
@@ -186,6 +504,7 @@ class InventoryData:
         self._write_data(data)
         return True
     
+    @_exclusive
     def decrement_sku(self, sku: str, qty: int, orders_count: int = 1) -> Optional[Dict]:
         data = self._read_data()
         
@@ -193,26 +512,136 @@ class InventoryData:
             return None
         
         print(f'SKU: {sku}, qty: {qty}, orders_count: {orders_count}')
+        old_qty = data['skus'][sku]['available_qty']
         data['skus'][sku]['available_qty'] -= qty
         data['skus'][sku]['orders_processed'] += orders_count
+        self._track_qty(data, old_qty, data['skus'][sku]['available_qty'])
+        data['inventory_stats']['orders_processed'] += orders_count
         data['skus'][sku]['last_modified'] = datetime.now().isoformat()
         data['skus'][sku]['modified_by'] = 'auto-sync'
+        self._record_change(data, sku, 'sale', 'auto-sync', old_qty)
         
         self._write_data(data)
         return data['skus'][sku]
     
+    def get_sales_ingestion(self) -> Dict:
+        ''' Watermark state of the incremental sales ingestion: last soitem id seen and the recently applied lines. '''
+        data = self._read_data()
+        return data.get('sales_ingestion', {'last_soitem_id': None, 'started': None, 'applied': {}})
+
+    @_exclusive
+    def start_sales_ingestion(self, last_id: int, started: str):
+        ''' Initializes the watermark. Orders issued before started are left to the counts already entered. '''
+        data = self._read_data()
+        data['sales_ingestion'] = {'last_soitem_id': last_id, 'started': started, 'applied': {}}
+        self._write_data(data)
+
+    @_exclusive
+    def apply_order_lines(self, lines: list, last_id: int) -> Dict:
+        '''
+        Applies one page of sales order lines and moves the soitem watermark to last_id in the same write, so
+        a page is either fully applied or not at all. Pages re-read a lookback window below the watermark:
+        lines already applied are skipped, or only their qty change is applied (an edited or cancelled line
+        comes back with its new qty, 0 when cancelled).
+
+        Applied lines are kept while they can still be re-read: ids in the SALES_LOOKBACK_IDS below the
+        watermark, or applied within twice SALES_LOOKBACK_MINUTES.
+
+        Args:
+            lines: [{'id', 'so_id', 'sku', 'qty', 'date_issued'}] ordered by id
+            last_id: Highest soitem id covered by this page
+
+        Returns:
+            {'lines_applied', 'skus_updated', 'orders'}
+        '''
+        data = self._read_data()
+        ingestion = data.setdefault('sales_ingestion', {'last_soitem_id': None, 'started': None, 'applied': {}})
+        applied = ingestion.setdefault('applied', {})
+        now = datetime.now()
+        sku_orders = {}
+        previous_qty = {}
+        orders = set()
+        lines_applied = 0
+
+        for line in lines:
+            key = str(line['id'])
+            qty = int(line['qty'])
+            entry = applied.get(key)
+            delta = qty - entry['qty'] if entry else qty
+            if entry and delta == 0:
+                continue
+            applied[key] = {'qty': qty, 'at': entry['at'] if entry else now.isoformat()}
+            if delta == 0:
+                continue
+            orders.add(line['so_id'])
+
+            sku_data = data['skus'].get(line['sku'])
+            if not sku_data:
+                continue
+
+            # a count entered by a user after the order was placed (or after the line was applied) accounts for it
+            counted_after = entry['at'] if entry else line.get('date_issued')
+            if sku_data['modified_by'] != 'auto-sync' and counted_after:
+                try:
+                    if datetime.fromisoformat(sku_data['last_modified']) > datetime.fromisoformat(str(counted_after)):
+                        continue
+                except ValueError:
+                    pass
+
+            old_qty = sku_data['available_qty']
+            sku_data['available_qty'] -= delta
+            self._track_qty(data, old_qty, sku_data['available_qty'])
+            # only new lines count as processed orders, corrections of applied lines do not
+            sku_orders.setdefault(line['sku'], set())
+            if not entry:
+                sku_orders[line['sku']].add(line['so_id'])
+            previous_qty.setdefault(line['sku'], old_qty)
+            lines_applied += 1
+
+        for sku, so_ids in sku_orders.items():
+            data['skus'][sku]['orders_processed'] += len(so_ids)
+            data['skus'][sku]['last_modified'] = now.isoformat()
+            data['skus'][sku]['modified_by'] = 'auto-sync'
+            data['inventory_stats']['orders_processed'] += len(so_ids)
+            self._record_change(data, sku, 'sale', 'auto-sync', previous_qty[sku])
+
+        if ingestion['last_soitem_id'] is None or last_id > ingestion['last_soitem_id']:
+            ingestion['last_soitem_id'] = last_id
+        floor_id = ingestion['last_soitem_id'] - Config.SALES_LOOKBACK_IDS
+        keep_after = (now - timedelta(minutes=2 * Config.SALES_LOOKBACK_MINUTES)).isoformat()
+        ingestion['applied'] = {key: entry for key, entry in applied.items()
+                                if int(key) > floor_id or entry['at'] >= keep_after}
+        ingestion['updated'] = now.isoformat()
+
+        self._write_data(data)
+        return {'lines_applied': lines_applied, 'skus_updated': len(sku_orders), 'orders': len(orders)}
+
     def get_config(self) -> Dict:
         data = self._read_data()
         return data.get('config', {})
     
+    @_exclusive
     def update_config(self, updates: Dict):
         data = self._read_data()
         data['config'].update(updates)
+
+        # thresholds moved, re-bucket every SKU once
+        if 'sold_out_threshold' in updates or 'low_stock_threshold' in updates:
+            data['inventory_stats'] = self._build_stats(data)
+
         self._write_data(data)
     
     def get_audit_log(self, limit: int = 50) -> list:
         data = self._read_data()
         return data.get('audit_log', [])[-limit:]
+
+    def iter_audit_log(self) -> Iterator[dict]:
+        ''' Yields every audit log entry, newest first, from one read of the data file (used by the exports). '''
+        yield from self._read_data().get('audit_log', [])
+
+    def iter_skus(self) -> Iterator[tuple]:
+        ''' Yields (sku, sku_data) for every SKU from one read of the data file. '''
+        yield from self._read_data().get('skus', {}).items()
     
     def get_log_stats(self) -> dict:
         """Get log statistics"""
@@ -234,6 +663,7 @@ class InventoryData:
                 return log
         return None
     
+    @_exclusive
     def clear_all_logs(self) -> int:
         """
         Clear all logs from the audit log
@@ -256,14 +686,22 @@ class InventoryData:
 
 class ErrorLogger:
     """Separate class for managing error logs in a dedicated JSON file"""
+    store_name = 'error_log'
+
+    # materialized error stats per log file, shared by every instance in the process.
+    _stats_cache: Dict[str, dict] = {}
+    _stats_version: Dict[str, tuple] = {}
 
     def __init__(self, filepath: str = Config.ERROR_LOG_FILE):
         self.filepath = filepath
         self.lock = threading.Lock()
+        self.file_lock = FileLock(filepath + '.lock', timeout=Config.DATA_LOCK_TIMEOUT_SECONDS)
         self._ensure_file_exists()
+        self._ensure_stats()
         self._admin_email = os.getenv('ADMIN_EMAIL')
         self._sender_email = os.getenv('SENDER_EMAIL')
 
+    @_exclusive
     def _ensure_file_exists(self):
         """Create the error log file if it doesn't exist"""
         if os.path.exists(self.filepath):
@@ -281,7 +719,9 @@ class ErrorLogger:
             "errors": [],
             "stats": {
                 "total_errors": 0,
-                "last_error": None
+                "last_error": None,
+                "current_errors": 0,
+                "unresolved_errors": 0
             }
         }
         with open(self.filepath, 'w') as f:
@@ -293,8 +733,11 @@ class ErrorLogger:
             max_retries = 5
             for attempt in range(max_retries):
                 try:
-                    with open(self.filepath, 'r') as f:
-                        data = json.load(f)
+                    with DATASTORE_SECONDS.time(store=self.store_name, op='read'):
+                        with open(self.filepath, 'r') as f:
+                            content = f.read()
+                        data = json.loads(content)
+                    DATASTORE_BYTES.observe(len(content), store=self.store_name, op='read')
                     return data
                 except (IOError, json.JSONDecodeError) as e:
                     if attempt < max_retries - 1:
@@ -302,6 +745,7 @@ class ErrorLogger:
                     else:
                         raise
 
+    @_exclusive
     def _write_data(self, data: dict):
         """Write error log data atomically"""
         with self.lock:
@@ -309,13 +753,16 @@ class ErrorLogger:
             for attempt in range(max_retries):
                 try:
                     temp_file = self.filepath + '.tmp'
-                    with open(temp_file, 'w') as f:
-                        json.dump(data, f, indent=2)
+                    with DATASTORE_SECONDS.time(store=self.store_name, op='write'):
+                        content = json.dumps(data, indent=2)
+                        with open(temp_file, 'w') as f:
+                            f.write(content)
 
-                    if os.path.exists(self.filepath):
-                        os.replace(temp_file, self.filepath)
-                    else:
-                        os.rename(temp_file, self.filepath)
+                        if os.path.exists(self.filepath):
+                            os.replace(temp_file, self.filepath)
+                        else:
+                            os.rename(temp_file, self.filepath)
+                    DATASTORE_BYTES.observe(len(content), store=self.store_name, op='write')
                     break
                 except IOError as e:
                     if attempt < max_retries - 1:
@@ -323,6 +770,24 @@ class ErrorLogger:
                     else:
                         raise
 
+            ErrorLogger._stats_cache[self.filepath] = dict(data['stats'])
+            ErrorLogger._stats_version[self.filepath] = _file_version(self.filepath)
+
+    @_exclusive
+    def _ensure_stats(self):
+        """Loads the running counters, backfilling them for log files created before they were materialized"""
+        version = _file_version(self.filepath)
+        data = self._read_data()
+        stats = data['stats']
+        if 'current_errors' not in stats or 'unresolved_errors' not in stats:
+            errors = data.get('errors', [])
+            stats['current_errors'] = len(errors)
+            stats['unresolved_errors'] = sum(1 for e in errors if not e.get('resolved', False))
+            self._write_data(data)
+        else:
+            ErrorLogger._stats_cache[self.filepath] = dict(stats)
+            ErrorLogger._stats_version[self.filepath] = version
+
     def log_error(self, error_type: str, message: str, source: str = 'unknown',
                   details: dict = None, user: str = 'system') -> dict:
         """
@@ -338,36 +803,40 @@ class ErrorLogger:
         Returns:
             The error entry that was logged
         """
-        data = self._read_data()
+        # hold the file lock for the read-modify-write only, not while the email goes out
+        with self.file_lock:
+            data = self._read_data()
 
-        error_entry = {
-            'id': data['stats']['total_errors'] + 1,
-            'timestamp': datetime.now().isoformat(),
-            'error_type': error_type,
-            'message': message,
-            'source': source,
-            'user': user,
-            'details': details or {},
-            'resolved': False
-        }
+            error_entry = {
+                'id': data['stats']['total_errors'] + 1,
+                'timestamp': datetime.now().isoformat(),
+                'error_type': error_type,
+                'message': message,
+                'source': source,
+                'user': user,
+                'details': details or {},
+                'resolved': False
+            }
 
 
-        # helps prevent tons of emails being sent out for the exact same issue. 
-        errors = data.get('errors', [])
-        errors = [e for e in errors if not e.get('resolved', False)]    # unsresolved errors only.
-        same_err_flag = 0
-        for e in errors:
-            if e['error_type'] == error_type and e['message'] == message and e['source'] == source and e['resolved'] is False:
-                same_err_flag = 1
+            # helps prevent tons of emails being sent out for the exact same issue. 
+            errors = data.get('errors', [])
+            errors = [e for e in errors if not e.get('resolved', False)]    # unsresolved errors only.
+            same_err_flag = 0
+            for e in errors:
+                if e['error_type'] == error_type and e['message'] == message and e['source'] == source and e['resolved'] is False:
+                    same_err_flag = 1
 
-        # Add to errors list
-        data['errors'].append(error_entry)
+            # Add to errors list
+            data['errors'].append(error_entry)
 
-        # Update stats
-        data['stats']['total_errors'] += 1
-        data['stats']['last_error'] = datetime.now().isoformat()
+            # Update stats
+            data['stats']['total_errors'] += 1
+            data['stats']['last_error'] = datetime.now().isoformat()
+            data['stats']['current_errors'] += 1
+            data['stats']['unresolved_errors'] += 1
 
-        self._write_data(data)
+            self._write_data(data)
 
         # send an error email only if its a new error:
         if same_err_flag == 0:
@@ -407,6 +876,12 @@ class ErrorLogger:
         # Return most recent errors first
         return list(reversed(errors[-limit:]))
 
+    def iter_errors(self, unresolved_only: bool = False) -> Iterator[dict]:
+        """Yields every error entry, most recent first, from one read of the log file (used by the exports)"""
+        for error in reversed(self._read_data().get('errors', [])):
+            if not unresolved_only or not error.get('resolved', False):
+                yield error
+
     def get_error_by_id(self, error_id: int) -> Optional[dict]:
         """Get a specific error by ID"""
         data = self._read_data()
@@ -417,6 +892,7 @@ class ErrorLogger:
                 return error
         return None
 
+    @_exclusive
     def mark_resolved(self, error_id: int, resolved_by: str = 'system') -> bool:
         """
         Mark an error as resolved
@@ -433,6 +909,8 @@ class ErrorLogger:
 
         for error in errors:
             if error.get('id') == error_id:
+                if not error.get('resolved', False):
+                    data['stats']['unresolved_errors'] -= 1
                 error['resolved'] = True
                 error['resolved_at'] = datetime.now().isoformat()
                 error['resolved_by'] = resolved_by
@@ -441,6 +919,7 @@ class ErrorLogger:
 
         return False
 
+    @_exclusive
     def clear_all_errors(self) -> int:
         """
         Clear all errors from the log
@@ -454,25 +933,26 @@ class ErrorLogger:
         data['errors'] = []
         data['stats'] = {
             'total_errors': 0,
-            'last_error': None
+            'last_error': None,
+            'current_errors': 0,
+            'unresolved_errors': 0
         }
 
         self._write_data(data)
         return error_count
 
     def get_stats(self) -> dict:
-        """Get error statistics"""
-        data = self._read_data()
-        errors = data.get('errors', [])
-
-        unresolved_count = sum(1 for e in errors if not e.get('resolved', False))
+        """Get error statistics (O(1), served from the materialized counters)"""
+        if ErrorLogger._stats_version.get(self.filepath) != _file_version(self.filepath):
+            self._ensure_stats()
+        stats = ErrorLogger._stats_cache[self.filepath]
 
         return {
-            'total_errors': data['stats'].get('total_errors', 0),
-            'last_error': data['stats'].get('last_error'),
-            'current_errors': len(errors),
-            'unresolved_errors': unresolved_count,
-            'resolved_errors': len(errors) - unresolved_count
+            'total_errors': stats.get('total_errors', 0),
+            'last_error': stats.get('last_error'),
+            'current_errors': stats['current_errors'],
+            'unresolved_errors': stats['unresolved_errors'],
+            'resolved_errors': stats['current_errors'] - stats['unresolved_errors']
         }
     
     def send_email(self, subject: str, html_body: str, recipients: list, attachments=[], sender=None) -> None:
@@ -510,6 +990,419 @@ class ErrorLogger:
 
         payload = json.dumps(payload)
 
-        response = requests.request("POST", url, headers=headers, data=payload)
+        with EMAIL_SEND_SECONDS.time(source='error_logger'):
+            response = requests.request("POST", url, headers=headers, data=payload)
         print(f'email send response: {response}')
         return response
+
+
+class JobHistory(_JsonStore):
+    """Run history for the scheduled Fishbowl jobs, kept in a dedicated JSON file"""
+    store_name = 'job_history'
+
+    def __init__(self, filepath: str = Config.JOB_HISTORY_FILE, limit: int = Config.JOB_HISTORY_LIMIT):
+        super().__init__(filepath)
+        self.limit = limit
+        self._ensure_file_exists()
+
+    def _initial_data(self) -> dict:
+        return {
+            "runs": [],
+            "stats": {
+                "total_runs": 0
+            },
+            "jobs": {}
+        }
+
+    @staticmethod
+    def _job_stats(data: dict, job_id: str) -> dict:
+        return data['jobs'].setdefault(job_id, {
+            'runs': 0,
+            'successes': 0,
+            'failures': 0,
+            'overruns': 0,
+            'missed': 0,
+            'delayed': 0,
+            'interrupted': 0,
+            'total_duration': 0.0,
+            'max_duration': 0.0,
+            'last_run': None,
+            'last_outcome': None
+        })
+
+    @_exclusive
+    def mark_interrupted(self):
+        """
+        Runs still marked 'running' when the scheduler starts were cut off by a restart.
+        Only the process that owns the scheduler may call this, other processes would cut off live runs.
+        """
+        data = self._read_data()
+        changed = False
+        for run in data['runs']:
+            if run['outcome'] == 'running':
+                run['outcome'] = 'interrupted'
+                self._job_stats(data, run['job_id'])['interrupted'] += 1
+                changed = True
+        if changed:
+            self._write_data(data)
+
+    @_exclusive
+    def start_run(self, job_id: str, trigger: str = 'scheduled') -> int:
+        """
+        Record the start of a job run
+
+        Args:
+            job_id: Scheduler job id (e.g. 'fishbowl_sync', 'fishbowl_sales')
+            trigger: 'scheduled' for scheduler runs, 'manual' for runs started from the dashboard
+
+        Returns:
+            The run id, pass it to finish_run
+        """
+        data = self._read_data()
+        run_id = data['stats']['total_runs'] + 1
+        data['runs'].insert(0, {
+            'id': run_id,
+            'job_id': job_id,
+            'trigger': trigger,
+            'started_at': datetime.now().isoformat(),
+            'finished_at': None,
+            'duration_seconds': None,
+            'outcome': 'running',
+            'rows': {},
+            'message': None
+        })
+        data['stats']['total_runs'] = run_id
+        del data['runs'][self.limit:]
+        self._write_data(data)
+        return run_id
+
+    @_exclusive
+    def finish_run(self, run_id: int, outcome: str, duration: float, rows: dict = None, message: str = None) -> Optional[dict]:
+        """
+        Record the end of a job run
+
+        Args:
+            run_id: Id returned by start_run
+            outcome: 'success', 'failure' (job returned unsuccessfully) or 'error' (job raised)
+            duration: Run duration in seconds
+            rows: Row counts reported by the job (orders processed, SKUs updated, ...)
+            message: Result or error message
+
+        Returns:
+            The updated run entry, or None if it was already trimmed from the history
+        """
+        data = self._read_data()
+        for run in data['runs']:
+            if run['id'] == run_id:
+                run['finished_at'] = datetime.now().isoformat()
+                run['duration_seconds'] = round(duration, 3)
+                run['outcome'] = outcome
+                run['rows'] = rows or {}
+                run['message'] = message
+
+                stats = self._job_stats(data, run['job_id'])
+                stats['runs'] += 1
+                stats['successes' if outcome == 'success' else 'failures'] += 1
+                stats['total_duration'] += duration
+                stats['max_duration'] = max(stats['max_duration'], duration)
+                stats['last_run'] = run['started_at']
+                stats['last_outcome'] = outcome
+                self._write_data(data)
+                return run
+        return None
+
+    @_exclusive
+    def record_skipped(self, job_id: str, outcome: str, scheduled_run_time: str = None, message: str = None) -> dict:
+        """
+        Record a scheduled run that never executed
+
+        Args:
+            job_id: Scheduler job id
+            outcome: 'overrun' (previous run still going), 'missed' (past the misfire grace time)
+                     or 'delayed' (postponed by the adaptive schedule)
+            scheduled_run_time: When the run was due (ISO format)
+            message: Why the run was skipped (optional)
+        """
+        data = self._read_data()
+        run_id = data['stats']['total_runs'] + 1
+        entry = {
+            'id': run_id,
+            'job_id': job_id,
+            'trigger': 'scheduled',
+            'started_at': scheduled_run_time or datetime.now().isoformat(),
+            'finished_at': None,
+            'duration_seconds': None,
+            'outcome': outcome,
+            'rows': {},
+            'message': message
+        }
+        data['runs'].insert(0, entry)
+        data['stats']['total_runs'] = run_id
+        del data['runs'][self.limit:]
+        stat_key = {'overrun': 'overruns', 'missed': 'missed', 'delayed': 'delayed'}[outcome]
+        stats = self._job_stats(data, job_id)
+        stats[stat_key] = stats.get(stat_key, 0) + 1
+        self._write_data(data)
+        return entry
+
+    def get_history(self, limit: int = 50, job_id: str = None) -> list:
+        """Most recent runs first, optionally for a single job"""
+        data = self._read_data()
+        runs = data.get('runs', [])
+        if job_id:
+            runs = [r for r in runs if r['job_id'] == job_id]
+        return runs[:limit]
+
+    def get_summary(self) -> dict:
+        """Per job run counts and durations"""
+        data = self._read_data()
+        summary = {}
+        for job_id, stats in data.get('jobs', {}).items():
+            summary[job_id] = dict(stats)
+            summary[job_id]['avg_duration'] = round(stats['total_duration'] / stats['runs'], 3) if stats['runs'] else None
+            summary[job_id]['running'] = any(r['job_id'] == job_id and r['outcome'] == 'running' for r in data['runs'])
+        return summary
+
+
+class ProductCatalog(_JsonStore):
+    """
+    Local mirror of the Fishbowl Product/Part catalog (SKU, part number, serialized and active flags),
+    kept in a dedicated JSON file and refreshed incrementally by the catalog job (see sync.py).
+    Lookups are served from an in-memory index (exact and prefix) that reloads when the file changes.
+    """
+    store_name = 'catalog'
+    indent = None
+
+    # loaded index per catalog file, shared by every instance in the process: (file version, products, sorted skus)
+    _index_cache: Dict[str, tuple] = {}
+    # SKUs Fishbowl did not know, per catalog file: {sku: expiry timestamp}
+    _misses: Dict[str, dict] = {}
+
+    def __init__(self, filepath: str = Config.CATALOG_FILE, negative_ttl: float = Config.CATALOG_NEGATIVE_TTL_SECONDS):
+        super().__init__(filepath)
+        self.negative_ttl = negative_ttl
+        self._ensure_file_exists()
+
+    def _initial_data(self) -> dict:
+        return {
+            "products": {},
+            "watermark": None,
+            "last_refresh": None,
+            "last_full_refresh": None
+        }
+
+    @_exclusive
+    def _write_data(self, data: dict):
+        """Write catalog data atomically and keep the in-process index in step"""
+        super()._write_data(data)
+        ProductCatalog._index_cache[self.filepath] = (_file_version(self.filepath), data['products'],
+                                                      sorted(data['products']))
+
+    def _index(self) -> tuple:
+        ''' Returns (products, sorted skus), reloading only when the catalog file changed. '''
+        version = _file_version(self.filepath)
+        cached = ProductCatalog._index_cache.get(self.filepath)
+        if cached is None or cached[0] != version:
+            products = self._read_data()['products']
+            cached = (version, products, sorted(products))
+            ProductCatalog._index_cache[self.filepath] = cached
+        return cached[1], cached[2]
+
+    @_exclusive
+    def apply_changes(self, rows: list, watermark: Optional[str], full: bool = False) -> int:
+        """
+        Upserts catalog rows from Fishbowl and moves the watermark forward
+
+        Args:
+            rows: [{'sku', 'part_num', 'is_serialized', 'product_active', 'part_active', 'last_modified'}]
+            watermark: Highest date last modified seen, the next refresh starts from it
+            full: True for a full refresh, replaces the whole catalog
+
+        Returns:
+            Number of products upserted
+        """
+        data = self._read_data()
+        if full:
+            data['products'] = {}
+            data['last_full_refresh'] = datetime.now().isoformat()
+        for row in rows:
+            data['products'][row['sku']] = {key: row[key] for key in
+                                            ('part_num', 'is_serialized', 'product_active', 'part_active', 'last_modified')}
+        if watermark and (not data['watermark'] or watermark > data['watermark'] or full):
+            data['watermark'] = watermark
+        data['last_refresh'] = datetime.now().isoformat()
+        self._write_data(data)
+
+        misses = ProductCatalog._misses.get(self.filepath, {})
+        for row in rows:
+            misses.pop(row['sku'], None)
+        return len(rows)
+
+    def get_watermark(self) -> Optional[str]:
+        return self._read_data().get('watermark')
+
+    def lookup(self, sku: str) -> Optional[dict]:
+        """Exact lookup, the catalog record or None"""
+        products, _ = self._index()
+        record = products.get(sku)
+        return dict(record, sku=sku) if record else None
+
+    def search(self, prefix: str, limit: int = 20, active_only: bool = True) -> list:
+        """Prefix lookup over the sorted SKUs"""
+        products, skus = self._index()
+        matches = []
+        for index in range(bisect.bisect_left(skus, prefix), len(skus)):
+            sku = skus[index]
+            if not sku.startswith(prefix) or len(matches) >= limit:
+                break
+            record = products[sku]
+            if active_only and not (record['product_active'] and record['part_active']):
+                continue
+            matches.append(dict(record, sku=sku))
+        return matches
+
+    def remember_miss(self, sku: str):
+        """Negative caching: Fishbowl didn't know the SKU, don't ask again until the TTL runs out"""
+        ProductCatalog._misses.setdefault(self.filepath, {})[sku] = time.time() + self.negative_ttl
+
+    def is_known_miss(self, sku: str) -> bool:
+        misses = ProductCatalog._misses.get(self.filepath, {})
+        expiry = misses.get(sku)
+        if expiry is None:
+            return False
+        if expiry < time.time():
+            misses.pop(sku, None)
+            return False
+        return True
+
+    def get_stats(self) -> dict:
+        data = self._read_data()
+        products = data['products']
+        return {
+            'products': len(products),
+            'active': sum(1 for p in products.values() if p['product_active'] and p['part_active']),
+            'watermark': data['watermark'],
+            'last_refresh': data['last_refresh'],
+            'last_full_refresh': data['last_full_refresh'],
+            'negative_cache': len(ProductCatalog._misses.get(self.filepath, {}))
+        }
+
+
+class SyncCheckpoint(_JsonStore):
+    """
+    Checkpoint of the staged sync pipeline (see FishbowlSync._run_pipeline), kept in a dedicated JSON file.
+    Holds the output and timing of every completed phase of the current run, so a retry after a failure
+    resumes from the last good phase instead of re-querying Fishbowl.
+    """
+    store_name = 'sync_checkpoint'
+    indent = None
+
+    def __init__(self, filepath: str = Config.SYNC_CHECKPOINT_FILE, max_age_minutes: float = Config.SYNC_CHECKPOINT_MAX_AGE_MINUTES):
+        super().__init__(filepath)
+        self.max_age_minutes = max_age_minutes
+
+    def start(self, mode: str) -> dict:
+        """Starts a new run, dropping any previous checkpoint"""
+        data = {
+            'mode': mode,
+            'started': datetime.now().isoformat(),
+            'updated': datetime.now().isoformat(),
+            'phases': {},
+            'failed_phase': None,
+            'error': None
+        }
+        self._write_data(data)
+        return data
+
+    def resume(self, mode: str) -> Optional[dict]:
+        """
+        The checkpoint of an unfinished run in the same mode, or None. Checkpoints older than
+        max_age_minutes are not resumed: the inventory they captured is out of date.
+        """
+        data = self._read_data()
+        if not data or data['mode'] != mode or not data['phases']:
+            return None
+        age = (datetime.now() - datetime.fromisoformat(data['updated'])).total_seconds() / 60
+        if age > self.max_age_minutes:
+            return None
+        return data
+
+    @_exclusive
+    def save_phase(self, phase: str, seconds: float, output) -> dict:
+        """Records a completed phase and its output"""
+        data = self._read_data()
+        data['phases'][phase] = {
+            'completed_at': datetime.now().isoformat(),
+            'seconds': round(seconds, 3),
+            'output': output
+        }
+        data['updated'] = datetime.now().isoformat()
+        data['failed_phase'] = None
+        data['error'] = None
+        self._write_data(data)
+        return data
+
+    @_exclusive
+    def fail(self, phase: str, error: str):
+        """Records the phase that failed, the completed phases stay resumable"""
+        data = self._read_data()
+        if data is None:
+            return
+        data['failed_phase'] = phase
+        data['error'] = error
+        self._write_data(data)
+
+    @_exclusive
+    def clear(self):
+        """Removes the checkpoint after a successful run"""
+        if os.path.exists(self.filepath):
+            os.remove(self.filepath)
+
+    def get_status(self) -> Optional[dict]:
+        """Checkpoint summary (phases and timings, without the outputs)"""
+        data = self._read_data()
+        if not data:
+            return None
+        return {
+            'mode': data['mode'],
+            'started': data['started'],
+            'updated': data['updated'],
+            'failed_phase': data['failed_phase'],
+            'error': data['error'],
+            'phases': {phase: {'completed_at': p['completed_at'], 'seconds': p['seconds']}
+                       for phase, p in data['phases'].items()}
+        }
+
+
+class WebhookState(_JsonStore):
+    """
+    Per target delivery state of the change webhooks (see webhooks.py): the last delivered inventory
+    version (cursor), consecutive failures and the next retry time. The events themselves stay in the
+    InventoryData event outbox, so the queue survives restarts without a second copy of every change.
+    """
+    store_name = 'webhooks'
+
+    def __init__(self, filepath: str = Config.WEBHOOK_STATE_FILE):
+        super().__init__(filepath)
+
+    def _initial_data(self) -> dict:
+        return {'targets': {}}
+
+    def get_targets(self) -> Dict:
+        return self._read_data()['targets']
+
+    @_exclusive
+    def update_target(self, url: str, **fields) -> Dict:
+        ''' Updates (or creates) the state of one target and returns it. '''
+        data = self._read_data()
+        target = data['targets'].setdefault(url, {
+            'cursor': None,
+            'failures': 0,
+            'next_attempt': None,
+            'delivered': 0,
+            'last_success': None,
+            'last_error': None
+        })
+        target.update(fields)
+        self._write_data(data)
+        return target
@@ -0,0 +1,126 @@
+"""
+Streaming exports of the SKUs, the audit log and the error log.
+
+Rows are generated one at a time from the data layer iterators and written out in small chunks, as CSV
+or NDJSON, optionally gzip-compressed on the fly. The response starts right away and nothing but the
+loaded data file is held in memory (no DataFrame, no full CSV string).
+"""
+
+import csv
+import io
+import json
+import logging
+import zlib
+
+from data import InventoryData, ErrorLogger
+
+logger = logging.getLogger(__name__)
+
+# rows per yielded chunk
+CHUNK_ROWS = 500
+FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson'
+}
+
+SKU_COLUMNS = ['sku', 'product_name', 'part_num', 'available_qty', 'initial_qty', 'orders_processed',
+               'sn_flag', 'last_modified', 'modified_by', 'notes']
+LOG_COLUMNS = ['id', 'timestamp', 'action', 'sku', 'user', 'data', 'updates']
+ERROR_COLUMNS = ['id', 'timestamp', 'error_type', 'message', 'source', 'user', 'resolved', 'resolved_at',
+                 'resolved_by', 'details']
+
+
+def _sku_rows(data: InventoryData, error_logger: ErrorLogger, args: dict):
+    for sku, sku_data in data.iter_skus():
+        yield dict(sku_data, sku=sku)
+
+
+def _log_rows(data: InventoryData, error_logger: ErrorLogger, args: dict):
+    yield from data.iter_audit_log()
+
+
+def _error_rows(data: InventoryData, error_logger: ErrorLogger, args: dict):
+    yield from error_logger.iter_errors(unresolved_only=args.get('unresolved_only') == 'true')
+
+
+# export name -> (columns, row generator)
+EXPORTS = {
+    'skus': (SKU_COLUMNS, _sku_rows),
+    'logs': (LOG_COLUMNS, _log_rows),
+    'errors': (ERROR_COLUMNS, _error_rows)
+}
+
+
+def _cell(value):
+    ''' Nested values (audit log data, error details) go in one CSV cell as JSON. '''
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=str)
+    return value
+
+
+def iter_csv(columns: list, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for count, row in enumerate(rows, start=1):
+        writer.writerow([_cell(row.get(column)) for column in columns])
+        if count % CHUNK_ROWS == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def iter_ndjson(columns: list, rows):
+    chunk = []
+    for row in rows:
+        chunk.append(json.dumps(row, default=str))
+        if len(chunk) == CHUNK_ROWS:
+            yield '\n'.join(chunk) + '\n'
+            chunk = []
+    if chunk:
+        yield '\n'.join(chunk) + '\n'
+
+
+def gzip_chunks(chunks):
+    ''' Compresses a stream of text chunks into a gzip stream. '''
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)    # wbits 31: gzip header and trailer
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode())
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def _logged(chunks, name: str, fmt: str, error_logger: ErrorLogger, user: str):
+    ''' Passes the chunks through, logging an error raised mid-stream (the response is already sent by then). '''
+    try:
+        yield from chunks
+    except Exception as e:
+        logger.error(f"Error streaming the {name} export: {e}")
+        try:
+            error_logger.log_error(
+                error_type='export_error',
+                message=f"Failed to export {name} while streaming: {str(e)}",
+                source='exports.py:stream_export',
+                details={'export': name, 'format': fmt, 'error': str(e)},
+                user=user
+            )
+        except Exception as log_error:
+            # the original error is the one to surface
+            logger.error(f"Could not log the {name} export error: {log_error}")
+        raise
+
+
+def stream_export(name: str, fmt: str, compress: bool, args: dict, data: InventoryData, error_logger: ErrorLogger,
+                  user: str = 'unknown'):
+    '''
+    Returns the chunk generator of an export, name and fmt must be keys of EXPORTS and FORMATS (the caller
+    checks them). The data file is only read once the response starts iterating, so read errors come out of
+    the generator: they are logged to the error log and cut the download short.
+    '''
+    columns, rows = EXPORTS[name]
+    writer = {'csv': iter_csv, 'ndjson': iter_ndjson}[fmt]
+    chunks = writer(columns, rows(data, error_logger, args))
+    chunks = gzip_chunks(chunks) if compress else (chunk.encode() for chunk in chunks)
+    return _logged(chunks, name, fmt, error_logger, user)
@@ -0,0 +1,100 @@
+"""
+Read-only inventory feed for downstream consumers (the retail website, internal tools).
+
+InventoryFeed keeps a pre-serialized (and pre-gzipped) JSON snapshot of the SKU quantities in memory and
+only rebuilds it when the inventory changes: a poll costs one stat() of the data file while nothing was
+written, and one parse when only non-SKU data (config, audit log) changed. Every SKU change bumps the
+inventory version (InventoryData._record_change), which doubles as the ETag and lets consumers ask for
+the changes since the version they last saw (since=<version>).
+"""
+
+from bisect import bisect_right
+from datetime import datetime
+import gzip
+import json
+import threading
+
+from config import Config
+from data import InventoryData
+
+# delta bodies kept per snapshot, keyed by since. consumers polling at the head all ask for the same one
+DELTA_CACHE_SIZE = 64
+FEED_FIELDS = ['product_name', 'part_num', 'available_qty', 'last_modified']
+
+
+class FeedBody:
+    ''' One serialized feed response. '''
+
+    def __init__(self, payload: dict, compress: bool):
+        self.body = json.dumps(payload, separators=(',', ':')).encode()
+        self.gzipped = gzip.compress(self.body, compresslevel=6) if compress else None
+
+
+class InventoryFeed:
+    def __init__(self, data: InventoryData = None, compress: bool = Config.FEED_GZIP):
+        self.data = data or InventoryData()
+        self.compress = compress
+        self._lock = threading.Lock()
+        self._file_version = None
+        self._version = None
+        self._snapshot = None
+        self._items = []        # feed records sorted by version
+        self._versions = []
+        self._tombstones = []
+        self._floor = 0
+        self._deltas = {}
+
+    def _refresh(self):
+        ''' Reloads the snapshot when the data file changed and its inventory version moved. '''
+        with self._lock:
+            file_version = self.data.get_version()
+            if file_version == self._file_version and self._snapshot is not None:
+                return
+            changes = self.data.get_changes()
+            self._file_version = file_version
+            if changes['version'] == self._version and self._snapshot is not None:
+                return
+
+            records = []
+            for sku, sku_data in changes['skus'].items():
+                record = {'sku': sku, 'version': sku_data.get('version', 0)}
+                record.update({field: sku_data.get(field) for field in FEED_FIELDS})
+                records.append(record)
+            records.sort(key=lambda record: record['version'])
+
+            self._version = changes['version']
+            self._floor = changes['floor']
+            self._tombstones = changes['tombstones']
+            self._items = records
+            self._versions = [record['version'] for record in records]
+            self._deltas = {}
+            self._snapshot = FeedBody(self._payload(records, [], None), self.compress)
+
+    def _payload(self, records: list, deleted: list, since) -> dict:
+        return {
+            'version': self._version,
+            'since': since,
+            'full': since is None,
+            'generated': datetime.now().isoformat(),
+            'skus': records,
+            'deleted': deleted
+        }
+
+    def get(self, since: int = None) -> tuple:
+        '''
+        Returns (version, FeedBody). since=None (or a version older than the tombstone floor) gives the full
+        snapshot, otherwise only the SKUs changed and deleted after that version.
+        '''
+        self._refresh()
+        with self._lock:
+            if since is None or since < self._floor or since > self._version:
+                return self._version, self._snapshot
+            body = self._deltas.get(since)
+            if body is None:
+                records = self._items[bisect_right(self._versions, since):]
+                deleted = [t['sku'] for t in self._tombstones if t['version'] > since]
+                body = FeedBody(self._payload(records, deleted, since), self.compress)
+                if len(self._deltas) >= DELTA_CACHE_SIZE:
+                    self._deltas.pop(next(iter(self._deltas)))
+                self._deltas[since] = body
+            return self._version, body
@@ -0,0 +1,11 @@
+"""
+Ids of the scheduled jobs, shared by the web app, the scheduler worker and jobs.py.
+
+Kept apart from jobs.py so the web process can name a job without importing the scheduler module, which
+builds the sync manager, the job history and the adaptive schedule when it's imported.
+"""
+
+SYNC_JOB_ID = 'fishbowl_sync'
+SALES_JOB_ID = 'fishbowl_sales'
+CATALOG_JOB_ID = 'catalog_refresh'
+PREFETCH_JOB_ID = 'sync_prefetch'
@@ -0,0 +1,378 @@
+"""
+Scheduler setup and job entry points for the Fishbowl sync and sales check jobs.
+
+- JsonJobStore persists the scheduled jobs to a JSON file so a restart still knows when each job
+  was due, and coalesces / reports the runs that were missed while the server was down.
+- run_fishbowl_sync() and run_fishbowl_sales() are the job entry points. They live at module level so
+  the persistent store can reference them by name, and record every run in the JobHistory.
+- Every job runs with coalesce=True, max_instances=1 and a misfire grace time, so slow runs are
+  reported as overruns in the history instead of piling up.
+- After each scheduled run the next run time is set from the AdaptiveSchedule (see adaptive.py).
+- With SYNC_PREFETCH_ENABLED a one-off prefetch job runs SYNC_PREFETCH_LEAD_MINUTES before every sync
+  run (schedule_prefetch), so the sync itself only revalidates the Fishbowl inventory before importing.
+"""
+
+from datetime import datetime, timedelta
+import base64
+import json
+import logging
+import os
+import pickle
+import threading
+import time
+
+from apscheduler.events import EVENT_JOB_MAX_INSTANCES, EVENT_JOB_MISSED, EVENT_JOB_EXECUTED, EVENT_JOB_ERROR
+from apscheduler.job import Job
+from apscheduler.jobstores.base import BaseJobStore, ConflictingIdError, JobLookupError
+from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.util import datetime_to_utc_timestamp, utc_timestamp_to_datetime
+
+from adaptive import AdaptiveSchedule
+from config import Config
+from data import JobHistory
+from job_ids import SYNC_JOB_ID, SALES_JOB_ID, CATALOG_JOB_ID, PREFETCH_JOB_ID
+from metrics import instrument_scheduler
+from sync import FishbowlSync
+
+logger = logging.getLogger(__name__)
+
+JOB_NAMES = {
+    SYNC_JOB_ID: 'Sync Fishbowl inventory',
+    SALES_JOB_ID: 'Sync Fishbowl Sales',
+    CATALOG_JOB_ID: 'Refresh product catalog',
+    PREFETCH_JOB_ID: 'Prefetch sync inputs'
+}
+JOB_DEFAULTS = {
+    'coalesce': True,
+    'max_instances': 1,
+    'misfire_grace_time': Config.JOB_MISFIRE_GRACE_SECONDS
+}
+
+sync_manager = FishbowlSync()
+job_history = JobHistory()
+adaptive_schedule = AdaptiveSchedule(sync_manager.data)
+
+_scheduler = None
+_running = set()
+_running_lock = threading.Lock()
+
+
+# ------------------------------ persistent job store --------------------------------- #
+class JsonJobStore(BaseJobStore):
+    """
+    APScheduler job store backed by a JSON file, following the same read/atomic write pattern as the
+    data stores. Job state is pickled (as the SQLAlchemy store does) and stored base64 encoded.
+    """
+
+    def __init__(self, filepath: str = Config.JOB_STORE_FILE, pickle_protocol: int = pickle.HIGHEST_PROTOCOL):
+        super().__init__()
+        self.filepath = filepath
+        self.pickle_protocol = pickle_protocol
+        self.lock = threading.Lock()
+
+    def start(self, scheduler, alias):
+        super().start(scheduler, alias)
+        if not os.path.exists(self.filepath):
+            self._write_jobs({})
+
+    def _read_jobs(self) -> dict:
+        try:
+            with open(self.filepath, 'r') as f:
+                return json.load(f).get('jobs', {})
+        except (IOError, json.JSONDecodeError) as e:
+            self._logger.warning('Unable to read the job store, starting empty: %s', e)
+            return {}
+
+    def _write_jobs(self, jobs: dict):
+        temp_file = self.filepath + '.tmp'
+        with open(temp_file, 'w') as f:
+            json.dump({'jobs': jobs}, f, indent=2)
+        os.replace(temp_file, self.filepath)
+
+    def _serialize(self, job) -> dict:
+        return {
+            'next_run_time': datetime_to_utc_timestamp(job.next_run_time),
+            'job_state': base64.b64encode(pickle.dumps(job.__getstate__(), self.pickle_protocol)).decode('ascii')
+        }
+
+    def _reconstitute_job(self, job_state: str):
+        job_state = pickle.loads(base64.b64decode(job_state))
+        job_state['jobstore'] = self
+        job = Job.__new__(Job)
+        job.__setstate__(job_state)
+        job._scheduler = self._scheduler
+        job._jobstore_alias = self._alias
+        return job
+
+    def _get_jobs(self, condition=None) -> list:
+        with self.lock:
+            stored = self._read_jobs()
+            rows = sorted(stored.items(), key=lambda item: (item[1]['next_run_time'] is None,
+                                                            item[1]['next_run_time'] or 0))
+            jobs = []
+            failed_job_ids = []
+            for job_id, row in rows:
+                if condition and not condition(row):
+                    continue
+                try:
+                    jobs.append(self._reconstitute_job(row['job_state']))
+                except BaseException:
+                    self._logger.exception('Unable to restore job "%s" -- removing it', job_id)
+                    failed_job_ids.append(job_id)
+
+            if failed_job_ids:
+                for job_id in failed_job_ids:
+                    stored.pop(job_id, None)
+                self._write_jobs(stored)
+            return jobs
+
+    def lookup_job(self, job_id):
+        with self.lock:
+            row = self._read_jobs().get(job_id)
+        return self._reconstitute_job(row['job_state']) if row else None
+
+    def get_due_jobs(self, now):
+        timestamp = datetime_to_utc_timestamp(now)
+        return self._get_jobs(lambda row: row['next_run_time'] is not None and row['next_run_time'] <= timestamp)
+
+    def get_next_run_time(self):
+        with self.lock:
+            run_times = [row['next_run_time'] for row in self._read_jobs().values() if row['next_run_time'] is not None]
+        return utc_timestamp_to_datetime(min(run_times)) if run_times else None
+
+    def get_all_jobs(self):
+        jobs = self._get_jobs()
+        self._fix_paused_jobs_sorting(jobs)
+        return jobs
+
+    def add_job(self, job):
+        with self.lock:
+            stored = self._read_jobs()
+            if job.id in stored:
+                raise ConflictingIdError(job.id)
+            stored[job.id] = self._serialize(job)
+            self._write_jobs(stored)
+
+    def update_job(self, job):
+        with self.lock:
+            stored = self._read_jobs()
+            if job.id not in stored:
+                raise JobLookupError(job.id)
+            stored[job.id] = self._serialize(job)
+            self._write_jobs(stored)
+
+    def remove_job(self, job_id):
+        with self.lock:
+            stored = self._read_jobs()
+            if job_id not in stored:
+                raise JobLookupError(job_id)
+            del stored[job_id]
+            self._write_jobs(stored)
+
+    def remove_all_jobs(self):
+        with self.lock:
+            self._write_jobs({})
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__} (filepath={self.filepath})>'
+
+
+# ----------------------------------- job entry points -------------------------------- #
+def is_running(job_id: str) -> bool:
+    with _running_lock:
+        return job_id in _running
+
+
+def _set_next_run(job_id: str, minutes: float):
+    ''' Moves the next run of a scheduled job to `minutes` from now. '''
+    if _scheduler is None or _scheduler.get_job(job_id) is None:
+        return
+    next_run_time = datetime.now(_scheduler.timezone) + timedelta(minutes=minutes)
+    _scheduler.modify_job(job_id, next_run_time=next_run_time)
+    logger.info(f"{JOB_NAMES[job_id]} next run adapted to {next_run_time} ({minutes:.1f} minutes)")
+
+
+def _adapt(job_id: str, result, success: bool, duration: float):
+    ''' Applies the adaptive interval after a scheduled run. '''
+    if job_id == SALES_JOB_ID:
+        orders_found = result.get('orders_processed', 0) if isinstance(result, dict) else 0
+        minutes = adaptive_schedule.next_sales_interval(orders_found)
+    elif job_id == SYNC_JOB_ID:
+        minutes = adaptive_schedule.next_sync_interval(success, duration)
+    else:
+        return
+    if minutes is not None:
+        _set_next_run(job_id, minutes)
+
+
+def _run_job(job_id: str, func, trigger: str) -> dict:
+    '''
+    Runs a job function and records its start, duration, outcome and row counts. A run of a job that is
+    already running (a "run now" during a scheduled run, or the other way around) is refused: the scheduler's
+    max_instances only covers the scheduled runs, and two runs would share the data file and Fishbowl.
+    '''
+    with _running_lock:
+        already_running = job_id in _running
+        if not already_running:
+            _running.add(job_id)
+    if already_running:
+        message = f'{JOB_NAMES[job_id]} is already running, try again once it finishes'
+        logger.warning(f"{JOB_NAMES[job_id]} {trigger} run refused: the previous run is still going")
+        if trigger == 'scheduled':
+            job_history.record_skipped(job_id, 'overrun', datetime.now().isoformat(), message)
+        return {'success': False, 'skipped': True, 'error': message}
+    try:
+        run_id = job_history.start_run(job_id, trigger)
+    except Exception:
+        with _running_lock:
+            _running.discard(job_id)
+        raise
+    start_time = time.time()
+    try:
+        result = func()
+    except Exception as e:
+        job_history.finish_run(run_id, 'error', time.time() - start_time, message=str(e))
+        raise
+    finally:
+        with _running_lock:
+            _running.discard(job_id)
+
+    # the syncs return {'success': False, ...} on failure, treat anything but a successful dict as a failure
+    success = isinstance(result, dict) and result.get('success', False)
+    rows = {}
+    message = None
+    if isinstance(result, dict):
+        rows = {key: result[key] for key in ['orders_processed', 'skus_updated', 'inventory_updated', 'sn_created',
+                                             'products_updated']
+                if key in result}
+        message = result.get('message') or result.get('error')
+    duration = time.time() - start_time
+    job_history.finish_run(run_id, 'success' if success else 'failure', duration, rows, message)
+    if trigger == 'scheduled':
+        _adapt(job_id, result, success, duration)
+    return result
+
+
+def run_fishbowl_sync(trigger: str = 'scheduled') -> dict:
+    ''' Job entry point for the inventory sync. Scheduled runs may be delayed by the adaptive schedule. '''
+    if trigger == 'scheduled':
+        run, delay, reason = adaptive_schedule.sync_decision(is_running(SYNC_JOB_ID))
+        if not run:
+            logger.info(f"Scheduled sync delayed {delay} minutes: {reason}")
+            job_history.record_skipped(SYNC_JOB_ID, 'delayed', datetime.now().isoformat(), reason)
+            _set_next_run(SYNC_JOB_ID, delay)
+            return {'success': False, 'skipped': True, 'message': f'Sync delayed: {reason}'}
+    return _run_job(SYNC_JOB_ID, sync_manager.determine_sync, trigger)
+
+
+def run_fishbowl_sales(trigger: str = 'scheduled') -> dict:
+    ''' Job entry point for the sales check. '''
+    return _run_job(SALES_JOB_ID, sync_manager.run_sales_check, trigger)
+
+
+def run_catalog_refresh(trigger: str = 'scheduled') -> dict:
+    ''' Job entry point for the incremental product catalog refresh. '''
+    return _run_job(CATALOG_JOB_ID, sync_manager.refresh_catalog, trigger)
+
+
+def run_sync_prefetch(trigger: str = 'scheduled') -> dict:
+    ''' Job entry point for the sync input prefetch. '''
+    return _run_job(PREFETCH_JOB_ID, sync_manager.prefetch_sync_inputs, trigger)
+
+
+JOB_FUNCS = {
+    SYNC_JOB_ID: run_fishbowl_sync,
+    SALES_JOB_ID: run_fishbowl_sales,
+    CATALOG_JOB_ID: run_catalog_refresh,
+    PREFETCH_JOB_ID: run_sync_prefetch
+}
+
+
+# ------------------------------------ scheduling ------------------------------------- #
+def _history_listener(event):
+    ''' Records runs skipped by the scheduler (overruns and misfires) in the job history. '''
+    run_time = event.scheduled_run_time.isoformat() if getattr(event, 'scheduled_run_time', None) else None
+    if event.code == EVENT_JOB_MAX_INSTANCES:
+        logger.warning(f"Job {event.job_id} is still running, skipped the run due at {run_time}")
+        job_history.record_skipped(event.job_id, 'overrun', run_time)
+    elif event.code == EVENT_JOB_MISSED:
+        logger.warning(f"Job {event.job_id} missed its run due at {run_time}")
+        job_history.record_skipped(event.job_id, 'missed', run_time)
+
+
+def _prefetch_listener(event):
+    ''' Schedules the next prefetch once a sync run is over (its next run time is final by then). '''
+    if event.job_id == SYNC_JOB_ID:
+        schedule_prefetch()
+
+
+def create_scheduler() -> BackgroundScheduler:
+    ''' Builds the background scheduler with the persistent job store and the job defaults. '''
+    global _scheduler
+    scheduler = BackgroundScheduler(jobstores={'default': JsonJobStore()}, job_defaults=JOB_DEFAULTS)
+    instrument_scheduler(scheduler)
+    scheduler.add_listener(_history_listener, EVENT_JOB_MAX_INSTANCES | EVENT_JOB_MISSED)
+    scheduler.add_listener(_prefetch_listener, EVENT_JOB_EXECUTED | EVENT_JOB_ERROR)
+    _scheduler = scheduler
+    return scheduler
+
+
+def schedule_job(scheduler, job_id: str, minutes: int):
+    ''' Adds or replaces a job with a new interval. Returns the job. '''
+    job = scheduler.add_job(
+        func=JOB_FUNCS[job_id],
+        trigger='interval',
+        minutes=minutes,
+        id=job_id,
+        name=JOB_NAMES[job_id],
+        replace_existing=True
+    )
+    logger.info(f"{JOB_NAMES[job_id]} job scheduled with {minutes} minute interval")
+    return job
+
+
+def ensure_job(scheduler, job_id: str, minutes: int):
+    '''
+    Keeps a persisted job as is when its interval is unchanged, so a restart neither resets its
+    next run time nor forgets a run that came due while the server was down. Otherwise (re)schedules it.
+    '''
+    job = scheduler.get_job(job_id)
+    if job is not None and getattr(job.trigger, 'interval', None) == timedelta(minutes=minutes):
+        logger.info(f"{JOB_NAMES[job_id]} job restored, next run at {job.next_run_time}")
+        return job
+    return schedule_job(scheduler, job_id, minutes)
+
+
+def remove_job(scheduler, job_id: str) -> bool:
+    ''' Removes a job if it is scheduled. Returns True when the job is no longer scheduled. '''
+    try:
+        scheduler.remove_job(job_id)
+    except JobLookupError:
+        pass
+    return scheduler.get_job(job_id) is None
+
+
+def schedule_prefetch():
+    '''
+    Schedules the one-off prefetch job SYNC_PREFETCH_LEAD_MINUTES before the next sync run. Removes it when
+    prefetching is disabled, the sync is not scheduled, or the sync is due sooner than the lead time.
+    '''
+    if _scheduler is None:
+        return
+    sync_job = _scheduler.get_job(SYNC_JOB_ID)
+    if not Config.SYNC_PREFETCH_ENABLED or sync_job is None or sync_job.next_run_time is None:
+        remove_job(_scheduler, PREFETCH_JOB_ID)
+        return
+    run_date = sync_job.next_run_time - timedelta(minutes=Config.SYNC_PREFETCH_LEAD_MINUTES)
+    if run_date <= datetime.now(_scheduler.timezone):
+        remove_job(_scheduler, PREFETCH_JOB_ID)
+        return
+    _scheduler.add_job(
+        func=JOB_FUNCS[PREFETCH_JOB_ID],
+        trigger='date',
+        run_date=run_date,
+        id=PREFETCH_JOB_ID,
+        name=JOB_NAMES[PREFETCH_JOB_ID],
+        replace_existing=True
+    )
+    logger.info(f"{JOB_NAMES[PREFETCH_JOB_ID]} job scheduled at {run_date}")
@@ -0,0 +1,67 @@
+"""
+File lock based leader election for the scheduled jobs.
+
+Exactly one process may run the APScheduler jobs. Whichever process holds LEADER_LOCK_FILE is the
+leader; the OS releases the lock when the process exits (or crashes), so a standby process takes over
+on its next retry. Used by the scheduler worker and, with SCHEDULER_MODE=elected, by the web processes.
+"""
+
+import logging
+import os
+import threading
+
+from filelock import FileLock, Timeout
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class LeaderElection:
+    def __init__(self, lock_file: str = Config.LEADER_LOCK_FILE, retry_seconds: float = Config.LEADER_RETRY_SECONDS):
+        # not thread local: the lock is taken on a background thread and held for the process lifetime
+        self.lock = FileLock(lock_file, thread_local=False)
+        self.retry_seconds = retry_seconds
+        self._stopped = threading.Event()
+
+    @property
+    def is_leader(self) -> bool:
+        return self.lock.is_locked
+
+    def try_acquire(self) -> bool:
+        ''' Takes the leadership if nobody holds it. Returns True when this process is the leader. '''
+        if self.is_leader:
+            return True
+        try:
+            self.lock.acquire(timeout=0)
+        except Timeout:
+            return False
+        logger.info(f"Process {os.getpid()} elected scheduler leader")
+        return True
+
+    def wait(self) -> bool:
+        ''' Blocks until this process is the leader. Returns False if stopped first. '''
+        logged = False
+        while not self._stopped.is_set():
+            if self.try_acquire():
+                return True
+            if not logged:
+                logger.info(f"Process {os.getpid()} standing by, another process runs the scheduled jobs")
+                logged = True
+            self._stopped.wait(self.retry_seconds)
+        return False
+
+    def run_when_elected(self, on_elected) -> threading.Thread:
+        ''' Waits for the leadership on a background thread, then calls on_elected() once. '''
+        def _run():
+            if self.wait():
+                on_elected()
+
+        thread = threading.Thread(target=_run, name='leader-election', daemon=True)
+        thread.start()
+        return thread
+
+    def release(self):
+        self._stopped.set()
+        if self.is_leader:
+            self.lock.release(force=True)
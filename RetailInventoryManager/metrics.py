@@ -0,0 +1,156 @@
+"""
+Metric definitions and instrumentation hooks for the Retail Inventory Manager.
+
+Everything records into the shared common.Utils.Metrics registry (the Fishbowl session and email
+client already record their own call latency there) and is exposed by the /metrics endpoint in app.py.
+ServerTimingMiddleware wraps the Flask WSGI app to time each request and report a Server-Timing header.
+"""
+
+from datetime import datetime
+import time
+
+from apscheduler.events import EVENT_JOB_SUBMITTED, EVENT_JOB_MAX_INSTANCES, EVENT_JOB_MISSED
+from flask import request, g, before_render_template, template_rendered
+
+from common.Utils.Metrics import (REGISTRY, BYTE_BUCKETS, CONTENT_TYPE, render_metrics,
+                                  start_timings, stop_timings, record_timing)
+
+# Server-Timing metric name -> description, in header order.
+SERVER_TIMINGS = {
+    'data': 'Data store',
+    'fishbowl': 'Fishbowl',
+    'render': 'Template render',
+    'email': 'Email'
+}
+
+SYNC_PHASE_SECONDS = REGISTRY.histogram(
+    'sync_phase_seconds', 'Duration of each sync / sales check phase in seconds.', ('job', 'phase'))
+DATASTORE_SECONDS = REGISTRY.histogram(
+    'datastore_op_seconds', 'JSON data store read/write latency in seconds.', ('store', 'op'), timing='data')
+DATASTORE_BYTES = REGISTRY.histogram(
+    'datastore_op_bytes', 'JSON data store read/write size in bytes.', ('store', 'op'), BYTE_BUCKETS)
+SCHEDULER_JOB_LAG_SECONDS = REGISTRY.histogram(
+    'scheduler_job_lag_seconds', 'Delay between a job\'s scheduled run time and its submission.', ('job',))
+SCHEDULER_JOB_OVERRUNS = REGISTRY.counter(
+    'scheduler_job_overruns', 'Scheduled runs skipped because the previous run was still going.', ('job',))
+SCHEDULER_JOB_MISSED = REGISTRY.counter(
+    'scheduler_job_missed', 'Scheduled runs missed past their misfire grace time.', ('job',))
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    'http_request_seconds', 'HTTP request latency in seconds by route.', ('method', 'route', 'status'))
+EMAIL_SEND_SECONDS = REGISTRY.histogram(
+    'email_send_seconds', 'SMTP2GO email send latency in seconds.', ('source',), timing='email')
+SYNC_IMPORTS = REGISTRY.counter(
+    'sync_imports', 'Sync import phases by outcome (imported, unchanged).', ('job', 'outcome'))
+SYNC_PREFETCH = REGISTRY.counter(
+    'sync_prefetch', 'Prefetched sync inputs by outcome (used, stale, expired).', ('outcome',))
+WEBHOOK_DELIVERIES = REGISTRY.counter(
+    'webhook_deliveries', 'Change webhook deliveries by target and outcome (success, failure).', ('target', 'outcome'))
+WEBHOOK_LAG_EVENTS = REGISTRY.gauge(
+    'webhook_lag_versions', 'Inventory versions not yet delivered to a webhook target.', ('target',))
+WEBHOOK_LAG_SECONDS = REGISTRY.gauge(
+    'webhook_lag_seconds', 'Age of the oldest change not yet delivered to a webhook target.', ('target',))
+BULKHEAD_INFLIGHT = REGISTRY.gauge(
+    'bulkhead_in_flight', 'Calls running or queued inside a bulkhead.', ('bulkhead',))
+BULKHEAD_REJECTED = REGISTRY.counter(
+    'bulkhead_rejected', 'Calls rejected by a bulkhead (full, queue_timeout, timeout).', ('bulkhead', 'reason'))
+
+
+def _scheduler_listener(event):
+    ''' APScheduler listener recording job lag, overruns and misses. '''
+    if event.code == EVENT_JOB_SUBMITTED:
+        for run_time in event.scheduled_run_times:
+            lag = (datetime.now(run_time.tzinfo) - run_time).total_seconds()
+            SCHEDULER_JOB_LAG_SECONDS.observe(max(lag, 0), job=event.job_id)
+    elif event.code == EVENT_JOB_MAX_INSTANCES:
+        SCHEDULER_JOB_OVERRUNS.inc(job=event.job_id)
+    elif event.code == EVENT_JOB_MISSED:
+        SCHEDULER_JOB_MISSED.inc(job=event.job_id)
+
+
+def instrument_scheduler(scheduler):
+    ''' Hooks the metric listener into an APScheduler scheduler. '''
+    scheduler.add_listener(_scheduler_listener, EVENT_JOB_SUBMITTED | EVENT_JOB_MAX_INSTANCES | EVENT_JOB_MISSED)
+
+
+def _server_timing_header(timings: dict, total: float) -> str:
+    ''' Formats collected timings (seconds) as a Server-Timing header value (milliseconds). '''
+    parts = []
+    for name, description in SERVER_TIMINGS.items():
+        if name in timings:
+            parts.append(f'{name};dur={timings[name] * 1000:.1f};desc="{description}"')
+    parts.append(f'total;dur={total * 1000:.1f};desc="Total"')
+    return ', '.join(parts)
+
+
+class ServerTimingMiddleware:
+    '''
+    WSGI middleware around the Flask app. Records request latency by route rule and adds a Server-Timing
+    header breaking the request down into data store, Fishbowl, template render and total time.
+    '''
+
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+
+    def __call__(self, environ, start_response):
+        start_timings()
+        start = time.perf_counter()
+        status = {'code': '500'}
+
+        def _start_response(status_line, headers, exc_info=None):
+            status['code'] = status_line.split(' ', 1)[0]
+            headers = list(headers)
+            headers.append(('Server-Timing', _server_timing_header(stop_timings(), time.perf_counter() - start)))
+            return start_response(status_line, headers, exc_info)
+
+        try:
+            body = self.wsgi_app(environ, _start_response)
+        except Exception:
+            stop_timings()
+            self._observe(environ, status['code'], start)
+            raise
+        return _ObservedBody(body, lambda: self._observe(environ, status['code'], start))
+
+    @staticmethod
+    def _observe(environ, status_code, start):
+        HTTP_REQUEST_SECONDS.observe(time.perf_counter() - start, method=environ.get('REQUEST_METHOD', ''),
+                                     route=environ.get('inventory.route', 'unmatched'), status=status_code)
+
+
+class _ObservedBody:
+    ''' Passes a WSGI response body through and calls on_close once the server closes it. '''
+
+    def __init__(self, body, on_close):
+        self._body = body
+        self._on_close = on_close
+
+    def __iter__(self):
+        return iter(self._body)
+
+    def close(self):
+        try:
+            if hasattr(self._body, 'close'):
+                self._body.close()
+        finally:
+            stop_timings()
+            self._on_close()
+
+
+def instrument_app(app):
+    ''' Wraps the Flask app in ServerTimingMiddleware and hooks route tagging and template render timing. '''
+
+    @app.before_request
+    def _tag_route():
+        # the middleware only sees the raw path, tag the rule so labels stay low cardinality
+        request.environ['inventory.route'] = request.url_rule.rule if request.url_rule else 'unmatched'
+
+    def _render_started(sender, template, context, **extra):
+        g.render_start = time.perf_counter()
+
+    def _render_finished(sender, template, context, **extra):
+        render_start = g.pop('render_start', None)
+        if render_start is not None:
+            record_timing('render', time.perf_counter() - render_start)
+
+    before_render_template.connect(_render_started, app, weak=False)
+    template_rendered.connect(_render_finished, app, weak=False)
+    app.wsgi_app = ServerTimingMiddleware(app.wsgi_app)
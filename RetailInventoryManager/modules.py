@@ -1,4 +1,6 @@
-import pandas
+import csv
+import hashlib
+import json
 import os
 from pathlib import Path
 from data import ErrorLogger
@@ -29,8 +31,11 @@ def output_csv(headers:list,  data:list[list], name:str="default.csv") -> str:
             os.remove(output_file)
 
 
-        framed = pandas.DataFrame(data=data, columns=headers)
-        framed.to_csv(output_file, index=False)  # index=False omits the row numbers
+        # written row by row, no DataFrame copy of the data
+        with open(output_file, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(headers)
+            writer.writerows(data)
         return f'Successfully exported {name} to {output_dir}.'
     except Exception as e:
         error_logger.log_error(
@@ -79,4 +84,18 @@ def create_matrix(headers, data) -> list:
             source='modules.py:create_matrix',
             details={'headers': headers, 'data_count': len(data) if data else 0, 'error': str(e)}
         )
-        return None
\ No newline at end of file
+        return None
+
+def hash_matrix(matrix: list, ignore: tuple = ('Note',)) -> str:
+    '''
+    Stable sha256 of an import matrix (header row first). Columns in ignore are left out, so two imports
+    that only differ by their note text hash the same.
+    '''
+    headers = matrix[0]
+    keep = [i for i, header in enumerate(headers) if header not in ignore]
+    digest = hashlib.sha256()
+    for row in matrix:
+        values = [row[i] if i < len(row) else '' for i in keep]
+        digest.update(json.dumps(values, default=str, separators=(',', ':')).encode())
+        digest.update(b'\n')
+    return digest.hexdigest()
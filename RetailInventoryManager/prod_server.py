@@ -6,13 +6,27 @@ from any device on the same network.
 
 To run: python prod_server.py
 To access from other devices: http://<your-computer-ip>:5000
+
+The sync and sales jobs run in a separate scheduler worker process (worker.py). By default this
+script starts it alongside the web server, set START_WORKER=False when the worker is run on its own
+(python worker.py). With SCHEDULER_MODE=embedded the jobs run inside this process instead.
+
+Set WEB_WORKERS=N to serve from N web processes sharing one listening socket (WEB_THREADS threads each).
+Multi-process serving needs SCHEDULER_MODE=worker or SCHEDULER_MODE=elected, where the web processes
+elect the one that runs the jobs (see leader.py).
 """
 
 from waitress import serve
-from app import app
+from app import app, start_scheduler
+from config import Config
+import multiprocessing
+import os
+import secrets
 import socket
 import logging
 
+import worker
+
 # Setup logging
 logging.basicConfig(
     level=logging.INFO,
@@ -32,6 +46,14 @@ def get_local_ip():
     except Exception:
         return "Unable to determine IP"
 
+# child processes are always spawned: forked children would inherit the parent's data store file locks
+mp_context = multiprocessing.get_context('spawn')
+
+def serve_web(sock, threads):
+    """Entry point of one web process in multi-worker mode: serves the app on the shared socket"""
+    start_scheduler()
+    serve(app, sockets=[sock], threads=threads)
+
 if __name__ == '__main__':
     host = '0.0.0.0'  # Listen on all network interfaces
     port = 5000
@@ -48,5 +70,44 @@ if __name__ == '__main__':
     logger.info("Press Ctrl+C to stop the server")
     logger.info("=" * 70)
 
+    if Config.SCHEDULER_MODE == 'embedded' and Config.WEB_WORKERS > 1:
+        raise SystemExit("SCHEDULER_MODE=embedded runs a single web process, "
+                         "use SCHEDULER_MODE=worker or SCHEDULER_MODE=elected with WEB_WORKERS > 1")
+
+    if Config.SCHEDULER_MODE != 'embedded' and not Config.WORKER_AUTHKEY:
+        if Config.SCHEDULER_MODE == 'worker' and not Config.START_WORKER:
+            raise SystemExit("Set WORKER_AUTHKEY to the secret of the scheduler worker running on its own")
+        # every process that talks to the worker is started from here: a key made for this run is enough
+        Config.WORKER_AUTHKEY = os.environ['WORKER_AUTHKEY'] = secrets.token_hex(32)
+
+    worker_process = None
+    web_processes = []
+    if Config.SCHEDULER_MODE == 'embedded':
+        logger.info("Scheduler running inside the web process (embedded mode)")
+    elif Config.SCHEDULER_MODE == 'elected':
+        logger.info("Scheduler running in the web process elected leader")
+    elif Config.START_WORKER:
+        worker_process = mp_context.Process(target=worker.main, name='scheduler-worker', daemon=True)
+        worker_process.start()
+        logger.info(f"Scheduler worker started (pid {worker_process.pid})")
+    else:
+        logger.info(f"Using the scheduler worker at {Config.WORKER_HOST}:{Config.WORKER_PORT}")
+
     # Run the production server
-    serve(app, host=host, port=port, threads=6)
+    try:
+        if Config.WEB_WORKERS > 1:
+            sock = socket.create_server((host, port))
+            for index in range(Config.WEB_WORKERS):
+                process = mp_context.Process(target=serve_web, args=(sock, Config.WEB_THREADS), name=f'web-{index}')
+                process.start()
+                web_processes.append(process)
+            logger.info(f"Serving from {Config.WEB_WORKERS} web processes with {Config.WEB_THREADS} threads each")
+            for process in web_processes:
+                process.join()
+        else:
+            start_scheduler()
+            serve(app, host=host, port=port, threads=Config.WEB_THREADS)
+    finally:
+        for process in web_processes + ([worker_process] if worker_process is not None else []):
+            process.terminate()
+            process.join(timeout=30)
@@ -0,0 +1,97 @@
+"""
+On-demand profiling helpers used by the admin profiling endpoint.
+
+- sample_stacks(): samples the call stacks of every running thread (waitress request threads, scheduler
+  jobs) for N seconds and reports the hottest frames and stacks.
+- profile_call(): runs a single callable (e.g. one sync run) under cProfile and returns the pstats report.
+
+Only one profile can run at a time so the profiler itself can't pile up on a slow server.
+"""
+
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+
+PROFILE_LOCK = threading.Lock()
+MAX_PROFILE_SECONDS = 60
+
+
+class ProfilerBusy(Exception):
+    """Raised when a profile is requested while another one is running"""
+    pass
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f'{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})'
+
+
+def sample_stacks(seconds: float, interval: float = 0.005, limit: int = 40) -> str:
+    '''
+    Samples every thread's stack (except the caller's) every `interval` seconds for `seconds` seconds.
+    Returns a text report of the top leaf frames and the top stacks in folded format
+    (thread;outer;...;inner count), which can be fed straight into flamegraph.pl.
+    '''
+    if not PROFILE_LOCK.acquire(blocking=False):
+        raise ProfilerBusy('A profile is already running')
+    try:
+        seconds = min(max(seconds, 0.1), MAX_PROFILE_SECONDS)
+        own_ident = threading.get_ident()
+        stacks = Counter()
+        leaves = Counter()
+        samples = 0
+
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            thread_names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                stack.reverse()
+                leaves[stack[-1]] += 1
+                stacks[';'.join([thread_names.get(ident, str(ident))] + stack)] += 1
+            samples += 1
+            time.sleep(interval)
+    finally:
+        PROFILE_LOCK.release()
+
+    out = io.StringIO()
+    out.write(f'Stack sample profile: {seconds}s, {samples} samples every {interval * 1000:.1f}ms\n')
+    out.write('Idle threads show up as wait/select frames.\n\n')
+    out.write('Top leaf frames (samples, frame):\n')
+    for label, count in leaves.most_common(limit):
+        out.write(f'{count:>8}  {label}\n')
+    out.write('\nTop stacks (folded):\n')
+    for stack, count in stacks.most_common(limit):
+        out.write(f'{stack} {count}\n')
+    return out.getvalue()
+
+
+def profile_call(func, *args, sort: str = 'cumulative', limit: int = 60, **kwargs):
+    '''
+    Runs func(*args, **kwargs) under cProfile. Returns (result, report) where report is the pstats
+    output sorted by `sort` and limited to the top `limit` functions.
+    '''
+    if not PROFILE_LOCK.acquire(blocking=False):
+        raise ProfilerBusy('A profile is already running')
+    try:
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        result = profiler.runcall(func, *args, **kwargs)
+        elapsed = time.perf_counter() - start
+    finally:
+        PROFILE_LOCK.release()
+
+    out = io.StringIO()
+    out.write(f'cProfile of {getattr(func, "__qualname__", func)}: {elapsed:.3f}s wall time\n\n')
+    pstats.Stats(profiler, stream=out).sort_stats(sort).print_stats(limit)
+    return result, out.getvalue()
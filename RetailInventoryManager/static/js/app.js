@@ -362,9 +362,9 @@ setInterval(async function() {
                     
                     // Update color based on quantity
                     qtyDisplay.classList.remove('text-red-600', 'text-yellow-600', 'text-green-600');
-                    if (newQty <= 0) {
+                    if (newQty <= (config.sold_out_threshold ?? 0)) {
                         qtyDisplay.classList.add('text-red-600');
-                    } else if (newQty <= 10) {
+                    } else if (newQty <= (config.low_stock_threshold ?? 10)) {
                         qtyDisplay.classList.add('text-yellow-600');
                     } else {
                         qtyDisplay.classList.add('text-green-600');
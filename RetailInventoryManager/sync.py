@@ -1,12 +1,13 @@
 from datetime import datetime, timedelta
-from typing import Dict, List
+from typing import Dict, List, Optional
 from config import Config
-from data import InventoryData, ErrorLogger
+from data import InventoryData, ErrorLogger, ProductCatalog, SyncCheckpoint
 from common.Clients.Fishbowl.FishbowlSession import FishbowlSession, CallFailure
 import logging
 import time
 from pathlib import Path
-from modules import output_csv, create_matrix
+from modules import output_csv, create_matrix, hash_matrix
+from metrics import SYNC_PHASE_SECONDS, SYNC_PREFETCH, SYNC_IMPORTS
 import threading
 from datetime import date
 
@@ -14,6 +15,13 @@ SALES_CHECK_LOCK = threading.Lock()
 ROOT = Path(__file__).resolve().parent
 QOH_QUERY = ROOT / "queries" / "QOH.sql"
 CYCLE_OUT_QUERY = ROOT / "queries" / "cycle_out.sql"
+# SKUs per Product.num IN (...) query when validating in bulk
+SKU_QUERY_CHUNK_SIZE = 200
+IMPORT_HEADERS = ['PartNumber', 'Location', 'Qty', 'Note',
+                  'Tracking-Lot Number', 'Tracking-Revision Level',
+                  'Tracking-Expiration Date']
+# staged sync phases, in order. every phase but the last is checkpointed (see SyncCheckpoint)
+SYNC_PHASES = ['extract', 'reconcile', 'build_matrix', 'import']
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -22,6 +30,9 @@ class FishbowlSync:
     def __init__(self):
         self.data = InventoryData()
         self.error_logger = ErrorLogger()
+        self.catalog = ProductCatalog()
+        self.checkpoint = SyncCheckpoint()
+        self.prefetch = SyncCheckpoint(Config.SYNC_PREFETCH_FILE, Config.SYNC_PREFETCH_MAX_AGE_MINUTES)
         self.config = Config()
         self.is_test_db = Config.USE_TEST_DB
 
@@ -113,6 +124,70 @@ class FishbowlSync:
         finally:
             session.logout()
 
+    def get_skus_info(self, skus: List[str]) -> dict:
+        '''
+        Bulk version of get_sku_info: validates many SKUs with one login and one Product JOIN Part query per
+        SKU_QUERY_CHUNK_SIZE SKUs. Returns {'success', 'found': {sku: {'part_num', 'is_serialized'}}, 'message'}.
+        SKUs missing from 'found' are not active parts/products in Fishbowl.
+        '''
+        session = None
+        found = {}
+        try:
+            session = FishbowlSession(is_test_db=self.is_test_db, auto_login=True, login_attempts=2, attempt_wait_secs=20)
+
+            if not session.is_logged_in():
+                raise CallFailure("Failed to login to Fishbowl")
+
+            for start in range(0, len(skus), SKU_QUERY_CHUNK_SIZE):
+                chunk = skus[start:start + SKU_QUERY_CHUNK_SIZE]
+                sku_list = ", ".join("'" + sku.replace("'", "''") + "'" for sku in chunk)
+                query = f'''
+                    SELECT 
+                        Product.num as Sku, 
+                        Part.num as PartNumber,
+                        Part.serializedFlag AS SnFlag
+                    FROM 
+                        Product
+                        JOIN Part ON Product.partId = Part.id
+                    WHERE 
+                        Part.activeFlag = 1
+                        AND Product.activeFlag = 1
+                        AND Product.num IN ({sku_list})
+                    ;
+                '''
+
+                logger.info(f"Running bulk product check query for {len(chunk)} SKUs")
+                result = session.query(query)
+                for row in (result or {}).get('data') or []:
+                    found[str(row['Sku']).upper()] = {
+                        'part_num': row['PartNumber'],
+                        'is_serialized': row['SnFlag']
+                    }
+
+            logger.info(f"Validated {len(found)} of {len(skus)} SKUs")
+            return {
+                'success': True,
+                'found': found,
+                'message': f'Found {len(found)} of {len(skus)} SKUs as active parts and products.'
+            }
+
+        except Exception as e:
+            logger.error(f"Error validating SKUs in bulk: {e}")
+            self.error_logger.log_error(
+                error_type='fishbowl_api_error' if isinstance(e, CallFailure) else 'fishbowl_query_error',
+                message=f"Bulk SKU validation failed: {str(e)}",
+                source='sync.py:get_skus_info',
+                details={'sku_count': len(skus), 'reason': str(e)}
+            )
+            return {
+                'success': False,
+                'found': {},
+                'message': f'Fishbowl API call failed: {str(e)}'
+            }
+        finally:
+            if session is not None:
+                session.logout()
+
     def get_orders_since(self, since_datetime: datetime) -> List[Dict]:
         '''
         Query Fishbowl for orders created since the given datetime.
@@ -179,18 +254,15 @@ class FishbowlSync:
         finally:
             session.logout()
 
-    def get_cycle_data(self, exclude:dict={}) -> list[dict]:
-        ''' Calls and combines the two Fishbowl inventory queries: qoh and out_data '''
-        try:
-            # open the queries
-            cycle_out_path = open(CYCLE_OUT_QUERY, 'r')
-            cycle_out_query = cycle_out_path.read()
-            qoh_path = open(QOH_QUERY, 'r')
-            qoh_query = qoh_path.read()
-
-            # Fetch data
-            session = FishbowlSession(is_test_db=self.is_test_db, auto_login=True, login_attempts=2, attempt_wait_secs=20)
+    def fetch_cycle_queries(self) -> tuple:
+        ''' Runs the two Fishbowl inventory queries. Returns (qoh records, cycle out records), raises on failure. '''
+        with open(CYCLE_OUT_QUERY, 'r') as f:
+            cycle_out_query = f.read()
+        with open(QOH_QUERY, 'r') as f:
+            qoh_query = f.read()
 
+        session = FishbowlSession(is_test_db=self.is_test_db, auto_login=True, login_attempts=2, attempt_wait_secs=20)
+        try:
             if not session.is_logged_in():
                 raise CallFailure("Failed to login to Fishbowl")
 
@@ -199,56 +271,55 @@ class FishbowlSync:
             cycle_out_data = session.query(cycle_out_query)
             logger.info(f"Executing QOH query...")
             qoh_data = session.query(qoh_query)
-
+        finally:
             session.logout()
 
-            # ensure there is data in the response
-            if cycle_out_data and qoh_data and cycle_out_data.get('data') and qoh_data.get('data'):
-                logger.info(f"Gathered {len(qoh_data['data'])} retail inventory records.")
-                cycle_in_inv = qoh_data.get('data')
-                cycle_out_inv = cycle_out_data.get('data')
-            else:
-                logger.info("No inventory found")
-                raise Exception("There are no inventory records present in the Fishbowl query. Sync failed.")
-
+        # ensure there is data in the response
+        if cycle_out_data and qoh_data and cycle_out_data.get('data') and qoh_data.get('data'):
+            logger.info(f"Gathered {len(qoh_data['data'])} retail inventory records.")
+            return qoh_data.get('data'), cycle_out_data.get('data')
+        logger.info("No inventory found")
+        raise Exception("There are no inventory records present in the Fishbowl query. Sync failed.")
 
-            #               union both queries for the final result:
-            # Existing part numbers
-            cycle_in_products = {item['PartNumber'] for item in cycle_in_inv if item['PartNumber']}
-            to_remove = set()
-            processed = set()
-
-            for item in cycle_out_inv:
-                part_num = item.get('PartNumber')
-                if not part_num or part_num in processed:
-                    continue
-                if part_num in exclude:     # override values inserted. 
-                    processed.add(part_num)
-                    cycle_in_inv.append(exclude[part_num])
-                    continue
+    def merge_cycle_data(self, cycle_in_inv: list, cycle_out_inv: list, exclude: dict = {}) -> list[dict]:
+        ''' Unions the qoh and cycle out records into the sync data. exclude maps part numbers to override records. '''
+        cycle_in_inv = list(cycle_in_inv)
+        # Existing part numbers
+        cycle_in_products = {item['PartNumber'] for item in cycle_in_inv if item['PartNumber']}
+        to_remove = set()
+        processed = set()
 
+        for item in cycle_out_inv:
+            part_num = item.get('PartNumber')
+            if not part_num or part_num in processed:
+                continue
+            if part_num in exclude:     # override values inserted. 
                 processed.add(part_num)
+                cycle_in_inv.append(exclude[part_num])
+                continue
 
-                # Remove serialized items that already existed.
-                if part_num in cycle_in_products and item.get('SnFlag') == 1:
-                    if(part_num == 'R0166'):
-                        print('YUPPPPP')
-                    to_remove.add(part_num)
-                # Add new items not already in inventory (non-serialized)
-                elif part_num not in cycle_in_products and item.get('SnFlag') == 0:
-                    # override if sku is in the excluded dict.
-                    cycle_in_inv.append(item)
-                    cycle_in_products.add(part_num)
+            processed.add(part_num)
 
-            # Remove flagged serialized items
-            cycle_in_inv = [i for i in cycle_in_inv if i['PartNumber'] not in to_remove]
+            # Remove serialized items that already existed.
+            if part_num in cycle_in_products and item.get('SnFlag') == 1:
+                to_remove.add(part_num)
+            # Add new items not already in inventory (non-serialized)
+            elif part_num not in cycle_in_products and item.get('SnFlag') == 0:
+                cycle_in_inv.append(item)
+                cycle_in_products.add(part_num)
 
-            # Final deduplication by PartNumber (removes one lingering duplicate)
-            unique_inv = {item['PartNumber']: item for item in cycle_in_inv if item.get('PartNumber')}
-            cycle_in_inv = list(unique_inv.values())
+        # Remove flagged serialized items
+        cycle_in_inv = [i for i in cycle_in_inv if i['PartNumber'] not in to_remove]
 
-            return cycle_in_inv
+        # Final deduplication by PartNumber (removes one lingering duplicate)
+        unique_inv = {item['PartNumber']: item for item in cycle_in_inv if item.get('PartNumber')}
+        return list(unique_inv.values())
 
+    def get_cycle_data(self, exclude:dict={}) -> list[dict]:
+        ''' Calls and combines the two Fishbowl inventory queries: qoh and out_data '''
+        try:
+            cycle_in_inv, cycle_out_inv = self.fetch_cycle_queries()
+            return self.merge_cycle_data(cycle_in_inv, cycle_out_inv, exclude)
         except Exception as e:
             print(f'Failed to create cycle data: {e}')
             self.error_logger.log_error(
@@ -258,11 +329,56 @@ class FishbowlSync:
                 details={'error': str(e)}
             )
             return []
+
+    def get_inventory_marker(self, part_nums: list = None, up_to: int = None) -> int:
+        '''
+        Cheap change check for the Fishbowl inventory: the last inventory log id (any quantity change adds a log
+        row). With part_nums, only the log rows of those parts count, in the SYNC_MARKER_LOCATION_GROUPS when set,
+        so stock movements the sync queries do not read leave the marker alone. up_to caps the id.
+        '''
+        filters = []
+        joins = ''
+        if part_nums is not None:
+            quoted = ', '.join("'" + str(num).replace("'", "''") + "'" for num in sorted(part_nums)) or "''"
+            joins += ' JOIN part ON part.id = inventorylog.partid'
+            filters.append(f'part.num IN ({quoted})')
+            if Config.SYNC_MARKER_LOCATION_GROUPS:
+                groups = ', '.join("'" + name.replace("'", "''") + "'" for name in Config.SYNC_MARKER_LOCATION_GROUPS)
+                joins += ' JOIN locationgroup ON locationgroup.id = inventorylog.locationgroupid'
+                filters.append(f'locationgroup.name IN ({groups})')
+        if up_to is not None:
+            filters.append(f'inventorylog.id <= {int(up_to)}')
+        where = f" WHERE {' AND '.join(filters)}" if filters else ''
+
+        session = FishbowlSession(is_test_db=self.is_test_db, auto_login=True, login_attempts=2, attempt_wait_secs=20)
+        try:
+            if not session.is_logged_in():
+                raise CallFailure("Failed to login to Fishbowl")
+            result = session.query(f'SELECT COALESCE(MAX(inventorylog.id), 0) AS last_id FROM inventorylog{joins}{where};')
         finally:
-            # close the queries
-            cycle_out_path.close()
-            qoh_path.close()
             session.logout()
+        if not result or not result.get('data'):
+            raise Exception("The inventory log query returned no data.")
+        return int(result['data'][0]['last_id'])
+
+    def build_overrides(self) -> dict:
+        ''' Override records for every locally managed SKU, keyed by SKU. Used by the manual sync. '''
+        company = self.config.COMPANY_NAME
+        override_skus = self.data.get_all_skus()
+        override = {}
+        today_str = date.today().strftime("%Y-%m-%d")
+        for sku in override_skus:
+            override[sku] = {
+                'PartNumber': override_skus[sku]['part_num'],
+                'SnFlag': override_skus[sku]['sn_flag'],
+                'Location':f'{company} / Main-Retail Website Inventory',
+                'Qty': override_skus[sku]['available_qty'],
+                'Note': f'Retail Website Inventory API Manual Override: {today_str}',
+                'Tracking-Lot Number': '',
+                'Tracking-Revision Level': '',
+                'Tracking-Expiration Date': ''
+            }
+        return override
 
     def cycle_inventory(self, matrix:list) -> list[dict]:
         ''' Cycles inventory out of the retail inventory location in Fishbowl. '''
@@ -300,6 +416,125 @@ class FishbowlSync:
         finally:
             session.logout()
 
+    def check_sku(self, sku: str, fallback=None) -> dict:
+        '''
+        Validates a SKU from the local catalog mirror, same result shape as get_sku_info plus 'source'.
+        Falls through to Fishbowl (fallback, defaults to get_sku_info) on a miss, and caches misses
+        Fishbowl confirmed for CATALOG_NEGATIVE_TTL_SECONDS.
+        '''
+        record = self.catalog.lookup(sku)
+        if record is not None:
+            active = bool(record['product_active'] and record['part_active'])
+            return {
+                'success': True,
+                'validated_sku': active,
+                'is_serialized': record['is_serialized'] if active else None,
+                'part_num': record['part_num'] if active else None,
+                'source': 'catalog',
+                'message': 'Found and validated the SKU.' if active else
+                           f'{sku} is not an active part and product in Fishbowl.'
+            }
+
+        if self.catalog.is_known_miss(sku):
+            return {
+                'success': True,
+                'validated_sku': False,
+                'is_serialized': None,
+                'part_num': None,
+                'source': 'negative_cache',
+                'message': f'Did not find {sku} as an active part and product in Fishbowl. Ensure the SKU is an exact match for an active part/product.'
+            }
+
+        result = (fallback or self.get_sku_info)(sku)
+        result['source'] = 'fishbowl'
+        if result.get('success') and not result.get('validated_sku'):
+            self.catalog.remember_miss(sku)
+        return result
+
+    def refresh_catalog(self, full: bool = False) -> Dict:
+        '''
+        Refreshes the local catalog mirror. Incremental by default: only products or parts modified since the
+        watermark (highest date last modified seen). A full refresh runs when there is no watermark yet or the
+        last full refresh is older than CATALOG_FULL_REFRESH_HOURS, so deleted products drop out eventually.
+        '''
+        session = None
+        try:
+            stats = self.catalog.get_stats()
+            watermark = stats['watermark']
+            last_full = stats['last_full_refresh']
+            if not watermark or not last_full or \
+                    datetime.now() - datetime.fromisoformat(last_full) > timedelta(hours=Config.CATALOG_FULL_REFRESH_HOURS):
+                full = True
+
+            session = FishbowlSession(is_test_db=self.is_test_db, auto_login=True, login_attempts=2, attempt_wait_secs=20)
+            if not session.is_logged_in():
+                raise CallFailure("Failed to login to Fishbowl")
+
+            where = '' if full else f"""WHERE 
+                        Product.dateLastModified >= '{watermark}'
+                        OR Part.dateLastModified >= '{watermark}'"""
+            query = f'''
+                    SELECT 
+                        Product.num AS Sku,
+                        Part.num AS PartNumber,
+                        Part.serializedFlag AS SnFlag,
+                        Product.activeFlag AS ProductActive,
+                        Part.activeFlag AS PartActive,
+                        GREATEST(Product.dateLastModified, Part.dateLastModified) AS LastModified
+                    FROM 
+                        Product
+                        JOIN Part ON Product.partId = Part.id
+                    {where}
+                    ;
+                    '''
+
+            logger.info(f"Refreshing the product catalog ({'full' if full else f'since {watermark}'})")
+            with SYNC_PHASE_SECONDS.time(job='catalog_refresh', phase='query'):
+                result = session.query(query)
+
+            rows = []
+            new_watermark = None if full else watermark
+            for row in (result or {}).get('data') or []:
+                last_modified = str(row['LastModified']) if row.get('LastModified') else None
+                rows.append({
+                    'sku': str(row['Sku']).upper(),
+                    'part_num': row['PartNumber'],
+                    'is_serialized': bool(row['SnFlag']),
+                    'product_active': bool(row['ProductActive']),
+                    'part_active': bool(row['PartActive']),
+                    'last_modified': last_modified
+                })
+                if last_modified and (new_watermark is None or last_modified > new_watermark):
+                    new_watermark = last_modified
+
+            with SYNC_PHASE_SECONDS.time(job='catalog_refresh', phase='apply'):
+                updated = self.catalog.apply_changes(rows, new_watermark, full=full)
+
+            logger.info(f"Catalog refresh updated {updated} products")
+            return {
+                'success': True,
+                'full_refresh': full,
+                'products_updated': updated,
+                'watermark': new_watermark,
+                'message': f"Catalog {'fully' if full else 'incrementally'} refreshed, {updated} products updated"
+            }
+
+        except Exception as e:
+            logger.error(f"Catalog refresh failed: {e}")
+            self.error_logger.log_error(
+                error_type='fishbowl_api_error' if isinstance(e, CallFailure) else 'catalog_error',
+                message=f"Catalog refresh failed: {str(e)}",
+                source='sync.py:refresh_catalog',
+                details={'full': full, 'error': str(e)}
+            )
+            return {
+                'success': False,
+                'error': str(e)
+            }
+        finally:
+            if session is not None:
+                session.logout()
+
     def determine_sync(self) -> Dict:
         '''
         Main logic to determine the sync. Called by the sync now button and the scheduler jobs. 
@@ -342,6 +577,8 @@ class FishbowlSync:
 
                 # Get last sync time
                 config = self.data.get_config()
+                if config.get('sales_ingestion_mode', Config.SALES_INGESTION_MODE) == 'watermark':
+                    return self._run_sales_check_watermark(start_time)
                 last_check = config.get('last_check_run')
                 
                 if last_check:
@@ -353,11 +590,13 @@ class FishbowlSync:
                 logger.info(f"Querying orders since {since_datetime}")
                 
                 # Get orders from Fishbowl
-                orders = self.get_orders_since(since_datetime)
+                with SYNC_PHASE_SECONDS.time(job='sales_check', phase='query_orders'):
+                    orders = self.get_orders_since(since_datetime)
                 
                 if not orders:
                     logger.info("No new orders to process.")
                     self.data.update_config({'last_check_run': datetime.now().isoformat()})
+                    SYNC_PHASE_SECONDS.observe(time.time() - start_time, job='sales_check', phase='total')
 
                     # Format the last check datetime in a human-readable way
                     formatted_check_time = since_datetime.strftime('%B %d at %I:%M:%S %p')
@@ -372,6 +611,7 @@ class FishbowlSync:
                 # Process each SKU
                 skus_updated = 0
                 total_orders = 0
+                apply_start = time.time()
                 
                 for order in orders:
                     sku = order['sku']
@@ -400,6 +640,8 @@ class FishbowlSync:
                 # Update last sync time
                 self.data.update_config({'last_check_run': datetime.now().isoformat()})
                 end_time = time.time()
+                SYNC_PHASE_SECONDS.observe(end_time - apply_start, job='sales_check', phase='apply_orders')
+                SYNC_PHASE_SECONDS.observe(end_time - start_time, job='sales_check', phase='total')
                 run_duration = round(end_time - start_time, 2)
                 #run_duration = run_duration if run_duration > 0
                 
@@ -430,51 +672,189 @@ class FishbowlSync:
                     'error': str(e)
                 }
 
-    def _run_automated_sync(self):
-        ''' Runs the sync in automated system mode. '''
+    def _get_order_lines_after(self, session: FishbowlSession, after_id: int, started: str, limit: int,
+                               up_to_id: int = None, issued_since: datetime = None) -> List[Dict]:
+        '''
+        Keyset page of sales order lines on issued orders, soitem ids above after_id (and up to up_to_id) in id
+        order, none on orders issued before the ingestion started or, with issued_since, before that.
+        Cancelled and voided lines come back with qty 0, closed short lines with their fulfilled qty, so
+        changes of already applied lines can be corrected.
+        '''
+        bounds = f'AND soitem.id <= {int(up_to_id)}' if up_to_id is not None else ''
+        if issued_since is not None:
+            bounds += f" AND so.dateissued >= '{issued_since.strftime('%Y-%m-%d %H:%M:%S')}'"
+        query = f'''
+                SELECT 
+                    soitem.id AS id,
+                    so.id AS so_id,
+                    product.num AS sku,
+                    CASE
+                        WHEN so.statusid IN (80, 85, 90) OR soitem.statusid = 75 THEN 0
+                        WHEN soitem.statusid = 70 THEN soitem.qtyfulfilled
+                        ELSE soitem.qtyordered
+                    END AS qty,
+                    so.dateissued AS date_issued
+                FROM soitem 
+                    JOIN so ON so.id = soitem.soid
+                    JOIN product ON soitem.productid = product.id
+                WHERE 
+                    soitem.id > {int(after_id)} {bounds}
+                    AND so.dateissued IS NOT NULL
+                    AND so.dateissued >= '{started}'
+                    AND so.createdbyuserid IN (95, 25)
+                ORDER BY soitem.id
+                LIMIT {int(limit)}
+                ;
+                '''
+        result = session.query(query)
+        return result['data'] if result and result.get('data') else []
+
+    def _get_initial_soitem_id(self, session: FishbowlSession, since_datetime: datetime) -> int:
+        ''' Starting watermark for the first watermark run: the last order line issued before since_datetime. '''
+        query = f'''
+                SELECT COALESCE(MAX(soitem.id), 0) AS last_id
+                FROM soitem 
+                    JOIN so ON so.id = soitem.soid
+                WHERE so.dateissued < '{since_datetime.strftime('%Y-%m-%d %H:%M:%S')}'
+                ;
+                '''
+        result = session.query(query)
+        return int(result['data'][0]['last_id']) if result and result.get('data') else 0
+
+    def _apply_order_pages(self, session: FishbowlSession, after_id: int, started: str, last_id: int, totals: dict,
+                           up_to_id: int = None, issued_since: datetime = None) -> tuple:
+        '''
+        Reads and applies the keyset pages of order lines above after_id, adding the counts to totals. Pages
+        above the watermark move it. Returns (watermark, pages).
+        '''
+        cursor = after_id
+        pages = 0
+        while True:
+            with SYNC_PHASE_SECONDS.time(job='sales_check', phase='query_orders'):
+                lines = self._get_order_lines_after(session, cursor, started, Config.SALES_PAGE_SIZE,
+                                                    up_to_id=up_to_id, issued_since=issued_since)
+            if not lines:
+                break
+            for line in lines:
+                line['sku'] = str(line['sku'])
+                line['id'] = int(line['id'])
+            cursor = lines[-1]['id']
+            last_id = max(last_id, cursor)
+            with SYNC_PHASE_SECONDS.time(job='sales_check', phase='apply_orders'):
+                applied = self.data.apply_order_lines(lines, last_id)
+            for key in totals:
+                totals[key] += applied[key]
+            pages += 1
+            if len(lines) < Config.SALES_PAGE_SIZE:
+                break
+        return last_id, pages
+
+    def _run_sales_check_watermark(self, start_time: float) -> Dict:
+        '''
+        Incremental sales check: reads the order lines of issued orders above the soitem id watermark, plus a
+        lookback window below it (SALES_LOOKBACK_IDS ids, orders issued in the last SALES_LOOKBACK_MINUTES),
+        in keyset pages of SALES_PAGE_SIZE. Each page is applied together with the new watermark in one data
+        store write. Applied lines are recorded, so re-read lines are not decremented twice and only their qty
+        changes are applied. Called under SALES_CHECK_LOCK.
+        '''
+        session = FishbowlSession(is_test_db=self.is_test_db, auto_login=True, login_attempts=2, attempt_wait_secs=20)
         try:
-            print("\n AUTOMATIC SYNC TRIGGERED \n")
-            start_time = time.time()
+            if not session.is_logged_in():
+                raise CallFailure("Failed to login to Fishbowl")
 
-            # querying fishbowl and creating the sync data to cycle in. 
-            data = self.get_cycle_data()
+            ingestion = self.data.get_sales_ingestion()
+            last_id = ingestion.get('last_soitem_id')
+            started = ingestion.get('started')
+            if last_id is None or started is None:
+                # first run - start from the order lines of the last hour, like the timestamp mode
+                since = datetime.now() - timedelta(hours=1)
+                last_id = self._get_initial_soitem_id(session, since)
+                started = since.strftime('%Y-%m-%d %H:%M:%S')
+                self.data.start_sales_ingestion(last_id, started)
+                saved = self.data.get_sales_ingestion()
+                if saved.get('last_soitem_id') != last_id or saved.get('started') != started:
+                    raise Exception("The sales ingestion watermark was not saved, every run would start over")
+                logger.info(f"Sales ingestion watermark initialized at soitem id {last_id}")
 
-            # create the import matrix
-            import_headers = ['PartNumber', 'Location', 'Qty', 'Note',
-                                        'Tracking-Lot Number', 'Tracking-Revision Level', 
-                                        'Tracking-Expiration Date']
-            matrix = create_matrix(import_headers, data)
+            floor_id = max(0, last_id - Config.SALES_LOOKBACK_IDS)
+            issued_since = datetime.now() - timedelta(minutes=Config.SALES_LOOKBACK_MINUTES)
+            totals = {'lines_applied': 0, 'skus_updated': 0, 'orders': 0}
+            pages = 0
+            if floor_id > 0:
+                # lines below the id window on recently issued orders (an order issued well after its lines were added)
+                _, pages = self._apply_order_pages(session, 0, started, last_id, totals, up_to_id=floor_id,
+                                                   issued_since=issued_since)
+            last_id, more_pages = self._apply_order_pages(session, floor_id, started, last_id, totals)
+            pages += more_pages
+        finally:
+            session.logout()
 
-            # adjusting inventory
-            cycle_in_result = self.cycle_inventory(matrix=matrix)
-            if cycle_in_result:
-                # Update last sync time
-                self.data.update_config({'last_sync_run': datetime.now().isoformat()})
-                
-                # logging run stats
-                records_updated = len(data)
-                sn_created = len(matrix) - records_updated - 1
-                end_time = time.time()
-                run_duration = round(end_time - start_time)     # seconds
-                logger.info(f"Auto-Sync complete: Updated {records_updated} inventory records and \
-                            created {sn_created} serial numbers.")
-                
-                return {
-                    'success': True,
-                    'inventory_updated': records_updated,
-                    'sn_created': sn_created,
-                    'message': f'Updated {records_updated} inventory records and {sn_created} \
-                        serial numbers in {run_duration} seconds!'
-                }
-            else:
-                raise Exception("Gathered inventory data but failed to cycle update in FB.")
+        self.data.update_config({'last_check_run': datetime.now().isoformat()})
+        run_duration = round(time.time() - start_time, 2)
+        SYNC_PHASE_SECONDS.observe(time.time() - start_time, job='sales_check', phase='total')
+
+        if totals['lines_applied'] > 0:
+            note = (f"Check complete: {totals['orders']} new orders checked and {totals['skus_updated']} SKUs updated in {run_duration} seconds!")
+        elif totals['orders'] > 0:
+            note = (f"Check complete: {totals['orders']} new orders checked in {run_duration} seconds, but none of them are tracked below.")
+        else:
+            note = f"No new order lines after soitem id {floor_id}"
+        logger.info(note)
+
+        return {
+            'success': True,
+            'orders_processed': totals['orders'],
+            'skus_updated': totals['skus_updated'],
+            'lines_applied': totals['lines_applied'],
+            'pages': pages,
+            'last_soitem_id': last_id,
+            'message': note
+        }
+
+    # --------------------------------- sync prefetch --------------------------------- #
+    def _sync_mode(self) -> str:
+        return 'manual' if self.data.get_config().get('inventory_method', 'manual') == 'manual' else 'automated'
+
+    def prefetch_sync_inputs(self) -> Dict:
+        '''
+        Runs the Fishbowl inventory queries and builds the override map ahead of the scheduled sync (see
+        jobs.schedule_prefetch). The sync uses them when the inventory marker is unchanged at trigger time.
+        '''
+        try:
+            mode = self._sync_mode()
+            start_time = time.time()
+            with SYNC_PHASE_SECONDS.time(job=f'{mode}_sync', phase='prefetch'):
+                # log id first: the marker of the queried parts is capped at it, so a change of those parts during
+                # the queries makes the prefetch stale instead of silently partial
+                ceiling = self.get_inventory_marker()
+                qoh, cycle_out = self.fetch_cycle_queries()
+                parts = sorted({record['PartNumber'] for record in qoh + cycle_out if record.get('PartNumber')})
+                marker = self.get_inventory_marker(parts, up_to=ceiling)
+                overrides = None
+                if mode == 'manual':
+                    overrides = {'version': self.data.get_changes()['version'], 'records': self.build_overrides()}
+
+            self.prefetch.start(mode)
+            self.prefetch.save_phase('extract', time.time() - start_time, {
+                'qoh': qoh,
+                'cycle_out': cycle_out,
+                'sales_check': None,
+                'marker': marker,
+                'parts': parts,
+                'overrides': overrides
+            })
+            logger.info(f"Prefetched {len(qoh)} inventory records for the {mode} sync (inventory log id {marker})")
+            return {
+                'success': True,
+                'message': f'Prefetched {len(qoh)} inventory records for the next {mode} sync'
+            }
 
         except Exception as e:
-            logger.error(f"Sync error: {e}")
+            logger.error(f"Sync prefetch failed: {e}")
             self.error_logger.log_error(
-                error_type='automated_sync_error',
-                message=f"Automated sync error: {str(e)}",
-                source='sync.py:_run_automated_sync',
+                error_type='sync_prefetch_error',
+                message=f"Sync prefetch failed: {str(e)}",
+                source='sync.py:prefetch_sync_inputs',
                 details={'error': str(e)}
             )
             return {
@@ -482,83 +862,197 @@ class FishbowlSync:
                 'error': str(e)
             }
 
-    def _run_manual_sync(self) -> Dict:
-        """  """
+    def _take_prefetch(self, mode: str) -> Optional[dict]:
+        ''' Returns the prefetched extract output if it is still current, None otherwise. A prefetch is used once. '''
+        saved = self.prefetch.resume(mode)
+        expired = saved is None and self.prefetch.get_status() is not None
+        self.prefetch.clear()
+        if expired:
+            SYNC_PREFETCH.inc(outcome='expired')
+            return None
+        if not saved or 'extract' not in saved['phases']:
+            return None
+
+        output = saved['phases']['extract']['output']
         try:
-            print("\n MANUAL SYNC TRIGGERED \n")
-            start_time = time.time()
+            with SYNC_PHASE_SECONDS.time(job=f'{mode}_sync', phase='revalidate'):
+                marker = self.get_inventory_marker(output.get('parts'))
+        except Exception as e:
+            logger.warning(f"Could not revalidate the sync prefetch, querying the inventory again: {e}")
+            SYNC_PREFETCH.inc(outcome='stale')
+            return None
+        if marker != output['marker']:
+            logger.info(f"Fishbowl inventory changed since the prefetch (log id {output['marker']} -> {marker})")
+            SYNC_PREFETCH.inc(outcome='stale')
+            return None
+        SYNC_PREFETCH.inc(outcome='used')
+        logger.info(f"Using the sync inputs prefetched at {saved['started']}")
+        return output
 
+    # ------------------------------ staged sync pipeline ------------------------------ #
+    def _phase_extract(self, mode: str, outputs: dict) -> dict:
+        ''' Manual mode runs a sales check first, then both modes query the Fishbowl inventory (or use the prefetch). '''
+        sales_message = None
+        if mode == 'manual':
             # Wait for the sales check to finish running before running it here, if it is running. 
             sales_check = self.run_sales_check()
-
             if not sales_check.get('success'):
                 raise CallFailure("Sales check failed during manual sync")
-            
-            # get company name from config
-            company = self.config.COMPANY_NAME
-            
-            override_skus = self.data.get_all_skus()
-            override = {}
-            today_str = date.today().strftime("%Y-%m-%d")
-            for sku in override_skus:
-                temp = {
-                    'PartNumber': override_skus[sku]['part_num'],
-                    'SnFlag': override_skus[sku]['sn_flag'],
-                    'Location':f'{company} / Main-Retail Website Inventory',
-                    'Qty': override_skus[sku]['available_qty'],
-                    'Note': f'Retail Website Inventory API Manual Override: {today_str}',
-                    'Tracking-Lot Number': '',
-                    'Tracking-Revision Level': '',
-                    'Tracking-Expiration Date': ''
-                }
-                override[sku] = temp
-            
-            cycle_data = self.get_cycle_data(override)
-            import_headers = ['PartNumber', 'Location', 'Qty', 'Note',
-                            'Tracking-Lot Number', 'Tracking-Revision Level', 
-                            'Tracking-Expiration Date']
-            
-            matrix = create_matrix(import_headers, cycle_data)
+            sales_message = sales_check.get('message')
+        prefetched = self._take_prefetch(mode)
+        if prefetched is not None:
+            return dict(prefetched, sales_check=sales_message)
+        qoh, cycle_out = self.fetch_cycle_queries()
+        return {'qoh': qoh, 'cycle_out': cycle_out, 'sales_check': sales_message}
 
-            # adjusting inventory
-            cycle_in_result = self.cycle_inventory(matrix=matrix)
-            if cycle_in_result:
-                # Update last sync time
-                self.data.update_config({'last_sync_run': datetime.now().isoformat()})
-                
-                # logging run stats
-                records_updated = len(cycle_data)
-                sn_created = len(matrix) - records_updated - 1
-                end_time = time.time()
-                run_duration = round(end_time - start_time)     # seconds
-                logger.info(f"Manual-Sync complete: Ran a sales check then updated {records_updated} inventory records and \
-                            created {sn_created} serial numbers.")
-                
+    def _phase_reconcile(self, mode: str, outputs: dict) -> list:
+        ''' Merges the query results, with the local SKUs overriding Fishbowl in manual mode. '''
+        extract = outputs['extract']
+        override = {}
+        if mode == 'manual':
+            # prefetched overrides hold while no SKU changed (keyed on the inventory version, not the file, which
+            # the sales check also writes for its own state)
+            prefetched = extract.get('overrides')
+            if prefetched and prefetched['version'] == self.data.get_changes()['version']:
+                override = prefetched['records']
+            else:
+                override = self.build_overrides()
+        return self.merge_cycle_data(extract['qoh'], extract['cycle_out'], override)
+
+    def _phase_build_matrix(self, mode: str, outputs: dict) -> list:
+        matrix = create_matrix(IMPORT_HEADERS, outputs['reconcile'])
+        if not matrix:
+            raise Exception("Failed to build the import matrix from the inventory data.")
+        return matrix
+
+    def _phase_import(self, mode: str, outputs: dict) -> dict:
+        '''
+        Imports the matrix, unless it hashes the same as the last successful import: Fishbowl would record
+        another identical cycle count, so the import is skipped and reported as unchanged.
+        '''
+        matrix_hash = hash_matrix(outputs['build_matrix'])
+        if Config.SYNC_SKIP_UNCHANGED_IMPORTS and matrix_hash == self.data.get_config().get('last_import_hash'):
+            SYNC_IMPORTS.inc(job=f'{mode}_sync', outcome='unchanged')
+            logger.info("Import matrix unchanged since the last sync, skipped the Fishbowl import")
+            return {'unchanged': True, 'hash': matrix_hash}
+        cycle_in_result = self.cycle_inventory(matrix=outputs['build_matrix'])
+        if not cycle_in_result:
+            raise Exception("Gathered inventory data but failed to cycle update in FB.")
+        SYNC_IMPORTS.inc(job=f'{mode}_sync', outcome='imported')
+        return {'unchanged': False, 'hash': matrix_hash}
+
+    def _run_pipeline(self, mode: str) -> Dict:
+        '''
+        Runs the sync as the phases in SYNC_PHASES (extract -> reconcile -> build matrix -> import). Each
+        phase's output is saved to the sync checkpoint, so a retry after a failure (a failed import most
+        of the time) resumes after the last good phase instead of querying Fishbowl again. The checkpoint
+        is cleared once the import succeeds. Phase timings are returned with the result.
+        '''
+        job = f'{mode}_sync'
+        start_time = time.time()
+        checkpoint = self.checkpoint.resume(mode)
+        if not checkpoint:
+            checkpoint = self.checkpoint.start(mode)
+
+        outputs = {phase: saved['output'] for phase, saved in checkpoint['phases'].items()}
+        timings = {phase: saved['seconds'] for phase, saved in checkpoint['phases'].items()}
+        if mode == 'manual' and 'reconcile' in outputs:
+            # the local SKUs override Fishbowl and may have changed since the checkpoint (sales, edits), so a
+            # resumed manual sync always reconciles again from the current inventory file
+            for phase in SYNC_PHASES[SYNC_PHASES.index('reconcile'):]:
+                outputs.pop(phase, None)
+                timings.pop(phase, None)
+        resumed_from = None
+        if outputs:
+            resumed_from = next(phase for phase in SYNC_PHASES if phase not in outputs)
+            logger.info(f"Resuming {mode} sync from the {resumed_from} phase (checkpoint of {checkpoint['started']})")
+        phase = None
+        try:
+            for phase in SYNC_PHASES:
+                if phase in outputs:
+                    continue
+                phase_start = time.time()
+                try:
+                    with SYNC_PHASE_SECONDS.time(job=job, phase=phase):
+                        outputs[phase] = getattr(self, f'_phase_{phase}')(mode, outputs)
+                finally:
+                    timings[phase] = round(time.time() - phase_start, 3)
+                if phase != SYNC_PHASES[-1]:
+                    self.checkpoint.save_phase(phase, timings[phase], outputs[phase])
+            self.checkpoint.clear()
+
+            # Update last sync time
+            imported = outputs['import']
+            self.data.update_config({'last_sync_run': datetime.now().isoformat(), 'last_import_hash': imported['hash']})
+
+            # logging run stats
+            records_updated = len(outputs['reconcile'])
+            sn_created = len(outputs['build_matrix']) - records_updated - 1
+            end_time = time.time()
+            SYNC_PHASE_SECONDS.observe(end_time - start_time, job=job, phase='total')
+            run_duration = round(end_time - start_time)     # seconds
+            if imported['unchanged']:
                 return {
                     'success': True,
-                    'inventory_updated': records_updated,
-                    'sn_created': sn_created,
-                    'message': f'Ran a Sales Check then updated {records_updated} inventory records and {sn_created} \
-                        serial numbers in {run_duration} seconds!'
+                    'unchanged': True,
+                    'inventory_updated': 0,
+                    'sn_created': 0,
+                    'message': f'No changes: the inventory matches the last import, nothing was sent to Fishbowl '
+                               f'({records_updated} records checked in {run_duration} seconds).',
+                    'phase_timings': timings,
+                    'resumed_from': resumed_from
                 }
+            if mode == 'manual':
+                logger.info(f"Manual-Sync complete: Ran a sales check then updated {records_updated} inventory records and \
+                            created {sn_created} serial numbers.")
+                message = f'Ran a Sales Check then updated {records_updated} inventory records and {sn_created} \
+                        serial numbers in {run_duration} seconds!'
             else:
-                raise Exception("Gathered inventory data but failed to cycle update in FB.")
-            
-        except CallFailure as e:
-            logger.error(f"Fishbowl Sales Check API call failed: {e}")
-            self.error_logger.log_error(
-                error_type='fishbowl_api_error',
-                message=f"Fishbowl Sales Check API call failed: {str(e)}",
-                source='sync.py:_run_manual_sync',
-                details={'error': str(e)}
-            )
-            return []
+                logger.info(f"Auto-Sync complete: Updated {records_updated} inventory records and \
+                            created {sn_created} serial numbers.")
+                message = f'Updated {records_updated} inventory records and {sn_created} \
+                        serial numbers in {run_duration} seconds!'
+            if resumed_from:
+                message += f' (resumed from the {resumed_from} phase)'
+
+            return {
+                'success': True,
+                'unchanged': False,
+                'inventory_updated': records_updated,
+                'sn_created': sn_created,
+                'message': message,
+                'phase_timings': timings,
+                'resumed_from': resumed_from
+            }
+
         except Exception as e:
-            logger.error(f"Fishbowl Manual Sync API call failed: {e}")
+            self.checkpoint.fail(phase, str(e))
+            if isinstance(e, CallFailure):
+                error_type = 'fishbowl_api_error'
+                logger.error(f"Fishbowl API call failed in the {phase} phase of the {mode} sync: {e}")
+            else:
+                error_type = f'{mode}_sync_error'
+                logger.error(f"Sync error in the {phase} phase of the {mode} sync: {e}")
             self.error_logger.log_error(
-                error_type='manual_sync_error',
-                message=f"Fishbowl Manual Sync API call failed: {str(e)}",
-                source='sync.py:_run_manual_sync',
-                details={'error': str(e)}
+                error_type=error_type,
+                message=f"{mode.capitalize()} sync failed in the {phase} phase: {str(e)}",
+                source=f'sync.py:_run_{mode}_sync',
+                details={'error': str(e), 'phase': phase, 'phase_timings': timings}
             )
-            return []
+            return {
+                'success': False,
+                'error': str(e),
+                'failed_phase': phase,
+                'phase_timings': timings,
+                'resumed_from': resumed_from
+            }
+
+    def _run_automated_sync(self) -> Dict:
+        ''' Runs the sync in automated system mode. '''
+        print("\n AUTOMATIC SYNC TRIGGERED \n")
+        return self._run_pipeline('automated')
+
+    def _run_manual_sync(self) -> Dict:
+        ''' Runs a sales check, then the sync with the local SKU quantities overriding Fishbowl. '''
+        print("\n MANUAL SYNC TRIGGERED \n")
+        return self._run_pipeline('manual')
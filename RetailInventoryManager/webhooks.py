@@ -0,0 +1,150 @@
+"""
+Change webhooks: pushes inventory changes to the WEBHOOK_TARGETS so downstream systems can stop polling.
+
+Every InventoryData mutation appends a change event to an outbox kept in the inventory file itself, in
+the same atomic write as the change, so no event is lost between the mutation and the queue. The
+dispatcher runs next to the scheduled jobs (JobRunner) and keeps one cursor per target in WebhookState:
+events after the cursor are batched for WEBHOOK_BATCH_SECONDS, POSTed as one JSON payload and the cursor
+only moves once the target answered 2xx. Failed targets are retried with exponential backoff without
+holding up the others. A target that fell behind the retained events gets resync=True and should re-read
+/feed/inventory.
+"""
+
+from datetime import datetime, timedelta
+import hashlib
+import hmac
+import json
+import logging
+import random
+import threading
+
+import requests
+
+from config import Config
+from data import InventoryData, ErrorLogger, WebhookState
+from metrics import WEBHOOK_DELIVERIES, WEBHOOK_LAG_EVENTS, WEBHOOK_LAG_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# consecutive failures before a target is reported in the error log
+ALERT_AFTER_FAILURES = 5
+
+
+class WebhookDispatcher:
+    def __init__(self, data: InventoryData = None, state: WebhookState = None, targets: list = None):
+        self.data = data or InventoryData()
+        self.state = state or WebhookState()
+        self.error_logger = ErrorLogger()
+        self.targets = Config.WEBHOOK_TARGETS if targets is None else targets
+        self.session = requests.Session()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._file_version = None
+        self._pending = True
+
+    def start(self):
+        ''' Starts the delivery thread. New targets start at the current version, history is not replayed. '''
+        if not self.targets or self._thread is not None:
+            return
+        version = self.data.get_events(0, 0)['version']
+        known = self.state.get_targets()
+        for url in self.targets:
+            if url not in known or known[url]['cursor'] is None:
+                self.state.update_target(url, cursor=version)
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name='webhook-dispatcher', daemon=True)
+        self._thread.start()
+        logger.info(f"Webhook dispatcher started for {len(self.targets)} targets")
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout=Config.WEBHOOK_TIMEOUT_SECONDS + 5)
+            self._thread = None
+
+    def _run(self):
+        while not self._stopped.wait(Config.WEBHOOK_POLL_SECONDS):
+            try:
+                self.deliver_due()
+            except Exception as e:
+                logger.error(f"Webhook dispatch failed: {e}")
+
+    def deliver_due(self):
+        ''' One dispatcher pass: sends every target whose batch window is over and whose backoff expired. '''
+        file_version = self.data.get_version()
+        if file_version == self._file_version and not self._pending:
+            return
+        self._file_version = file_version
+
+        targets = self.state.get_targets()
+        cursors = [targets[url]['cursor'] or 0 for url in self.targets if url in targets]
+        outbox = self.data.get_events(min(cursors, default=0), Config.WEBHOOK_EVENT_LIMIT)
+        now = datetime.now()
+        pending = False
+
+        for url in self.targets:
+            target = targets.get(url) or self.state.update_target(url, cursor=outbox['version'])
+            cursor = target['cursor'] or 0
+            events = [event for event in outbox['events'] if event['version'] > cursor]
+            oldest_age = (now - datetime.fromisoformat(events[0]['timestamp'])).total_seconds() if events else 0
+            WEBHOOK_LAG_EVENTS.set(outbox['version'] - cursor, target=url)
+            WEBHOOK_LAG_SECONDS.set(oldest_age, target=url)
+            if not events and outbox['version'] <= cursor:
+                continue
+            pending = True
+
+            if target['next_attempt'] and now < datetime.fromisoformat(target['next_attempt']):
+                continue
+            batch = events[:Config.WEBHOOK_BATCH_MAX_EVENTS]
+            # wait out the batch window unless the batch is already full
+            if batch and oldest_age < Config.WEBHOOK_BATCH_SECONDS and len(batch) < Config.WEBHOOK_BATCH_MAX_EVENTS:
+                continue
+            # events trimmed from the outbox before this target got them (or versions without events)
+            resync = not batch or batch[0]['version'] != cursor + 1
+            self._deliver(url, target, batch, outbox['version'] if not batch else batch[-1]['version'], resync)
+
+        self._pending = pending
+
+    def _deliver(self, url: str, target: dict, events: list, version: int, resync: bool):
+        body = json.dumps({
+            'version': version,
+            'resync': resync,
+            'sent': datetime.now().isoformat(),
+            'events': events
+        }, separators=(',', ':')).encode()
+        headers = {'Content-Type': 'application/json'}
+        if Config.WEBHOOK_SECRET:
+            signature = hmac.new(Config.WEBHOOK_SECRET.encode(), body, hashlib.sha256).hexdigest()
+            headers['X-Inventory-Signature'] = f'sha256={signature}'
+
+        try:
+            response = self.session.post(url, data=body, headers=headers, timeout=Config.WEBHOOK_TIMEOUT_SECONDS)
+            response.raise_for_status()
+        except requests.RequestException as e:
+            failures = target['failures'] + 1
+            delay = min(Config.WEBHOOK_BACKOFF_MAX_SECONDS, 2 ** failures) * random.uniform(0.5, 1)
+            self.state.update_target(url, failures=failures, last_error=str(e),
+                                     next_attempt=(datetime.now() + timedelta(seconds=delay)).isoformat())
+            WEBHOOK_DELIVERIES.inc(target=url, outcome='failure')
+            logger.warning(f"Webhook delivery to {url} failed ({failures} in a row), retrying in {delay:.0f}s: {e}")
+            if failures == ALERT_AFTER_FAILURES:
+                self.error_logger.log_error(
+                    error_type='webhook_error',
+                    message=f"Webhook target {url} failed {failures} deliveries in a row: {str(e)}",
+                    source='webhooks.py:_deliver',
+                    details={'target': url, 'cursor': target['cursor'], 'error': str(e)}
+                )
+            return False
+
+        self.state.update_target(url, cursor=version, failures=0, next_attempt=None, last_error=None,
+                                 delivered=target['delivered'] + len(events), last_success=datetime.now().isoformat())
+        WEBHOOK_DELIVERIES.inc(target=url, outcome='success')
+        return True
+
+    def get_state(self) -> dict:
+        ''' Delivery state per target, with its lag in versions and seconds. '''
+        targets = self.state.get_targets()
+        return {url: dict(targets.get(url, {}),
+                          lag_versions=WEBHOOK_LAG_EVENTS.get(target=url),
+                          lag_seconds=WEBHOOK_LAG_SECONDS.get(target=url))
+                for url in self.targets}
@@ -0,0 +1,237 @@
+"""
+Scheduler worker for the Retail Inventory Manager.
+
+Runs the sync and sales check jobs in their own process so the web server's request threads never
+compete with a running job (GIL, data file locks). The web process talks to the worker through a
+small local IPC listener (multiprocessing.connection, authenticated with WORKER_AUTHKEY) to run a job
+now, reschedule or remove a job, and fetch the scheduler status. See worker_client.py for the web side.
+The change webhook dispatcher (webhooks.py) runs here too, next to the jobs.
+
+To run: python worker.py
+Only the process holding the leader lock (leader.py) runs the jobs, a second worker stands by until the
+first one exits. With SCHEDULER_MODE=elected the web processes elect the leader among themselves
+(start_elected), with SCHEDULER_MODE=embedded the web process uses JobRunner directly (single process).
+"""
+
+from multiprocessing.connection import Listener
+import logging
+import os
+import signal
+import threading
+
+from config import Config
+import jobs
+from job_ids import SYNC_JOB_ID, SALES_JOB_ID, CATALOG_JOB_ID
+from jobs import JOB_FUNCS, adaptive_schedule, job_history
+from leader import LeaderElection
+from metrics import render_metrics
+from profiling import profile_call
+from webhooks import WebhookDispatcher
+
+logger = logging.getLogger(__name__)
+
+
+class JobRunner:
+    """
+    Owns the APScheduler instance and the job entry points. Used by the worker process, and by the web
+    process itself in embedded mode. WorkerClient mirrors these methods over IPC.
+    """
+
+    def __init__(self):
+        self.scheduler = jobs.create_scheduler()
+        self.data = jobs.sync_manager.data
+        self.webhooks = WebhookDispatcher(self.data)
+
+    def _interval(self, job_id: str) -> int:
+        config = self.data.get_config()
+        if job_id == SALES_JOB_ID:
+            return config.get('sales_interval_minutes', Config.SALES_INTERVAL_MINUTES)
+        if job_id == CATALOG_JOB_ID:
+            return config.get('catalog_refresh_minutes', Config.CATALOG_REFRESH_MINUTES)
+        return config.get('sync_interval_minutes', Config.SYNC_INTERVAL_MINUTES)
+
+    def start(self):
+        '''
+        Starts the scheduler. The job store is persistent, so start paused, reconcile the stored jobs with
+        the config, then resume: runs that came due while the scheduler was down are coalesced into one.
+        '''
+        job_history.mark_interrupted()
+        self.scheduler.start(paused=True)
+        # only enabling the sales job on start if method is manual.
+        if self.data.get_config()['inventory_method'] == 'manual':
+            jobs.ensure_job(self.scheduler, SALES_JOB_ID, self._interval(SALES_JOB_ID))
+        else:
+            jobs.remove_job(self.scheduler, SALES_JOB_ID)
+        jobs.ensure_job(self.scheduler, SYNC_JOB_ID, self._interval(SYNC_JOB_ID))
+        jobs.ensure_job(self.scheduler, CATALOG_JOB_ID, self._interval(CATALOG_JOB_ID))
+        jobs.schedule_prefetch()
+        self.scheduler.resume()
+        self.webhooks.start()
+
+    def shutdown(self):
+        self.webhooks.stop()
+        if self.scheduler.running:
+            self.scheduler.shutdown(wait=True)
+
+    def run_job(self, job_id: str, trigger: str = 'manual') -> dict:
+        ''' Runs a job now, in the calling thread, and returns its result. Refused while the job is already running. '''
+        return JOB_FUNCS[job_id](trigger=trigger)
+
+    def profile_job(self, job_id: str) -> tuple:
+        ''' Runs a job now under cProfile. Returns (result, report). '''
+        return profile_call(JOB_FUNCS[job_id], trigger='manual')
+
+    def reschedule(self, job_id: str) -> int:
+        ''' (Re)schedules a job with the interval from the config. Returns the interval in minutes. '''
+        minutes = self._interval(job_id)
+        jobs.schedule_job(self.scheduler, job_id, minutes)
+        if job_id == SYNC_JOB_ID:
+            jobs.schedule_prefetch()
+        return minutes
+
+    def remove_job(self, job_id: str) -> bool:
+        removed = jobs.remove_job(self.scheduler, job_id)
+        if job_id == SYNC_JOB_ID:
+            jobs.schedule_prefetch()
+        return removed
+
+    def status(self) -> dict:
+        return {
+            'running': self.scheduler.running,
+            'pid': os.getpid(),
+            'jobs': [{
+                'id': job.id,
+                'name': job.name,
+                'next_run_time': job.next_run_time.isoformat() if job.next_run_time else None,
+                'running': jobs.is_running(job.id)
+            } for job in self.scheduler.get_jobs()],
+            'adaptive': adaptive_schedule.get_state(),
+            'webhooks': self.webhooks.get_state()
+        }
+
+    def metrics(self) -> str:
+        return render_metrics()
+
+
+# ------------------------------------ IPC server ------------------------------------- #
+def handle_request(runner: JobRunner, message: dict) -> dict:
+    ''' Dispatches one IPC request to the runner. Returns {'ok': True, 'result': ...} or {'ok': False, 'error': ...}. '''
+    command = message.get('command')
+    job_id = message.get('job_id')
+    try:
+        if job_id is not None and job_id not in JOB_FUNCS:
+            raise ValueError(f'Unknown job {job_id}')
+        if command == 'run':
+            result = runner.run_job(job_id, message.get('trigger', 'manual'))
+        elif command == 'profile':
+            result = runner.profile_job(job_id)
+        elif command == 'reschedule':
+            result = runner.reschedule(job_id)
+        elif command == 'remove':
+            result = runner.remove_job(job_id)
+        elif command == 'status':
+            result = runner.status()
+        elif command == 'metrics':
+            result = runner.metrics()
+        else:
+            raise ValueError(f'Unknown command {command}')
+        return {'ok': True, 'result': result}
+    except Exception as e:
+        logger.error(f"Worker command {command} failed: {e}")
+        return {'ok': False, 'error': str(e), 'type': type(e).__name__}
+
+
+def _serve_connection(runner: JobRunner, conn):
+    try:
+        message = conn.recv()
+        conn.send(handle_request(runner, message))
+    except (EOFError, OSError) as e:
+        logger.warning(f"Worker connection dropped: {e}")
+    finally:
+        conn.close()
+
+
+def _require_authkey(authkey: bytes = None) -> bytes:
+    ''' The IPC authkey, the listener never runs unauthenticated or with a guessable default key. '''
+    authkey = authkey or Config.WORKER_AUTHKEY.encode()
+    if not authkey:
+        raise SystemExit("WORKER_AUTHKEY is not set, refusing to start the scheduler worker")
+    return authkey
+
+
+def serve(runner: JobRunner, address: tuple = (Config.WORKER_HOST, Config.WORKER_PORT), authkey: bytes = None):
+    '''
+    Accepts IPC requests until the listener is closed. Each connection carries one request and is handled
+    on its own thread, so a status call is answered while a "run now" is still going.
+    '''
+    authkey = _require_authkey(authkey)
+    with Listener(address, authkey=authkey) as listener:
+        logger.info(f"Scheduler worker listening on {address[0]}:{address[1]} (pid {os.getpid()})")
+        while True:
+            try:
+                conn = listener.accept()
+            except OSError as e:
+                # failed handshakes (wrong authkey, port scans) must not stop the worker
+                logger.warning(f"Rejected worker connection: {e}")
+                continue
+            threading.Thread(target=_serve_connection, args=(runner, conn), daemon=True).start()
+
+
+def start_elected() -> LeaderElection:
+    '''
+    SCHEDULER_MODE=elected: joins the leader election from a web process. The winner starts the jobs and
+    the IPC listener on a background thread, every process (the leader included) talks to it via WorkerClient.
+    '''
+    _require_authkey()
+    election = LeaderElection()
+
+    def _lead():
+        runner = None
+        try:
+            runner = JobRunner()
+            runner.start()
+            serve(runner)
+        except BaseException as e:
+            logger.error(f"Scheduler stopped in the elected process, handing the leadership over: {e}")
+        finally:
+            # a leader that runs no jobs must not keep the lock, a standby process takes over
+            try:
+                if runner is not None:
+                    runner.shutdown()
+            finally:
+                election.release()
+
+    election.run_when_elected(_lead)
+    return election
+
+
+def main():
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+
+    def _stop(signum, frame):
+        raise KeyboardInterrupt
+
+    signal.signal(signal.SIGTERM, _stop)
+    _require_authkey()
+    election = LeaderElection()
+    runner = None
+    try:
+        if not election.wait():
+            return
+        runner = JobRunner()
+        runner.start()
+        logger.info("Scheduler worker started")
+        serve(runner)
+    except KeyboardInterrupt:
+        logger.info("Stopping scheduler worker")
+    finally:
+        if runner is not None:
+            runner.shutdown()
+        election.release()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""
+Web side of the scheduler worker IPC (see worker.py).
+
+WorkerClient exposes the same methods as worker.JobRunner, so app.py can use either one: each call
+opens a short authenticated connection to the worker, sends one request and waits for the reply.
+"""
+
+from multiprocessing.connection import Client
+from multiprocessing import AuthenticationError
+
+from config import Config
+
+
+class WorkerUnavailable(Exception):
+    """Raised when the scheduler worker can't be reached or doesn't answer in time"""
+    pass
+
+
+class WorkerError(Exception):
+    """Raised when the scheduler worker answers a request with an error"""
+    pass
+
+
+class WorkerClient:
+    def __init__(self, address: tuple = (Config.WORKER_HOST, Config.WORKER_PORT), authkey: bytes = None,
+                 timeout: float = Config.WORKER_TIMEOUT_SECONDS):
+        self.address = address
+        self.authkey = authkey
+        self.timeout = timeout
+
+    def _request(self, command: str, timeout: float = None, **kwargs):
+        ''' Sends one request and returns the result, raising WorkerUnavailable / WorkerError on failure. '''
+        timeout = timeout or self.timeout
+        # read per request: prod_server.py may set a key for the run after this client was created
+        authkey = self.authkey or Config.WORKER_AUTHKEY.encode()
+        if not authkey:
+            raise WorkerUnavailable('WORKER_AUTHKEY is not set, the scheduler worker can not be reached')
+        try:
+            conn = Client(self.address, authkey=authkey)
+        except (OSError, AuthenticationError) as e:
+            raise WorkerUnavailable(f'Scheduler worker is not reachable at {self.address[0]}:{self.address[1]}: {e}')
+        try:
+            conn.send({'command': command, **kwargs})
+            if not conn.poll(timeout):
+                raise WorkerUnavailable(f'Scheduler worker did not answer {command} within {timeout} seconds')
+            reply = conn.recv()
+        except (EOFError, OSError) as e:
+            raise WorkerUnavailable(f'Lost the connection to the scheduler worker: {e}')
+        finally:
+            conn.close()
+
+        if not reply.get('ok'):
+            raise WorkerError(reply.get('error', 'Unknown worker error'))
+        return reply['result']
+
+    def run_job(self, job_id: str, trigger: str = 'manual') -> dict:
+        return self._request('run', job_id=job_id, trigger=trigger)
+
+    def profile_job(self, job_id: str) -> tuple:
+        return self._request('profile', job_id=job_id)
+
+    def reschedule(self, job_id: str) -> int:
+        return self._request('reschedule', timeout=Config.WORKER_STATUS_TIMEOUT_SECONDS, job_id=job_id)
+
+    def remove_job(self, job_id: str) -> bool:
+        return self._request('remove', timeout=Config.WORKER_STATUS_TIMEOUT_SECONDS, job_id=job_id)
+
+    def status(self) -> dict:
+        return self._request('status', timeout=Config.WORKER_STATUS_TIMEOUT_SECONDS)
+
+    def metrics(self) -> str:
+        return self._request('metrics', timeout=Config.WORKER_STATUS_TIMEOUT_SECONDS)
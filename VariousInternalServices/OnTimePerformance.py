@@ -45,37 +45,10 @@ def _get_fb_data(query) -> dict:
         "Ending the call stack. ", True)
         return e
 
-def _find_paste_area(data_length: int, last_row:int) -> int:
-    """ Internal function: Uses the passed data length to ensure enough room in the spreadsheet, and returns the 
-    start row number. """
-    try:
-        LOG.log("find_paste_area", "Looking for start row... ")
-        ss = GoogleSession(SHEET_ID)
-        db_col = ss.read_range("Database", "A:A")
-        row_offset = 0
-        is_valid = False
-        while not is_valid:
-            row_offset += 1
-            start_row = ss.read_range("Database", f"A{len(db_col)+row_offset}:R{len(db_col)+row_offset}")
-            is_valid = all(cell == [] or cell is None for cell in start_row)
-            if row_offset > 5:
-                raise Exception("Unable to find the start row. Preventing infinite loop. ")
-            
-        LOG.log("find_paste_area", "Found the start row successfully. ")
-        if (len(db_col)+row_offset+data_length) <= last_row:
-            LOG.log("find_paste_data", f"There are enough rows for the update. There are {last_row-(len(db_col)+row_offset)} rows remaining. ")
-            return len(db_col)+row_offset
-        else:
-            raise Exception(f"Not enough rows in the database. Add at least {(len(db_col)+row_offset+data_length)-last_row} more rows need to be added. ")
-        
-    except Exception as e:
-        LOG.log("find_paste_area", e, True)
-        LOG.log("find_paste_area", "No data was updated. Ending the call stack. ", True)
-        return e
-
-def _paste_data(data:list, start_row:int, headers:list) -> None:
+def _paste_data(data:list, headers:list, last_row:int) -> None:
     """ Internal function: 
-    Pastes the passed data into the google sheet. Returns None.
+    Appends the passed data after the last filled row of the Database sheet, as long as it fits above last_row.
+    Returns None.
     """
     ss = GoogleSession(SHEET_ID)
     num_entries = len(data)
@@ -88,9 +61,18 @@ def _paste_data(data:list, start_row:int, headers:list) -> None:
         """
         rows = [[row.get(k, "") for k in column_order] for row in data]
         LOG.log("paste_data", "Successfully reformated JSON to a 2D array. ")
-        ss.update_range("Database", f"A{start_row}", rows)
-        LOG.log("paste_data", f"Successfully pasted {num_entries} entries to the Database sheet. ")
+        # writes after the rows filled in column A, rows that would pass last_row are cleared again
+        pasted = ss.append_at_end("Database", "A:R", rows, last_row=last_row)
+        if pasted:
+            LOG.log("paste_data", f"Successfully pasted {num_entries} entries to the Database sheet at rows "
+                                  f"{pasted['start_row']}-{pasted['end_row']}. There are {last_row - pasted['end_row']} rows remaining. ")
+        else:
+            LOG.log("paste_data", "No entries to paste to the Database sheet. ")
 
+    except SheetCapacityError as e:
+        LOG.log("paste_data", e, True)
+        LOG.log("paste_data", "No data was updated. Ending the call stack. ", True)
+        return
     except Exception as e:
         LOG.log("paste_data", e, True)
         LOG.log("paste_data", "Something when wrong when trying to paste the data. It may or may not have updated. ", True)
@@ -100,10 +82,12 @@ def _paste_data(data:list, start_row:int, headers:list) -> None:
     try:
         # Update the date last updated fields. 
         ss = GoogleSession(SHEET_ID)
-        # (sheet name, range, values)
-        ss.update_range("Retail", "B18", [[TODAY]])
-        ss.update_range("OEM", "B18", [[TODAY]])
-        ss.update_range("TIER", "B18", [[TODAY]])
+        # {(sheet name, range): values}, one batch update
+        ss.batch_write({
+            ("Retail", "B18"): [[TODAY]],
+            ("OEM", "B18"): [[TODAY]],
+            ("TIER", "B18"): [[TODAY]]
+        })
         return
     except Exception as e:
         LOG.log("paste_data", e, True)
@@ -157,15 +141,11 @@ def on_time_performance(result_recipients:list, custom_headers:list, query_name:
     if LOG.error_flag() == 0:
         query_resp = _get_fb_data(query)
 
-    # Locate the cell range to paste values based on the length of the query response
-    if LOG.error_flag() == 0:
-        start_row = _find_paste_area(len(query_resp), last_row)
-
-    # Paste the query response values into the indentified cell range
+    # Append the query response values after the last filled row of the Database sheet
     if LOG.error_flag() == 0:
         # Use customer headers if passed
         headers = query_resp.keys() if not custom_headers else custom_headers
-        _paste_data(query_resp, start_row, headers)
+        _paste_data(query_resp, headers, last_row)
     
     # Send summary email: success or failure
     if result_recipients:
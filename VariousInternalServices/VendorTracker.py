@@ -134,17 +134,15 @@ def _paste_data(qty_at_vendor, column_order, sheet_name, paste_range, date_cell)
         column_order = qty_at_vendor.keys() if not column_order else column_order
         rows = [[row.get(k, "") for k in column_order] for row in qty_at_vendor]
         
-        # Updating cell's data.
-        SS.clear_range(sheet_name, paste_range)
-        LOG.log("paste_data", "Successfully cleared import range. ")
-        SS.update_range(sheet_name, paste_range, rows)
-        LOG.log("paste_data", "Successfully imported updated vendor data from Fishbowl. ")
-
-        # Updating 'last updated' date. 
-        SS.clear_range(sheet_name, date_cell)
-        LOG.log("paste_data", "Successfully cleared 'last updated' date cell. ")
-        SS.update_range(sheet_name, date_cell, [[str(TODAY)]])
-        LOG.log("paste_data", "Successfully updated 'last updated' date cell to todays date. ")
+        # Syncing the import range (changed rows only) and updating the 'last updated' date: one batch read,
+        # one batch clear of the removed rows, then one batch update.
+        buffer = SS.write_buffer()
+        buffer.sync_range(sheet_name, paste_range, rows)
+        buffer.update_range(sheet_name, date_cell, [[str(TODAY)]])
+        synced = buffer.flush()[(sheet_name, paste_range)]
+        LOG.log("paste_data", f"Synced the import range: {synced['rows_written']} rows written in {synced['blocks']} " \
+                              f"blocks, {synced['rows_cleared']} rows cleared. ")
+        LOG.log("paste_data", "Successfully imported updated vendor data from Fishbowl and updated the date to today. ")
 
     except Exception as e:
         LOG.log("paste_data", e, True)
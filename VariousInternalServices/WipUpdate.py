@@ -43,8 +43,7 @@ def _archive_wip_data() -> None:
     # verifying column positions have not changed. 
     try:
         LOG.log("archive_wip_data", "Verifying column positions... ")
-        master_sku_list_headers = SS.read_range("MASTER SKU LIST", "F1:I1")
-        results_headers = SS.read_range("RESULTS", "D2:H2")
+        master_sku_list_headers, results_headers = SS.batch_read([("MASTER SKU LIST", "F1:I1"), ("RESULTS", "D2:H2")])
         LOG.log("archive_wip_data", "Success. Read column headers. ")
         if len(master_sku_list_headers[0]) != 4 or len(results_headers[0]) != 5:
             raise ColumnPositionChanged("Columns were moved in the WIP Tracker, and some columns " \
@@ -76,8 +75,7 @@ def _archive_wip_data() -> None:
     # Collecting data to archive. 
     try:
         LOG.log("archive_wip_data", "Reading column data... ")
-        master_sku_list_data = SS.read_range("MASTER SKU LIST", "I6:I")
-        results_data = SS.read_range("RESULTS", "D4:H")
+        master_sku_list_data, results_data = SS.batch_read([("MASTER SKU LIST", "I6:I"), ("RESULTS", "D4:H")])
         last_bo_qty_data = []
         last_week_ship_data = []
 
@@ -109,10 +107,8 @@ def _archive_wip_data() -> None:
 
     # Paste Last Week Ship (Results sheet)
     try:
-        LOG.log("archive_wip_data", "Pasting to last BO qty column in RESULTS. ")
-        SS.update_range("RESULTS", "D4:D", last_bo_qty_data)
-        LOG.log("archive_wip_data", "Pasting to last week ship column in RESULTS. ")
-        SS.update_range("RESULTS", "G4:G", last_week_ship_data)
+        LOG.log("archive_wip_data", "Pasting to last BO qty and last week ship columns in RESULTS. ")
+        SS.batch_write({("RESULTS", "D4:D"): last_bo_qty_data, ("RESULTS", "G4:G"): last_week_ship_data})
         LOG.log("archive_wip_data", "Success. RESULTS sheet data archived. ")
     except Exception as e:
         LOG.log("archive_wip_data", e, True)
@@ -209,60 +205,79 @@ def _csv_export() -> None:
 
 #---------------------- Paste FB data into WIP. ------------------------------#
 
-def _six_months_ship_report() -> None:
+def _six_months_ship_report(buffer) -> None:
     """
-    Clears and replaces the data in the six month ship tab of the WIP with the new Fishbowl data.
+    Queues the sync of the six month ship tab of the WIP with the new Fishbowl data.
     """
     try:
-        LOG.log("six_months_ship_report", "Updating six months shipped report sheet... ")
+        LOG.log("six_months_ship_report", "Preparing six months shipped report sheet... ")
         column_order = ['ProductNumber', 'ProductDescription', 'Qty']
         rows = [[row.get(k, "") for k in column_order] for row in six_month_ship]
-        SS.clear_range("PASTE 6 MONTH SHIPPED", "F3:H")
-        LOG.log("six_months_ship_report", "Previous report data cleared successfully. ")
-        SS.update_range("PASTE 6 MONTH SHIPPED", "F3:H", rows)
-        LOG.log("six_months_ship_report", "New report data pasted successfully. ")
+        buffer.sync_range("PASTE 6 MONTH SHIPPED", "F3:H", rows)
+        LOG.log("six_months_ship_report", "New report data queued successfully. ")
     except Exception as e:
-        message = "Errors when attempting to replace the six month ship report in the WIP. WIP Data has " \
-        "already been archived. Ending call stack. "
+        message = "Errors when attempting to prepare the six month ship report for the WIP. WIP Data has " \
+        "already been archived. No report sheet was modified. Ending call stack. "
         LOG.log("six_months_ship_report", message, True)
         LOG.log("six_months_ship_report", e, True)
 
-def _bo_report() -> None:
+def _bo_report(buffer) -> None:
     """
-    Clears and replaces the data in the BO report tab of the WIP with the new Fishbowl data.
+    Queues the sync of the BO report tab of the WIP with the new Fishbowl data.
     """
     try:
-        LOG.log("bo_report", "Updating BO report sheet... ")
+        LOG.log("bo_report", "Preparing BO report sheet... ")
         column_order = ['Product', 'Description', 'TotalOrdered']
         rows = [[row.get(k, "") for k in column_order] for row in bo]
-        SS.clear_range("PASTE BACKORDER REPORT", "F3:H")
-        LOG.log("bo_report", "Previous report data cleared successfully. ")
-        SS.update_range("PASTE BACKORDER REPORT", "F3:H", rows)
-        LOG.log("bo_report", "New report data pasted successfully. ")
+        buffer.sync_range("PASTE BACKORDER REPORT", "F3:H", rows)
+        LOG.log("bo_report", "New report data queued successfully. ")
     except Exception as e:
-            message = "Errors when attempting to replace the BO report in the WIP. 6 month shipped report was " \
-            "already completed. all data was already archived. Ending call stack. "
-            LOG.log("six_months_ship_report", message, True)
-            LOG.log("six_months_ship_report", e, True)
+            message = "Errors when attempting to prepare the BO report for the WIP. All data was already " \
+            "archived. No report sheet was modified. Ending call stack. "
+            LOG.log("bo_report", message, True)
+            LOG.log("bo_report", e, True)
 
-def _last_week_ship_report() -> None:
+def _last_week_ship_report(buffer) -> None:
     """
-    Clears and replaces the data in the last week ship tab of the WIP with the new Fishbowl data.
+    Queues the sync of the last week ship tab of the WIP with the new Fishbowl data.
     """
     try:
-        LOG.log("last_week_ship_report", "Updating last week ship report sheet... ")
+        LOG.log("last_week_ship_report", "Preparing last week ship report sheet... ")
         column_order = ['ProductNumber', 'ProductDescription', 'Qty']
         rows = [[row.get(k, "") for k in column_order] for row in last_week_ship]
-        SS.clear_range("PASTE WEEK SHIPPED", "F3:H")
-        LOG.log("last_week_ship_report", "Previous report data cleared successfully. ")
-        SS.update_range("PASTE WEEK SHIPPED", "F3:H", rows)
-        LOG.log("last_week_ship_report", "New report data pasted successfully. ")
+        buffer.sync_range("PASTE WEEK SHIPPED", "F3:H", rows)
+        LOG.log("last_week_ship_report", "New report data queued successfully. ")
     
     except Exception as e:
-        message = "Errors when attempting to replace the BO report in the WIP. 6 month shipped and BO reports " \
-        "were already completed. all data was already archived. Ending call stack. "
-        LOG.log("six_months_ship_report", message, True)
-        LOG.log("six_months_ship_report", e, True)
+        message = "Errors when attempting to prepare the last week ship report for the WIP. All data was " \
+        "already archived. No report sheet was modified. Ending call stack. "
+        LOG.log("last_week_ship_report", message, True)
+        LOG.log("last_week_ship_report", e, True)
+
+def _paste_reports() -> None:
+    """
+    Syncs the three report tabs of the WIP with one batch read, then one batch clear of the removed rows and
+    one batch update of the changed rows.
+    """
+    buffer = SS.write_buffer()
+    for queue_report in (_six_months_ship_report, _bo_report, _last_week_ship_report):
+        if LOG.error_flag() == 0:
+            queue_report(buffer)
+    if LOG.error_flag() == 1:
+        return
+
+    try:
+        LOG.log("paste_reports", f"Syncing the report sheets ({buffer.pending()} ranges)... ")
+        stats = buffer.flush()
+        for (sheet_name, cell_range), synced in stats.items():
+            LOG.log("paste_reports", f"{sheet_name}: {synced['rows_written']} rows written in {synced['blocks']} " \
+                                     f"blocks, {synced['rows_cleared']} rows cleared. ")
+        LOG.log("paste_reports", "Report data synced successfully. ")
+    except Exception as e:
+        message = "Errors when attempting to replace the report sheets in the WIP. WIP Data has already been " \
+        "archived. The report sheets may have been cleared without the new data. Ending call stack. "
+        LOG.log("paste_reports", message, True)
+        LOG.log("paste_reports", e, True)
 
 def _update_wip_date() -> None:
     """
@@ -371,13 +386,7 @@ def wip_update(email_recipients:list[str], last_week_ship_query_name:str='WipLas
         _csv_export()
     
     if LOG.error_flag() == 0:
-        _six_months_ship_report()
-
-    if LOG.error_flag() == 0:
-        _bo_report()
-
-    if LOG.error_flag() == 0:
-        _last_week_ship_report()
+        _paste_reports()
 
     if LOG.error_flag() == 0:
         _update_wip_date()
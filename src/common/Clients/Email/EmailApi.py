@@ -7,6 +7,9 @@ Purpose:
 """
 
 import requests, json, base64, os
+from common.Utils.Metrics import REGISTRY
+
+EMAIL_SEND_SECONDS = REGISTRY.histogram("email_send_seconds", "SMTP2GO email send latency in seconds.", ("source",), timing="email")
 
 def send_email(subject: str, html_body: str, recipients: list, attachments=[], sender="") -> None:
     """ 
@@ -49,5 +52,6 @@ def send_email(subject: str, html_body: str, recipients: list, attachments=[], s
 
     payload = json.dumps(payload)
 
-    response = requests.request("POST", url, headers=headers, data=payload)
+    with EMAIL_SEND_SECONDS.time(source="common"):
+        response = requests.request("POST", url, headers=headers, data=payload)
     return response
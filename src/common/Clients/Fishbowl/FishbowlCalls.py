@@ -57,7 +57,7 @@ def fb_login(is_test_db) -> object:
             except:
                 print("Session Created: ", response.status_code, response.reason)
         else:
-            print(f"No token in the response: {response.status_code, response.reason, response.json().get("message")}")
+            print(f"No token in the response: {response.status_code, response.reason, response.json().get('message')}")
 
         return {"token":token, "status":response.status_code, "reason":response.reason}
     except Exception as e:
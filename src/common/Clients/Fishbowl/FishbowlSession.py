@@ -7,8 +7,15 @@ Purpose:
 """
 
 from common.Clients.Fishbowl.FishbowlCalls import *
+from common.Utils.Metrics import REGISTRY
 import time
 
+# Instrumentation hooks: every REST call made through a session is timed by endpoint.
+FISHBOWL_CALL_SECONDS = REGISTRY.histogram(
+    "fishbowl_call_seconds", "Fishbowl REST call latency in seconds.", ("endpoint",), timing="fishbowl")
+FISHBOWL_CALL_FAILURES = REGISTRY.counter(
+    "fishbowl_call_failures", "Fishbowl REST calls that did not return OK.", ("endpoint",))
+
 class CallFailure(Exception):
     """Custom exception to return on call failure"""
     pass
@@ -51,12 +58,14 @@ class FishbowlSession:
         # try to login repeatedly if session enables this feature.
         while logged_in is False and retry_counter > 0:
             print(f"Fishbowl login attempts remaining {retry_counter}")
-            result = fb_login(self._is_test_db)
+            with FISHBOWL_CALL_SECONDS.time(endpoint="login"):
+                result = fb_login(self._is_test_db)
             if result and result["token"]:
                 print("Logged In successfully")
                 logged_in = True
                 return result["token"]
             else:
+                FISHBOWL_CALL_FAILURES.inc(endpoint="login")
                 retry_counter -= 1
                 print(f"Login Failed. Waiting for {self._attempts_wait} seconds before next login attempt.")
                 time.sleep(self._attempts_wait)
@@ -78,13 +87,15 @@ class FishbowlSession:
         Returns {status, reason}
         """
         if self._is_active:
-            result = fb_logout(self._token, self._is_test_db)
+            with FISHBOWL_CALL_SECONDS.time(endpoint="logout"):
+                result = fb_logout(self._token, self._is_test_db)
             if result["reason"] == "OK":
                 self._call_count += 1
                 self._is_active = False
                 self._token = None
                 return result
             else:
+                FISHBOWL_CALL_FAILURES.inc(endpoint="logout")
                 print(result["status"], result["reason"])
                 raise CallFailure
         else:
@@ -102,11 +113,13 @@ class FishbowlSession:
         if not self.is_logged_in():
             raise Exception("Fishbowl session is logged out or inactive.")
         
-        result = fb_query(self._token, sql, self._is_test_db)
+        with FISHBOWL_CALL_SECONDS.time(endpoint="data-query"):
+            result = fb_query(self._token, sql, self._is_test_db)
         if result["reason"] == "OK":
             self._call_count += 1
             return result
         else:
+            FISHBOWL_CALL_FAILURES.inc(endpoint="data-query")
             print(result["status"], result["reason"], result["data"])
             self.logout()
             raise CallFailure
@@ -118,12 +131,14 @@ class FishbowlSession:
         Auto logout on failure. Returns the API POST request response.
         data must be a 2D-array/matrix. Returns the response and reason code if failure. 
         """
-        result = fb_inventory_cycle_import(self._token, data, self._is_test_db)
+        with FISHBOWL_CALL_SECONDS.time(endpoint="cycle-count-import"):
+            result = fb_inventory_cycle_import(self._token, data, self._is_test_db)
 
         if result.reason == "OK":
             self._call_count += 1
             return result
         else:
+            FISHBOWL_CALL_FAILURES.inc(endpoint="cycle-count-import")
             print(result.content)
             self.logout()
             raise CallFailure
@@ -0,0 +1,88 @@
+"""
+Docstring for Common.clients.Google.Benchmark
+Purpose:
+-   Runs the GoogleSession write and read paths (sync_range, append_at_end, iter_range) against FakeSheets and
+    reports the API calls, request bytes and time each one takes, so a change to them can be compared offline.
+-   Usage: python -m common.Clients.Google.Benchmark [--rows 20000] [--changed 0.01] [--latency 0.05]
+"""
+
+from common.Clients.Google.FakeSheets import FakeSheets
+from common.Clients.Google.GoogleSession import GoogleSession
+import argparse
+import random
+import time
+
+SHEET_ID = "benchmark"
+COLUMNS = 8
+
+
+def _rows(count:int, first:int = 0) -> list:
+    """ count rows of sample inventory data: a SKU, text, integer quantities, a price and a date. """
+    return [[f"SKU-{index:06d}", f"Product {index}", index % 97, (index * 7) % 500, round(index * 0.37, 2),
+             f"{index % 3}.5%", "2024-01-05", "TRUE" if index % 2 else "FALSE"]
+            for index in range(first, first + count)]
+
+
+def _measure(fake:FakeSheets, name:str, func) -> dict:
+    fake.reset_stats()
+    start = time.perf_counter()
+    result = func()
+    report = {
+        "scenario": name,
+        "seconds": round(time.perf_counter() - start, 3),
+        "calls": dict(fake.calls),
+        "request_bytes": sum(fake.payload_bytes.values()),
+        "result": result
+    }
+    print(f"{name}: {report['seconds']}s, {sum(fake.calls.values())} calls {report['calls']}, "
+          f"{report['request_bytes']} request bytes, result {result}")
+    return report
+
+
+def run(rows:int = 20000, changed:float = 0.01, latency:float = 0.05, bandwidth:float = 5_000_000,
+        window_rows:int = 5000) -> list:
+    """
+    Runs every scenario on a fresh fake. Each call costs latency seconds plus its request bytes / bandwidth.
+    Returns the reports, one dict per scenario.
+    """
+    fake = FakeSheets(latency=lambda method, size: latency + size / bandwidth, row_count=rows * 2)
+    session = GoogleSession(SHEET_ID, service=fake, rate_limit=False)
+    end_column = chr(ord("A") + COLUMNS - 1)
+    data = _rows(rows)
+    reports = []
+
+    reports.append(_measure(fake, f"sync_range, {rows} new rows", lambda: session.sync_range(
+        "Sync", f"A1:{end_column}", data)))
+
+    edited = [list(row) for row in data]
+    for index in random.Random(1).sample(range(rows), max(1, int(rows * changed))):
+        edited[index][2] = edited[index][2] + 1
+    reports.append(_measure(fake, f"sync_range, {changed:.0%} of the rows changed (snapshot)", lambda: session.sync_range(
+        "Sync", f"A1:{end_column}", edited)))
+    session._snapshots.clear()
+    reports.append(_measure(fake, f"sync_range, {changed:.0%} of the rows changed (read first)", lambda: session.sync_range(
+        "Sync", f"A1:{end_column}", data)))
+
+    fake.add_sheet(SHEET_ID, "Append", _rows(rows), row_count=rows * 2)
+    reports.append(_measure(fake, f"append_at_end, {rows // 2} rows", lambda: session.append_at_end(
+        "Append", f"A:{end_column}", _rows(rows // 2, first=rows))))
+
+    for workers in (1, 4):
+        reports.append(_measure(fake, f"iter_range, {window_rows} row windows, {workers} worker(s)", lambda: sum(
+            1 for _ in session.iter_range("Append", f"A1:{end_column}", window_rows=window_rows, max_workers=workers))))
+    return reports
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks the GoogleSession calls against FakeSheets.")
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--changed", type=float, default=0.01, help="share of the rows the second sync changes")
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds per call")
+    parser.add_argument("--bandwidth", type=float, default=5_000_000, help="request bytes per second")
+    parser.add_argument("--window-rows", type=int, default=5000)
+    args = parser.parse_args()
+    run(args.rows, args.changed, args.latency, args.bandwidth, args.window_rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,633 @@
+"""
+Docstring for Common.clients.Google.FakeSheets
+Purpose:
+-   In-process stand-in for the Sheets spreadsheets() resource, so GoogleSession and the services built on it
+    (WipUpdate, VendorTracker, OnTimePerformance) can be benchmarked and checked offline, without a spreadsheet.
+-   Implements the part of the API GoogleSession uses: values get / update / append / clear, batchGet /
+    batchUpdate / batchClear and spreadsheets.get for the grid size. Requests are executed like the real ones
+    (request.execute()). Values are parsed like the API parses USER_ENTERED / RAW input and read back with the
+    requested valueRenderOption / dateTimeRenderOption, appends find the first table of the range like the API.
+-   Latency, per-minute read / write quotas (429 with Retry-After), payload limits (413) and one-off failures
+    are configurable, calls and bytes sent are counted per method.
+-   Inject it with GoogleSession(sheet_id, service=fake), or fake.install() / `with fake:` for every session
+    created meanwhile (the services build their own sessions).
+"""
+
+from collections import Counter, deque
+from common.Clients.Google.GoogleSession import set_default_service, _column_number, _column_letters
+from datetime import datetime, timedelta
+from googleapiclient.errors import HttpError
+import httplib2
+import json
+import math
+import re
+import threading
+import time
+
+DEFAULT_ROW_COUNT = 1000
+
+# [start column][start row][:[end column][end row]], every part optional ("A:R", "F3:H", "AA1", "5:10")
+_A1_CELLS = re.compile(r"^([A-Z]*)(\d*)(?::([A-Z]*)(\d*))?$")
+
+
+def _http_error(status:int, message:str, retry_after:float = None) -> HttpError:
+    headers = {"status": status}
+    if retry_after is not None:
+        headers["retry-after"] = str(math.ceil(retry_after))
+    content = json.dumps({"error": {"code": status, "message": message}}).encode()
+    return HttpError(httplib2.Response(headers), content, uri="fake://sheets")
+
+
+# USER_ENTERED input the API turns into numbers and dates (see _parse_entered)
+_ENTERED_NUMBER = re.compile(r"^([+-])?(\$)?((?:\d{1,3}(?:,\d{3})+|\d+)(?:\.\d*)?|\.\d+)(?:[eE]([+-]?\d+))?(%)?$")
+_ENTERED_ISO_DATE = re.compile(r"^(\d{4})-(\d{1,2})-(\d{1,2})(?:[ T](\d{1,2}):(\d{2})(?::(\d{2}))?)?$")
+_ENTERED_US_DATE = re.compile(r"^(\d{1,2})/(\d{1,2})/(\d{4})(?: (\d{1,2}):(\d{2})(?::(\d{2}))?\s*([AaPp][Mm])?)?$")
+_ENTERED_TIME = re.compile(r"^(\d{1,2}):(\d{2})(?::(\d{2}))?\s*([AaPp][Mm])?$")
+# day 0 of the date serial numbers
+_EPOCH = datetime(1899, 12, 30)
+# date / time tokens of a number format pattern, anything else is a literal
+_DATE_TOKENS = re.compile(r"yyyy|yy|mm|m|dd|d|hh|h|ss|am/pm|.", re.IGNORECASE)
+
+
+class _Cell:
+    """ A filled cell: its effective value (number, bool or text), the number format it got and its formula. """
+    __slots__ = ("value", "pattern", "formula")
+
+    def __init__(self, value, pattern:str = None, formula:str = None):
+        self.value = value
+        self.pattern = pattern
+        self.formula = formula
+
+
+def _typed(number:float):
+    return int(number) if float(number).is_integer() and abs(number) < 1e15 else float(number)
+
+
+def _serial(year, month, day, hour=0, minute=0, second=0, meridiem=None):
+    hour = int(hour or 0)
+    if meridiem:
+        hour = hour % 12 + (12 if meridiem.lower() == "pm" else 0)
+    moment = datetime(int(year), int(month), int(day), hour, int(minute or 0), int(second or 0))
+    return _typed((moment - _EPOCH).total_seconds() / 86400)
+
+
+def _parse_entered(value):
+    """
+    The cell a value written with USER_ENTERED becomes, or None for an empty one. Like the API: a leading
+    apostrophe keeps text as is, "=" starts a formula, TRUE / FALSE are booleans, numbers may carry
+    thousands separators, a currency sign, a percent sign or an exponent, and dates / times become serial
+    numbers. Parsed input also sets the cell's number format, which FORMATTED_VALUE renders.
+    """
+    if isinstance(value, bool):
+        return _Cell(value)
+    if isinstance(value, (int, float)):
+        return _Cell(_typed(value))
+    text = str(value)
+    if text == "":
+        return None
+    if text.startswith("'"):
+        return _Cell(text[1:])
+    if text.startswith("="):
+        return _Cell(text, formula=text)       # formulas are kept, not evaluated
+    stripped = text.strip()
+    if stripped.upper() in ("TRUE", "FALSE"):
+        return _Cell(stripped.upper() == "TRUE")
+
+    match = _ENTERED_NUMBER.match(stripped)
+    if match:
+        sign, currency, digits, exponent, percent = match.groups()
+        number = float(digits.replace(",", "")) * (10 ** int(exponent) if exponent else 1) * (-1 if sign == "-" else 1)
+        decimals = "." in digits and not digits.endswith(".")
+        if percent:
+            return _Cell(_typed(round(number / 100, 12)), "0.00%" if decimals else "0%")
+        if currency:
+            return _Cell(_typed(number), "$#,##0.00")
+        if exponent:
+            return _Cell(_typed(number), "0.00E+00")
+        if "," in digits:
+            return _Cell(_typed(number), "#,##0.00" if decimals else "#,##0")
+        return _Cell(_typed(number))
+
+    match = _ENTERED_ISO_DATE.match(stripped)
+    if match:
+        year, month, day, hour, minute, second = match.groups()
+        try:
+            return _Cell(_serial(year, month, day, hour, minute, second),
+                         "yyyy-mm-dd hh:mm:ss" if hour else "yyyy-mm-dd")
+        except ValueError:
+            return _Cell(text)
+    match = _ENTERED_US_DATE.match(stripped)
+    if match:
+        month, day, year, hour, minute, second, meridiem = match.groups()
+        try:
+            return _Cell(_serial(year, month, day, hour, minute, second, meridiem),
+                         ("m/d/yyyy h:mm:ss" + (" am/pm" if meridiem else "")) if hour else "m/d/yyyy")
+        except ValueError:
+            return _Cell(text)
+    match = _ENTERED_TIME.match(stripped)
+    if match:
+        hour, minute, second, meridiem = match.groups()
+        if int(hour) < (13 if meridiem else 24) and int(minute) < 60 and int(second or 0) < 60:
+            return _Cell(_serial(1899, 12, 30, hour, minute, second, meridiem),
+                         "h:mm:ss am/pm" if meridiem else "h:mm:ss")
+    return _Cell(text)
+
+
+def _parse_raw(value):
+    """ The cell a value written with RAW becomes: strings stay text, JSON numbers and booleans stay typed. """
+    if isinstance(value, bool):
+        return _Cell(value)
+    if isinstance(value, (int, float)):
+        return _Cell(_typed(value))
+    text = str(value)
+    return _Cell(text) if text != "" else None
+
+
+def _is_date_pattern(pattern:str) -> bool:
+    return bool(pattern) and bool(re.search(r"[ydhs]", pattern, re.IGNORECASE))
+
+
+def _format_date(serial:float, pattern:str) -> str:
+    moment = _EPOCH + timedelta(seconds=round(serial * 86400))
+    tokens = _DATE_TOKENS.findall(pattern)
+    twelve_hour = any(token.lower() == "am/pm" for token in tokens)
+    hour = moment.hour % 12 or 12 if twelve_hour else moment.hour
+    text = []
+    after_hour = False
+    for token in tokens:
+        lower = token.lower()
+        if lower == "yyyy":
+            text.append(f"{moment.year:04d}")
+        elif lower == "yy":
+            text.append(f"{moment.year % 100:02d}")
+        elif lower in ("mm", "m"):
+            number = moment.minute if after_hour else moment.month
+            text.append(f"{number:02d}" if lower == "mm" else str(number))
+        elif lower in ("dd", "d"):
+            text.append(f"{moment.day:02d}" if lower == "dd" else str(moment.day))
+        elif lower in ("hh", "h"):
+            text.append(f"{hour:02d}" if lower == "hh" else str(hour))
+            after_hour = True
+            continue
+        elif lower == "ss":
+            text.append(f"{moment.second:02d}")
+        elif lower == "am/pm":
+            text.append("AM" if moment.hour < 12 else "PM")
+        else:
+            text.append(token)
+            if token == ":":
+                continue
+        after_hour = False
+    return "".join(text)
+
+
+def _format_number(number:float, pattern:str) -> str:
+    """ Renders number with a number format like "0", "0.0", "#,##0.00", "$#,##0.00", "0%" or "0.00E+00". """
+    body = re.search(r"[#0,.]*[0#][#0,.]*(?:E\+0+)?%?", pattern)
+    if not body:
+        return pattern
+    prefix, suffix = pattern[:body.start()], pattern[body.end():]
+    spec = body.group()
+    percent = spec.endswith("%")
+    spec = spec.rstrip("%")
+    if percent:
+        number *= 100
+    mantissa, _, exponent = spec.partition("E+")
+    decimals = len(mantissa.partition(".")[2])
+    if exponent:
+        text = f"{abs(number):.{decimals}E}"
+    else:
+        text = f"{abs(number):{',' if ',' in mantissa else ''}.{decimals}f}"
+    sign = "-" if number < 0 and float(text.replace(",", "").replace("E", "e")) != 0 else ""
+    return f"{sign}{prefix}{text}{'%' if percent else ''}{suffix}"
+
+
+def _format_general(number:float) -> str:
+    if float(number).is_integer() and abs(number) < 1e15:
+        return str(int(number))
+    return f"{number:.10g}".replace("e+", "E+").replace("e-", "E-")
+
+
+def _render(cell:_Cell, pattern:str, value_render:str, datetime_render:str):
+    """ A cell as values.get returns it with valueRenderOption / dateTimeRenderOption. """
+    if value_render == "FORMULA" and cell.formula:
+        return cell.formula
+    value = cell.value
+    if isinstance(value, bool):
+        return value if value_render != "FORMATTED_VALUE" else ("TRUE" if value else "FALSE")
+    if isinstance(value, str):
+        return value
+    if value_render != "FORMATTED_VALUE":
+        if _is_date_pattern(pattern) and datetime_render == "FORMATTED_STRING":
+            return _format_date(value, pattern)
+        return value
+    if not pattern:
+        return _format_general(value)
+    if _is_date_pattern(pattern):
+        return _format_date(value, pattern)
+    return _format_number(value, pattern)
+
+
+def _quote(title:str) -> str:
+    return f"'{title}'" if re.search(r"\W", title) else title
+
+
+class _Bounds:
+    """ A parsed A1 range. Columns are 1-based numbers, None ends are open (to the end of the sheet). """
+
+    def __init__(self, a1:str):
+        title, _, cells = a1.rpartition("!")
+        if not title:
+            title, cells = cells, ""
+        self.title = title.strip("'")
+        match = _A1_CELLS.match(cells)
+        if not match:
+            raise _http_error(400, f"Unable to parse range: {a1}")
+        start_column, start_row, end_column, end_row = match.groups()
+        self.first_column = _column_number(start_column) if start_column else 1
+        self.first_row = int(start_row) if start_row else 1
+        if ":" in cells:
+            self.last_column = _column_number(end_column) if end_column else None
+            self.last_row = int(end_row) if end_row else None
+            self.anchor = False
+        elif cells:
+            self.last_column = self.first_column if start_column else None
+            self.last_row = self.first_row if start_row else None
+            self.anchor = True          # a single cell: writes expand from it
+        else:
+            self.last_column = self.last_row = None
+            self.anchor = False
+
+    def a1(self, last_column:int = None, last_row:int = None) -> str:
+        last_column = last_column or self.last_column
+        last_row = last_row or self.last_row
+        start = f"{_column_letters(self.first_column)}{self.first_row}"
+        if last_column is None and last_row is None:
+            return f"{_quote(self.title)}!{start}"
+        end = f"{_column_letters(last_column) if last_column else ''}{last_row or ''}"
+        return f"{_quote(self.title)}!{start}:{end}"
+
+
+class _FakeRequest:
+    """ A prepared call. execute() applies the configured latency, quota and payload limits, then runs it. """
+
+    def __init__(self, fake, method:str, kind:str, spreadsheet_id:str, payload, operation):
+        self._fake = fake
+        self._method = method
+        self._kind = kind
+        self._spreadsheet_id = spreadsheet_id
+        self._payload = payload
+        self._operation = operation
+
+    def execute(self, num_retries:int = 0):
+        return self._fake._run(self)
+
+
+class _FakeValues:
+    """ The spreadsheets().values() resource. """
+
+    def __init__(self, fake):
+        self._fake = fake
+
+    def _request(self, method, kind, spreadsheet_id, payload, operation):
+        return _FakeRequest(self._fake, method, kind, spreadsheet_id, payload, operation)
+
+    def get(self, spreadsheetId, range, fields=None, majorDimension="ROWS", valueRenderOption="FORMATTED_VALUE",
+            dateTimeRenderOption="SERIAL_NUMBER", **kwargs):
+        return self._request("get", "read", spreadsheetId, range, lambda book: self._fake._mask(
+            self._fake._get(book, range, majorDimension, valueRenderOption, dateTimeRenderOption), fields))
+
+    def update(self, spreadsheetId, range, body, valueInputOption="USER_ENTERED", **kwargs):
+        return self._request("update", "write", spreadsheetId, body,
+                             lambda book: self._fake._update(book, range, body.get("values", []), valueInputOption))
+
+    def append(self, spreadsheetId, range, body, valueInputOption="USER_ENTERED", insertDataOption="OVERWRITE", **kwargs):
+        return self._request("append", "write", spreadsheetId, body, lambda book: self._fake._append(
+            book, range, body.get("values", []), insertDataOption, valueInputOption))
+
+    def clear(self, spreadsheetId, range, body=None, **kwargs):
+        return self._request("clear", "write", spreadsheetId, range,
+                             lambda book: {"spreadsheetId": spreadsheetId, "clearedRange": self._fake._clear(book, range)})
+
+    def batchGet(self, spreadsheetId, ranges, fields=None, majorDimension="ROWS", valueRenderOption="FORMATTED_VALUE",
+                 dateTimeRenderOption="SERIAL_NUMBER", **kwargs):
+        ranges = [ranges] if isinstance(ranges, str) else list(ranges)
+        return self._request("batchGet", "read", spreadsheetId, ranges, lambda book: self._fake._mask({
+            "spreadsheetId": spreadsheetId,
+            "valueRanges": [self._fake._get(book, cell_range, majorDimension, valueRenderOption, dateTimeRenderOption)
+                            for cell_range in ranges]
+        }, fields))
+
+    def batchUpdate(self, spreadsheetId, body, **kwargs):
+        def _operation(book):
+            input_option = body.get("valueInputOption", "USER_ENTERED")
+            responses = [self._fake._update(book, data["range"], data.get("values", []), input_option)
+                         for data in body.get("data", [])]
+            return {
+                "spreadsheetId": spreadsheetId,
+                "totalUpdatedCells": sum(response["updatedCells"] for response in responses),
+                "responses": responses
+            }
+        return self._request("batchUpdate", "write", spreadsheetId, body, _operation)
+
+    def batchClear(self, spreadsheetId, body, **kwargs):
+        return self._request("batchClear", "write", spreadsheetId, body, lambda book: {
+            "spreadsheetId": spreadsheetId,
+            "clearedRanges": [self._fake._clear(book, cell_range) for cell_range in body.get("ranges", [])]
+        })
+
+
+class FakeSheets:
+    """
+    Fake spreadsheets() resource holding any number of spreadsheets in memory.
+    - latency: seconds added to every call, or a callable(method, payload_bytes) returning them.
+    - reads_per_minute / writes_per_minute: quotas over a sliding minute, exceeded calls get a 429 with Retry-After.
+    - max_payload_bytes: request bodies over this size get a 413.
+    - auto_create: unknown spreadsheets and sheets are created empty on first use (otherwise 404 / 400).
+    Writes past the grid row count fail like the API does (appends grow the grid), columns are not limited.
+    Cells hold typed values and the number format USER_ENTERED parsing gave them, columns can be given a
+    number format of their own (add_sheet / set_number_format), so FORMATTED_VALUE reads show the rounding
+    and date formats a real sheet would. Formulas are stored but not evaluated.
+    """
+    project_id = "fake"
+
+    def __init__(self, latency=0.0, reads_per_minute:int = None, writes_per_minute:int = None,
+                 max_payload_bytes:int = None, auto_create:bool = True, row_count:int = DEFAULT_ROW_COUNT):
+        self.latency = latency
+        self.reads_per_minute = reads_per_minute
+        self.writes_per_minute = writes_per_minute
+        self.max_payload_bytes = max_payload_bytes
+        self.auto_create = auto_create
+        self.row_count = row_count
+        self._lock = threading.Lock()
+        self._books = {}        # spreadsheet id -> sheet title -> {'rows': [[_Cell | None]], 'row_count': int, 'formats': {column: pattern}}
+        self._quota = {"read": deque(), "write": deque()}
+        self._failures = []
+        self.reset_stats()
+
+    # ------------------------------ Setup / inspection ------------------------------ #
+
+    def add_sheet(self, spreadsheet_id:str, title:str, rows:list = None, row_count:int = None,
+                  number_formats:dict = None) -> None:
+        """
+        Creates (or replaces) a sheet holding rows from A1, entered like USER_ENTERED values.
+        number_formats maps column letters to a number format pattern (ex: {"C": "0.0", "D": "m/d/yyyy"}).
+        """
+        with self._lock:
+            sheet = {"rows": [], "row_count": row_count or self.row_count, "formats": {}}
+            self._books.setdefault(spreadsheet_id, {})[title] = sheet
+            for column, pattern in (number_formats or {}).items():
+                sheet["formats"][_column_number(column)] = pattern
+            self._write(sheet, 1, 1, rows or [], "USER_ENTERED")
+
+    def set_number_format(self, spreadsheet_id:str, title:str, column:str, pattern:str = None) -> None:
+        """ Sets (or with None removes) the number format of a whole column. """
+        with self._lock:
+            sheet = self._books[spreadsheet_id][title]
+            if pattern is None:
+                sheet["formats"].pop(_column_number(column), None)
+            else:
+                sheet["formats"][_column_number(column)] = pattern
+
+    def sheet_values(self, spreadsheet_id:str, title:str, value_render:str = "FORMATTED_VALUE") -> list:
+        """ The contents of a sheet from A1, as a values.get of the whole sheet would return them. """
+        with self._lock:
+            return self._get(self._books[spreadsheet_id], title, value_render=value_render).get("values", [])
+
+    def fail_next(self, status:int = 429, count:int = 1, retry_after:float = None, method:str = None) -> None:
+        """ Makes the next count calls (of method, or of any method) fail with status. """
+        with self._lock:
+            self._failures.extend([(method, status, retry_after)] * count)
+
+    def reset_stats(self) -> None:
+        self.calls = Counter()          # method -> calls, failed ones included
+        self.errors = Counter()         # status -> calls answered with it
+        self.payload_bytes = Counter()  # method -> request body bytes
+
+    def install(self) -> 'FakeSheets':
+        """ Makes every GoogleSession created from now on use this fake. """
+        set_default_service(self)
+        return self
+
+    def uninstall(self) -> None:
+        set_default_service(None)
+
+    def __enter__(self):
+        return self.install()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.uninstall()
+        return False
+
+    # ------------------------------ Resource methods -------------------------------- #
+
+    def values(self) -> _FakeValues:
+        return _FakeValues(self)
+
+    def get(self, spreadsheetId, fields=None, **kwargs) -> _FakeRequest:
+        """ spreadsheets.get, limited to the sheet properties. """
+        def _operation(book):
+            return {"spreadsheetId": spreadsheetId, "sheets": [
+                {"properties": {"sheetId": index, "title": title, "gridProperties": {
+                    "rowCount": sheet["row_count"],
+                    "columnCount": max((len(row) for row in sheet["rows"]), default=0)
+                }}} for index, (title, sheet) in enumerate(book.items())
+            ]}
+        return _FakeRequest(self, "spreadsheets.get", "read", spreadsheetId, None, _operation)
+
+    # ------------------------------ Execution --------------------------------------- #
+
+    def _run(self, request:_FakeRequest):
+        payload_bytes = len(json.dumps(request._payload, default=str)) if request._payload is not None else 0
+        latency = self.latency(request._method, payload_bytes) if callable(self.latency) else self.latency
+        if latency:
+            time.sleep(latency)
+        with self._lock:
+            self.calls[request._method] += 1
+            self.payload_bytes[request._method] += payload_bytes
+            try:
+                self._check_limits(request, payload_bytes)
+                book = self._books.get(request._spreadsheet_id)
+                if book is None:
+                    if not self.auto_create:
+                        raise _http_error(404, f"Requested entity was not found: {request._spreadsheet_id}")
+                    book = self._books[request._spreadsheet_id] = {}
+                return request._operation(book)
+            except HttpError as e:
+                self.errors[e.resp.status] += 1
+                raise
+
+    def _check_limits(self, request:_FakeRequest, payload_bytes:int) -> None:
+        for index, (method, status, retry_after) in enumerate(self._failures):
+            if method is None or method == request._method:
+                del self._failures[index]
+                raise _http_error(status, "Injected failure", retry_after)
+
+        if self.max_payload_bytes is not None and payload_bytes > self.max_payload_bytes:
+            raise _http_error(413, f"Request payload size exceeds the limit: {self.max_payload_bytes} bytes.")
+
+        limit = self.reads_per_minute if request._kind == "read" else self.writes_per_minute
+        if limit is not None:
+            now = time.monotonic()
+            calls = self._quota[request._kind]
+            while calls and now - calls[0] >= 60:
+                calls.popleft()
+            if len(calls) >= limit:
+                raise _http_error(429, f"Quota exceeded for quota metric '{request._kind.title()} requests'.",
+                                  retry_after=60 - (now - calls[0]))
+            calls.append(now)
+
+    # ------------------------------ Grid operations --------------------------------- #
+
+    def _sheet(self, book:dict, bounds:_Bounds) -> dict:
+        sheet = book.get(bounds.title)
+        if sheet is None:
+            if not self.auto_create:
+                raise _http_error(400, f"Unable to parse range: {bounds.a1()}")
+            sheet = book[bounds.title] = {"rows": [], "row_count": self.row_count, "formats": {}}
+        return sheet
+
+    @staticmethod
+    def _write(sheet:dict, first_row:int, first_column:int, values:list, input_option:str) -> None:
+        if input_option not in ("USER_ENTERED", "RAW"):
+            raise _http_error(400, f"Invalid valueInputOption: {input_option}")
+        parse = _parse_entered if input_option == "USER_ENTERED" else _parse_raw
+        rows = sheet["rows"]
+        for offset, row in enumerate(values):
+            index = first_row - 1 + offset
+            while len(rows) <= index:
+                rows.append([])
+            target = rows[index]
+            for column, value in enumerate(row, start=first_column - 1):
+                if value is None:       # null cells are left unchanged, like the API
+                    continue
+                while len(target) <= column:
+                    target.append(None)
+                target[column] = parse(value)
+
+    def _get(self, book:dict, cell_range:str, major_dimension:str = "ROWS", value_render:str = "FORMATTED_VALUE",
+             datetime_render:str = "SERIAL_NUMBER") -> dict:
+        if value_render not in ("FORMATTED_VALUE", "UNFORMATTED_VALUE", "FORMULA"):
+            raise _http_error(400, f"Invalid valueRenderOption: {value_render}")
+        bounds = _Bounds(cell_range)
+        sheet = self._sheet(book, bounds)
+        formats = sheet["formats"]
+        last_row = min(bounds.last_row or len(sheet["rows"]), len(sheet["rows"]))
+        values = []
+        for row in sheet["rows"][bounds.first_row - 1:last_row]:
+            cells = row[bounds.first_column - 1:bounds.last_column]
+            while cells and cells[-1] is None:
+                cells = cells[:-1]
+            values.append([
+                "" if cell is None else
+                _render(cell, formats.get(column, cell.pattern), value_render, datetime_render)
+                for column, cell in enumerate(cells, start=bounds.first_column)
+            ])
+        while values and not values[-1]:
+            values.pop()
+        if major_dimension == "COLUMNS":
+            width = max((len(row) for row in values), default=0)
+            values = [[row[column] if column < len(row) else "" for row in values] for column in range(width)]
+            for column in values:
+                while column and column[-1] == "":
+                    column.pop()
+        result = {"range": bounds.a1(last_row=bounds.last_row or sheet["row_count"]), "majorDimension": major_dimension}
+        if values:
+            result["values"] = values
+        return result
+
+    def _update(self, book:dict, cell_range:str, values:list, input_option:str = "USER_ENTERED") -> dict:
+        bounds = _Bounds(cell_range)
+        sheet = self._sheet(book, bounds)
+        height = len(values)
+        width = max((len(row) for row in values), default=0)
+        last_row = bounds.first_row + height - 1
+        last_column = bounds.first_column + width - 1
+        if not bounds.anchor and ((bounds.last_row and last_row > bounds.last_row) or
+                                  (bounds.last_column and last_column > bounds.last_column)):
+            raise _http_error(400, f"Requested writing within range [{cell_range}], but tried writing to "
+                                   f"{_column_letters(last_column)}{last_row}")
+        if last_row > sheet["row_count"]:
+            raise _http_error(400, f"Range ({cell_range}) exceeds grid limits. Max rows: {sheet['row_count']}")
+        self._write(sheet, bounds.first_row, bounds.first_column, values, input_option)
+        return {
+            "updatedRange": bounds.a1(last_column=last_column, last_row=last_row) if height else bounds.a1(),
+            "updatedRows": height,
+            "updatedColumns": width,
+            "updatedCells": sum(len(row) for row in values)
+        }
+
+    @staticmethod
+    def _find_table(sheet:dict, bounds:_Bounds):
+        """
+        The first table in bounds, as (first row, last row, first column, last column), or None. Like the API,
+        the table starts at the first row with a value in the range's columns and ends before the next fully
+        blank row: rows after a blank gap are not part of it, an append lands in the gap and overwrites them.
+        """
+        rows = sheet["rows"]
+        last_row = min(bounds.last_row or len(rows), len(rows))
+        first = None
+        first_column = last_column = None
+        for index in range(bounds.first_row - 1, last_row):
+            filled = [column for column, cell in enumerate(rows[index][bounds.first_column - 1:bounds.last_column],
+                                                           start=bounds.first_column) if cell is not None]
+            if not filled:
+                if first is not None:
+                    return first, index, first_column, last_column
+                continue
+            if first is None:
+                first = index + 1
+                first_column, last_column = filled[0], filled[-1]
+            first_column = min(first_column, filled[0])
+            last_column = max(last_column, filled[-1])
+        if first is None:
+            return None
+        return first, last_row, first_column, last_column
+
+    def _append(self, book:dict, cell_range:str, values:list, insert_data_option:str,
+                input_option:str = "USER_ENTERED") -> dict:
+        bounds = _Bounds(cell_range)
+        sheet = self._sheet(book, bounds)
+        table = self._find_table(sheet, bounds)
+        if table:
+            start, first_column = table[1] + 1, table[2]
+        else:
+            start, first_column = bounds.first_row, bounds.first_column
+        height = len(values)
+        width = max((len(row) for row in values), default=0)
+        if insert_data_option == "INSERT_ROWS":
+            sheet["rows"][start - 1:start - 1] = [[] for _ in range(height)]
+            sheet["row_count"] += height
+        else:
+            sheet["row_count"] = max(sheet["row_count"], start + height - 1)
+        self._write(sheet, start, first_column, values, input_option)
+
+        updated = _Bounds(f"{_quote(bounds.title)}!{_column_letters(first_column)}{start}")
+        result = {"updates": {
+            "updatedRange": updated.a1(last_column=first_column + width - 1, last_row=start + height - 1),
+            "updatedRows": height,
+            "updatedColumns": width,
+            "updatedCells": sum(len(row) for row in values)
+        }}
+        if table:
+            found = _Bounds(f"{_quote(bounds.title)}!{_column_letters(table[2])}{table[0]}")
+            result["tableRange"] = found.a1(last_column=table[3], last_row=table[1])
+        return result
+
+    def _clear(self, book:dict, cell_range:str) -> str:
+        bounds = _Bounds(cell_range)
+        sheet = self._sheet(book, bounds)
+        last_row = min(bounds.last_row or len(sheet["rows"]), len(sheet["rows"]))
+        for row in sheet["rows"][bounds.first_row - 1:last_row]:
+            last_column = min(bounds.last_column or len(row), len(row))
+            for column in range(bounds.first_column - 1, last_column):
+                row[column] = None
+        return bounds.a1(last_row=bounds.last_row or sheet["row_count"])
+
+    @staticmethod
+    def _mask(result:dict, fields:str) -> dict:
+        """ Applies a top-level fields mask ("values", "valueRanges(values)" keeps valueRanges whole). """
+        if not fields:
+            return result
+        keep = {field.split("(")[0].strip() for field in re.split(r",(?![^(]*\))", fields)}
+        return {key: value for key, value in result.items() if key in keep}
@@ -4,13 +4,163 @@ Purpose:
 -   This session class is used specifically for interaction with Google Sheets.
 -   The class provides basic interaction methods, such as edit range, read range, and copy/paste.
 -   .env must be loaded in the script importing this client BEFORE importing this client.
+-   append_at_end writes after the data of a key column with values.append, without reading the sheet.
+-   update_range_chunked uploads large value matrices as row blocks, in parallel, retrying failed blocks alone.
+    Blocks that still fail are returned in ChunkedUploadError and can be resent alone with upload_blocks.
+-   Every API call goes through _execute: a token bucket per project (reads and writes) and per spreadsheet keeps
+    the process under the per-minute Sheets quotas, and 429 / 5xx responses are retried with exponential backoff
+    and jitter, honoring Retry-After. Waits and retries are counted in the metrics REGISTRY.
+-   batch_read / batch_write / batch_clear and the WriteBuffer send many ranges in a single API call.
+-   iter_range reads tall ranges in row windows (optionally several in flight) and yields padded rows one by one.
+-   sync_range (and WriteBuffer.sync_range) only writes the rows that differ from the sheet's current contents
+    and clears only the rows that were removed from the end.
+-   The Sheets service is built once per process (per credentials file and scopes) from the discovery
+    document bundled with googleapiclient, so creating a GoogleSession is only a cheap handle.
+-   Another spreadsheets() resource (ex: FakeSheets) can be passed as service=, or installed for every new session
+    with set_default_service, to run the services offline.
 """
 
+from common.Utils.Metrics import REGISTRY
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from email.utils import parsedate_to_datetime
 from google.oauth2 import service_account
 from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
+from googleapiclient.http import HttpRequest
+import google_auth_httplib2
+import httplib2
+import json
 import os
+import random
+import re
+import threading
+import time
+from datetime import date, datetime
+from decimal import Decimal
 
 REPO_ROOT = os.path.dirname(os.path.abspath(__file__))
+HTTP_TIMEOUT_SECS = 120
+
+# update_range_chunked block limits: the API rejects large request bodies, slow ones time out
+CHUNK_MAX_BYTES = 1_500_000
+CHUNK_MAX_ROWS = 10_000
+CHUNK_WORKERS = 4
+# iter_range window height
+ITER_WINDOW_ROWS = 5000
+
+# Sheets quotas are counted per minute, per project (reads and writes separately) and per user. One service
+# account is one user, so the defaults stay at the per-user quota. The buckets are per process: lower the rates
+# when several processes share the service account.
+PROJECT_READS_PER_MINUTE = float(os.getenv("GOOGLE_PROJECT_READS_PER_MINUTE", "60"))
+PROJECT_WRITES_PER_MINUTE = float(os.getenv("GOOGLE_PROJECT_WRITES_PER_MINUTE", "60"))
+SHEET_REQUESTS_PER_MINUTE = float(os.getenv("GOOGLE_SHEET_REQUESTS_PER_MINUTE", "60"))
+# sync_range: unchanged rows between two changed blocks rewritten rather than starting a new range
+SYNC_MERGE_GAP_ROWS = 3
+# sync_range reuses the contents it last wrote for this long instead of reading the range again
+SYNC_SNAPSHOT_SECS = float(os.getenv("GOOGLE_SYNC_SNAPSHOT_SECS", "300"))
+MAX_ATTEMPTS = int(os.getenv("GOOGLE_MAX_ATTEMPTS", "6"))
+BACKOFF_MAX_SECS = float(os.getenv("GOOGLE_BACKOFF_MAX_SECS", "64"))
+# statuses worth retrying (rate limited, server side errors)
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+GOOGLE_CALL_SECONDS = REGISTRY.histogram(
+    "google_sheets_call_seconds", "Google Sheets API call latency in seconds, retries included.", ("method",), timing="google")
+GOOGLE_THROTTLED_CALLS = REGISTRY.counter(
+    "google_sheets_throttled_calls", "Google Sheets calls delayed by the local rate limiter or retried after a 429 / 5xx.",
+    ("reason",))
+GOOGLE_WAIT_SECONDS = REGISTRY.counter(
+    "google_sheets_wait_seconds", "Seconds Google Sheets calls spent waiting on the rate limiter or backing off.",
+    ("reason",))
+GOOGLE_CALL_FAILURES = REGISTRY.counter(
+    "google_sheets_call_failures", "Google Sheets calls that failed after their last attempt.", ("method",))
+
+# (credentials path, scopes) -> (credentials, spreadsheets resource), shared by every session in the process
+_SERVICE_CACHE = {}
+_SERVICE_LOCK = threading.Lock()
+# spreadsheets() resource used by sessions created without service= (see set_default_service)
+_DEFAULT_SERVICE = None
+# rate limiter buckets by key ("project:<id>:read", "sheet:<id>", ...), shared by every session in the process
+_BUCKETS = {}
+_BUCKETS_LOCK = threading.Lock()
+
+
+class TokenBucket:
+    """
+    Token bucket refilled at rate_per_minute, holding at most one minute of tokens. take() reserves a token
+    and returns how long the caller must wait before using it, so waiting callers are served in order.
+    """
+
+    def __init__(self, rate_per_minute:float):
+        self._rate = rate_per_minute / 60.0
+        self._capacity = max(1.0, rate_per_minute)
+        self._tokens = self._capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def take(self) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self._capacity, self._tokens + (now - self._updated) * self._rate)
+            self._updated = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self._rate
+
+
+def _bucket(key:str, rate_per_minute:float) -> TokenBucket:
+    with _BUCKETS_LOCK:
+        bucket = _BUCKETS.get(key)
+        if bucket is None:
+            bucket = _BUCKETS[key] = TokenBucket(rate_per_minute)
+        return bucket
+
+
+# httplib2 connections are not thread safe: one keep-alive transport per thread (and credentials), reused by every call
+_HTTP_LOCAL = threading.local()
+
+
+def _thread_http(credentials) -> google_auth_httplib2.AuthorizedHttp:
+    """ Returns this thread's authorized HTTP transport for the credentials, creating it on first use. """
+    pool = getattr(_HTTP_LOCAL, 'pool', None)
+    if pool is None:
+        pool = _HTTP_LOCAL.pool = {}
+    http = pool.get(id(credentials))
+    if http is None:
+        http = pool[id(credentials)] = google_auth_httplib2.AuthorizedHttp(
+            credentials, http=httplib2.Http(timeout=HTTP_TIMEOUT_SECS))
+    return http
+
+
+def set_default_service(service) -> None:
+    """ Makes every GoogleSession created afterwards use service instead of the Google API. None restores the API. """
+    global _DEFAULT_SERVICE
+    _DEFAULT_SERVICE = service
+
+
+def get_project_id(service_account_file:str, scopes:list) -> str:
+    """ Returns the Google Cloud project of a cached service (the quota owner), or the credentials path if unknown. """
+    with _SERVICE_LOCK:
+        cached = _SERVICE_CACHE.get((service_account_file, tuple(scopes)))
+    if cached is None:
+        return service_account_file
+    return getattr(cached[0], "project_id", None) or service_account_file
+
+
+def get_sheets_service(service_account_file:str, scopes:list):
+    """ Returns the process-wide Sheets spreadsheets() resource for a credentials file and scopes, building it once. """
+    key = (service_account_file, tuple(scopes))
+    with _SERVICE_LOCK:
+        cached = _SERVICE_CACHE.get(key)
+        if cached is None:
+            creds = service_account.Credentials.from_service_account_file(service_account_file, scopes=scopes)
+
+            def _build_request(http, *args, **kwargs):
+                # every request runs on the calling thread's pooled transport
+                return HttpRequest(_thread_http(creds), *args, **kwargs)
+
+            service = build('sheets', 'v4', http=_thread_http(creds), requestBuilder=_build_request,
+                            static_discovery=True, cache_discovery=False)
+            cached = _SERVICE_CACHE[key] = (creds, service.spreadsheets())
+        return cached[1]
 
 class GoogleApiException(Exception):
     """
@@ -18,70 +168,596 @@ class GoogleApiException(Exception):
     """
     pass
 
+class ChunkedUploadError(GoogleApiException):
+    """
+    Raised by upload_blocks / update_range_chunked when blocks still fail after their retries.
+    failed maps the start cell of each failed block to its values (pass it to upload_blocks to resume),
+    errors maps it to the error, written lists the start cells of the blocks that were written.
+    """
+
+    def __init__(self, sheet_name, failed:dict, errors:dict, written:list):
+        self.sheet_name = sheet_name
+        self.failed = failed
+        self.errors = errors
+        self.written = written
+        details = "; ".join(f"{sheet_name}!{cell}: {error}" for cell, error in errors.items())
+        super().__init__(f"{len(failed)} of {len(failed) + len(written)} blocks failed to upload ({details}). "
+                         f"{len(written)} blocks were written. ")
+
+class SheetCapacityError(GoogleApiException):
+    """
+    Raised by append_at_end when the appended rows would go past the last usable row.
+    """
+    pass
+
+# start column and row of a cell range such as "F3:H" or "A:R"
+_A1_START = re.compile(r"^([A-Z]+)(\d*)")
+# start column, start row, end column and end row of a cell range such as "F3:H"
+_A1_RANGE = re.compile(r"^([A-Z]+)(\d*)(?::([A-Z]+)(\d*))?$")
+
+
+def _column_number(letters:str) -> int:
+    number = 0
+    for letter in letters:
+        number = number * 26 + ord(letter) - 64
+    return number
+
+
+def _column_letters(number:int) -> str:
+    letters = ""
+    while number > 0:
+        number, remainder = divmod(number - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+
+# USER_ENTERED numbers: optional sign and currency sign, thousands separators, decimals, exponent, percent
+_ENTERED_NUMBER = re.compile(r"^([+-]?)\$?((?:\d{1,3}(?:,\d{3})+|\d*)(?:\.\d+)?(?:[eE][+-]?\d+)?)(%?)$")
+_ENTERED_DATE_FORMATS = ("%m/%d/%Y", "%m/%d/%y", "%Y-%m-%d", "%m/%d/%Y %H:%M:%S", "%m/%d/%Y %H:%M",
+                         "%m/%d/%Y %I:%M:%S %p", "%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M")
+# day 0 of the Sheets date serial numbers
+_SERIAL_EPOCH = datetime(1899, 12, 30)
+# stands for a written formula, which never equals the value read back
+_FORMULA = object()
+
+
+def _number(value:float):
+    value = round(float(value), 10)
+    return int(value) if value.is_integer() else value
+
+
+def _entered_value(value):
+    """
+    The typed value a cell holds once value is written with USER_ENTERED, as values.get returns it with
+    UNFORMATTED_VALUE and SERIAL_NUMBER dates: numbers (with separators, currency or percent), booleans and
+    dates are parsed, a leading apostrophe keeps the text as is. Formulas give _FORMULA.
+    """
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float, Decimal)):
+        return _number(value)
+    if isinstance(value, datetime):
+        return _number((value - _SERIAL_EPOCH).total_seconds() / 86400)
+    if isinstance(value, date):
+        return _number((value - _SERIAL_EPOCH.date()).days)
+    text = str(value)
+    if text.startswith("'"):
+        return text[1:]
+    if text.startswith("="):
+        return _FORMULA
+    stripped = text.strip()
+    if stripped.upper() in ("TRUE", "FALSE"):
+        return stripped.upper() == "TRUE"
+    match = _ENTERED_NUMBER.match(stripped)
+    if match and match.group(2) not in ("", "."):
+        number = float(match.group(2).replace(",", "")) * (-1 if match.group(1) == "-" else 1)
+        return _number(number / 100 if match.group(3) else number)
+    for date_format in _ENTERED_DATE_FORMATS:
+        try:
+            return _entered_value(datetime.strptime(stripped, date_format))
+        except ValueError:
+            continue
+    return text
+
+
+def _read_value(value):
+    """ A cell read with UNFORMATTED_VALUE, in the same form as _entered_value. """
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return _number(value)
+    return value
+
+
+def _pad(row:list, width:int, fill="") -> list:
+    return list(row) + [fill] * (width - len(row))
+
+
+def split_rows(values:list, max_bytes:int=CHUNK_MAX_BYTES, max_rows:int=CHUNK_MAX_ROWS) -> list:
+    """ Splits a value matrix into consecutive row blocks of at most max_rows rows and about max_bytes of JSON. """
+    blocks = []
+    block = []
+    size = 0
+    for row in values:
+        row_size = len(json.dumps(row, default=str)) + 1
+        if block and (size + row_size > max_bytes or len(block) >= max_rows):
+            blocks.append(block)
+            block = []
+            size = 0
+        block.append(row)
+        size += row_size
+    if block:
+        blocks.append(block)
+    return blocks
+
+
+def _retry_after(error:Exception):
+    """ Seconds asked for by a Retry-After header (delay or HTTP date), None when absent. """
+    value = error.resp.get("retry-after") if isinstance(error, HttpError) else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
 class GoogleSession:
     """
     Google API Session Class. Used to initialize the sheet, and session instance. 
     """
 
-    def __init__(self, sheet_id:str):
+    def __init__(self, sheet_id:str, service=None, rate_limit:bool=True):
+        """
+        service: a spreadsheets() resource to use instead of the Google API (ex: FakeSheets), defaults to the one
+        installed with set_default_service. rate_limit=False skips the local token buckets (not the retries).
+        """
         self._SCOPES = [os.getenv("GOOGLE_SERVICE_SCOPES")]
         self._SERVICE_ACCOUNT_FILE = os.getenv("GOOGLE_CREDENTIALS_PATH")
         self._SHEET_ID = sheet_id
-        self._SHEET_SERVICE = self._get_sheets_service()
-        
+        self._RATE_LIMIT = rate_limit
+        service = service or _DEFAULT_SERVICE
+        if service is not None:
+            self._SHEET_SERVICE = service
+            self._PROJECT_ID = getattr(service, "project_id", "injected")
+        else:
+            self._SHEET_SERVICE = self._get_sheets_service()
+            self._PROJECT_ID = get_project_id(self._SERVICE_ACCOUNT_FILE, self._SCOPES)
+        # (sheet_name, cell_range) -> (monotonic time, rows as typed values) last written by sync_range
+        self._snapshots = {}
+
+    def _throttle(self, kind:str) -> None:
+        """ Waits for a token of the project (reads or writes) and of this spreadsheet. """
+        if not self._RATE_LIMIT:
+            return
+        if kind == "read":
+            project = _bucket(f"project:{self._PROJECT_ID}:read", PROJECT_READS_PER_MINUTE)
+        else:
+            project = _bucket(f"project:{self._PROJECT_ID}:write", PROJECT_WRITES_PER_MINUTE)
+        sheet = _bucket(f"sheet:{self._SHEET_ID}", SHEET_REQUESTS_PER_MINUTE)
+        wait = max(project.take(), sheet.take())
+        if wait > 0:
+            GOOGLE_THROTTLED_CALLS.inc(reason="rate_limit")
+            GOOGLE_WAIT_SECONDS.inc(wait, reason="rate_limit")
+            time.sleep(wait)
+
+    def _execute(self, request, method:str, kind:str = "write", idempotent:bool = True) -> dict:
+        """
+        Executes an API request within the rate limits. 429 responses, and for idempotent requests 5xx and
+        network errors, are retried up to MAX_ATTEMPTS times with exponential backoff and jitter, or after
+        the Retry-After delay when the response has one. Appends are not idempotent: a 5xx may have applied.
+        """
+        with GOOGLE_CALL_SECONDS.time(method=method):
+            for attempt in range(1, MAX_ATTEMPTS + 1):
+                self._throttle(kind)
+                try:
+                    return request.execute()
+                except Exception as e:
+                    if isinstance(e, HttpError):
+                        retryable = e.resp.status == 429 or (idempotent and e.resp.status in RETRY_STATUSES)
+                    else:
+                        retryable = idempotent and isinstance(e, (OSError, httplib2.HttpLib2Error))
+                    if not retryable or attempt == MAX_ATTEMPTS:
+                        GOOGLE_CALL_FAILURES.inc(method=method)
+                        raise
+                    delay = _retry_after(e)
+                    if delay is None:
+                        delay = min(BACKOFF_MAX_SECS, 2 ** attempt) * random.uniform(0.5, 1)
+                    GOOGLE_THROTTLED_CALLS.inc(reason="retry")
+                    GOOGLE_WAIT_SECONDS.inc(delay, reason="backoff")
+                    time.sleep(delay)
 
     def _get_sheets_service(self):
-        """ Authenticates and returns the Google Sheets service client on session init. """
-        creds = service_account.Credentials.from_service_account_file(self._SERVICE_ACCOUNT_FILE, scopes=self._SCOPES)
-        service = build('sheets', 'v4', credentials=creds)
-        return service.spreadsheets()
+        """ Returns the shared Google Sheets service client (built on first use in the process). """
+        return get_sheets_service(self._SERVICE_ACCOUNT_FILE, self._SCOPES)
+
+    @staticmethod
+    def _a1(cell_range) -> str:
+        """ A1 notation for a (sheet_name, cell_range) tuple. Strings are taken as full A1 ranges ("Sheet!A1:B2"). """
+        if isinstance(cell_range, str):
+            return cell_range
+        sheet_name, cells = cell_range
+        return f"{sheet_name}!{cells}"
 
     def clear_range(self, sheet_name, cell_range) -> None:
         """ Clears the specified cell range in a sheet. """
-        self._SHEET_SERVICE.values().clear(
+        self._execute(self._SHEET_SERVICE.values().clear(
             spreadsheetId=self._SHEET_ID,
             range=f"{sheet_name}!{cell_range}"
-        ).execute()
+        ), "clear")
 
     def update_range(self, sheet_name, cell_range, values) -> None:
         """ Updates (overwrites) a cell range with provided values. """
-        self._SHEET_SERVICE.values().update(
+        self._execute(self._SHEET_SERVICE.values().update(
             spreadsheetId=self._SHEET_ID,
             range=f"{sheet_name}!{cell_range}",
             valueInputOption="USER_ENTERED",
             body={"values": values}
-        ).execute()
+        ), "update")
 
     def append_rows(self, sheet_name, start_cell, values):
         """ Appends rows to a specified start location. """
-        self._SHEET_SERVICE.values().append(
+        self._execute(self._SHEET_SERVICE.values().append(
             spreadsheetId=self._SHEET_ID,
             range=f"{sheet_name}!{start_cell}",
             valueInputOption="USER_ENTERED",
             insertDataOption="INSERT_ROWS",
             body={"values": values}
-        ).execute()
+        ), "append", idempotent=False)
 
     def read_range(self, sheet_name, cell_range):
         """ Reads and returns values from the specified range. """
 
-        result = self._SHEET_SERVICE.values().get(
+        result = self._execute(self._SHEET_SERVICE.values().get(
             spreadsheetId=self._SHEET_ID,
             range=f"{sheet_name}!{cell_range}"
-        ).execute()
+        ), "get", "read")
         return result.get('values', [])
     
     def copy_range(self, source_range, dest_range):
         """ Copies data from one range to another (basic manual copy). """
-        values = self._SHEET_SERVICE.values().get(
+        values = self._execute(self._SHEET_SERVICE.values().get(
             spreadsheetId=self._SHEET_ID,
             range=source_range
-        ).execute().get('values', [])
+        ), "get", "read").get('values', [])
 
-        self._SHEET_SERVICE.values().update(
+        self._execute(self._SHEET_SERVICE.values().update(
             spreadsheetId=self._SHEET_ID,
             range=dest_range,
             valueInputOption="USER_ENTERED",
             body={"values": values}
-        ).execute()
-        
\ No newline at end of file
+        ), "update")
+        
+    def _append_block(self, sheet_name, cell_range, values) -> int:
+        """ values.append of one block after the data of cell_range's column. Returns the first row written. """
+        result = self._execute(self._SHEET_SERVICE.values().append(
+            spreadsheetId=self._SHEET_ID,
+            range=f"{sheet_name}!{cell_range}",
+            valueInputOption="USER_ENTERED",
+            insertDataOption="OVERWRITE",
+            body={"values": values}
+        ), "append", idempotent=False)
+        return int(_A1_START.match(result["updates"]["updatedRange"].rpartition("!")[2]).group(2))
+
+    def append_at_end(self, sheet_name, cell_range, values, last_row:int=None) -> dict:
+        """
+        Writes values right after the data of cell_range (ex: "A:R") without reading the sheet: values.append
+        on the first column finds the end of the data and its updatedRange gives the rows written. The first
+        column must be filled on every data row, with no blank rows in between (the API appends after the first
+        block of filled rows). Rows are overwritten, not inserted, so pre-allocated rows and formulas below stay
+        put, and the sheet grows when it runs out of rows.
+        Large payloads are appended in blocks (split_rows), one after the other. When the rows end past last_row,
+        or a block fails, the written rows are cleared again before SheetCapacityError / GoogleApiException is
+        raised, so a rerun does not duplicate rows.
+        Returns {'updated_range', 'start_row', 'end_row'}, or None when there is nothing to write.
+        """
+        if not values:
+            return None
+        match = _A1_RANGE.match(cell_range)
+        if not match:
+            raise GoogleApiException(f"Unable to append to range {cell_range}: expected a range like A:R. ")
+        start_column = match.group(1)
+        column_range = f"{start_column}{match.group(2) or 1}:{start_column}"
+        blocks = split_rows(values)
+        start_row = self._append_block(sheet_name, column_range, blocks[0])
+        end_row = start_row + len(values) - 1
+        end_column = _column_letters(_column_number(start_column) + max(len(row) for row in values) - 1)
+        updated_range = f"{start_column}{start_row}:{end_column}{end_row}"
+
+        def _roll_back(message:str, cause:Exception, error_type=GoogleApiException):
+            # a partial append would be appended after (and duplicated) next run
+            try:
+                self.clear_range(sheet_name, updated_range)
+            except Exception as clear_error:
+                raise GoogleApiException(f"{message}Clearing them failed, rows {start_row}-{end_row} of {sheet_name} "
+                                         f"are partially written and must be cleared by hand: {clear_error} ") from cause
+            raise error_type(f"{message}The written rows ({start_row}-{end_row}) were cleared again. ") from cause
+
+        if last_row is not None and end_row > last_row:
+            _roll_back(f"Not enough rows in {sheet_name}: the data needs rows {start_row}-{end_row} but the last "
+                       f"usable row is {last_row}. Add at least {end_row - last_row} more rows. ", None, SheetCapacityError)
+        row = start_row + len(blocks[0])
+        for block in blocks[1:]:
+            try:
+                written = self._append_block(sheet_name, column_range, block)
+            except Exception as e:
+                _roll_back(f"Appending rows {row}-{row + len(block) - 1} of {sheet_name} failed: {e}. ", e)
+            if written != row:
+                _roll_back(f"Rows were added to {sheet_name} during the append (block expected at row {row}, "
+                           f"written at {written}). ", None)
+            row += len(block)
+        return {'updated_range': f"{sheet_name}!{updated_range}", 'start_row': start_row, 'end_row': end_row}
+
+    def update_range_chunked(self, sheet_name, cell_range, values, max_workers:int=CHUNK_WORKERS,
+                             max_bytes:int=CHUNK_MAX_BYTES, max_rows:int=CHUNK_MAX_ROWS, on_progress=None) -> dict:
+        """
+        Overwrites a large value matrix starting at the first cell of cell_range (ex: "A5" or "F3:H"), split
+        into row blocks that stay under the API payload limits and uploaded by upload_blocks.
+        Returns {'blocks', 'rows'}, raises ChunkedUploadError (with the failed blocks) if any block still fails.
+        """
+        match = _A1_START.match(cell_range)
+        if not match:
+            raise GoogleApiException(f"Unable to find the start cell of range {cell_range}. ")
+        column, first_row = match.group(1), int(match.group(2) or 1)
+
+        blocks = {}
+        row = first_row
+        for block in split_rows(values, max_bytes, max_rows):
+            blocks[f"{column}{row}"] = block
+            row += len(block)
+        return self.upload_blocks(sheet_name, blocks, max_workers, on_progress)
+
+    def upload_blocks(self, sheet_name, blocks:dict, max_workers:int=CHUNK_WORKERS, on_progress=None) -> dict:
+        """
+        Writes {start_cell: values} blocks with up to max_workers threads. A block that fails with a rate limit or
+        server error is retried on its own with backoff (_execute). on_progress(blocks_done, blocks_total, rows_done)
+        is called after every written block. If blocks still fail, ChunkedUploadError is raised: its failed
+        blocks can be passed to upload_blocks again without resending the written ones.
+        Returns {'blocks', 'rows'}.
+        """
+        progress = {'blocks': 0, 'rows': 0}
+        progress_lock = threading.Lock()
+
+        def _upload(start_cell, block):
+            self.update_range(sheet_name, start_cell, block)
+            with progress_lock:
+                progress['blocks'] += 1
+                progress['rows'] += len(block)
+                if on_progress:
+                    on_progress(progress['blocks'], len(blocks), progress['rows'])
+
+        errors = {}
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(blocks) or 1))) as executor:
+            futures = {executor.submit(_upload, start_cell, block): start_cell for start_cell, block in blocks.items()}
+            for future in as_completed(futures):
+                if future.exception() is not None:
+                    errors[futures[future]] = future.exception()
+        if errors:
+            raise ChunkedUploadError(sheet_name, {cell: blocks[cell] for cell in errors}, errors,
+                                     [cell for cell in blocks if cell not in errors])
+        return {'blocks': len(blocks), 'rows': progress['rows']}
+
+    def batch_read(self, ranges:list, unformatted:bool=False) -> list:
+        """
+        Reads several (sheet_name, cell_range) ranges in one values.batchGet call. Returns their values in the same order.
+        unformatted=True returns typed values (numbers, booleans, dates as serial numbers) instead of the displayed text.
+        """
+        render = {"valueRenderOption": "UNFORMATTED_VALUE", "dateTimeRenderOption": "SERIAL_NUMBER"} if unformatted else {}
+        result = self._execute(self._SHEET_SERVICE.values().batchGet(
+            spreadsheetId=self._SHEET_ID,
+            ranges=[self._a1(cell_range) for cell_range in ranges],
+            **render
+        ), "batchGet", "read")
+        return [value_range.get('values', []) for value_range in result.get('valueRanges', [])]
+
+    def batch_write(self, updates:dict) -> None:
+        """ Overwrites several ranges in one values.batchUpdate call. updates maps (sheet_name, cell_range) to values. """
+        if not updates:
+            return
+        self._execute(self._SHEET_SERVICE.values().batchUpdate(
+            spreadsheetId=self._SHEET_ID,
+            body={
+                "valueInputOption": "USER_ENTERED",
+                "data": [{"range": self._a1(cell_range), "values": values} for cell_range, values in updates.items()]
+            }
+        ), "batchUpdate")
+
+    def batch_clear(self, ranges:list) -> None:
+        """ Clears several (sheet_name, cell_range) ranges in one values.batchClear call. """
+        if not ranges:
+            return
+        self._execute(self._SHEET_SERVICE.values().batchClear(
+            spreadsheetId=self._SHEET_ID,
+            body={"ranges": [self._a1(cell_range) for cell_range in ranges]}
+        ), "batchClear")
+
+    def _row_count(self, sheet_name) -> int:
+        """ Number of rows in the grid of a sheet (filled or not). """
+        result = self._execute(self._SHEET_SERVICE.get(
+            spreadsheetId=self._SHEET_ID,
+            fields="sheets.properties(title,gridProperties.rowCount)"
+        ), "get", "read")
+        for sheet in result.get("sheets", []):
+            if sheet["properties"]["title"] == sheet_name:
+                return sheet["properties"]["gridProperties"]["rowCount"]
+        raise GoogleApiException(f"Sheet {sheet_name} was not found in spreadsheet {self._SHEET_ID}. ")
+
+    def iter_range(self, sheet_name, cell_range, width:int=None, window_rows:int=ITER_WINDOW_ROWS,
+                   max_workers:int=1, fields:str="values"):
+        """
+        Yields the rows of cell_range (ex: "D4:H") one by one, read window_rows rows per values.get call so
+        memory stays bounded by the windows in flight (max_workers of them, read in parallel). Rows are padded
+        with '' to width, or to the width of the range when it has an end column. Blank rows between filled ones
+        are yielded, blank rows at the end are not (like read_range). fields is the response field mask.
+        A range without an end row costs one more call (the sheet's row count), so iter_range is for ranges too
+        tall to read at once: small ones are cheaper through read_range or batch_read.
+        """
+        match = _A1_RANGE.match(cell_range)
+        if not match or not match.group(3):
+            raise GoogleApiException(f"Unable to iterate range {cell_range}: expected a range like D4:H. ")
+        start_column, end_column = match.group(1), match.group(3)
+        first_row = int(match.group(2) or 1)
+        last_row = int(match.group(4)) if match.group(4) else self._row_count(sheet_name)
+        width = width or _column_number(end_column) - _column_number(start_column) + 1
+
+        def _read(window_start):
+            window_end = min(window_start + window_rows - 1, last_row)
+            result = self._execute(self._SHEET_SERVICE.values().get(
+                spreadsheetId=self._SHEET_ID,
+                range=f"{sheet_name}!{start_column}{window_start}:{end_column}{window_end}",
+                fields=fields
+            ), "get", "read")
+            return result.get("values", []), window_end - window_start + 1
+
+        windows = iter(range(first_row, last_row + 1, window_rows))
+        blank_rows = 0
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            in_flight = [executor.submit(_read, start) for _, start in zip(range(max(1, max_workers)), windows)]
+            while in_flight:
+                rows, window_size = in_flight.pop(0).result()
+                next_window = next(windows, None)
+                if next_window is not None:
+                    in_flight.append(executor.submit(_read, next_window))
+                for row in rows:
+                    for _ in range(blank_rows):
+                        yield [""] * width
+                    blank_rows = 0
+                    yield _pad(row, width)
+                blank_rows += window_size - len(rows)
+
+    def sync_range(self, sheet_name, cell_range, values) -> dict:
+        """
+        Makes cell_range (ex: "F3:H") hold exactly values, writing only what changed: the current contents are
+        read once (or taken from the snapshot of the last sync of the range, see SYNC_SNAPSHOT_SECS), changed
+        rows are sent as blocks in one values.batchUpdate and rows removed from the end in one values.batchClear.
+        Returns {'rows_written', 'blocks', 'rows_cleared'}.
+        """
+        buffer = self.write_buffer()
+        buffer.sync_range(sheet_name, cell_range, values)
+        return buffer.flush()[(sheet_name, cell_range)]
+
+    def _plan_sync(self, ranges:dict) -> tuple:
+        """
+        Diffs each (sheet_name, cell_range) -> values of ranges against the sheet, reading the ranges without a
+        fresh snapshot in one values.batchGet. Cells are compared as typed values (UNFORMATTED_VALUE against the
+        new values parsed like USER_ENTERED), so display formats and rounding do not hide or fake a change.
+        Returns (clears, updates, snapshots, stats).
+        """
+        now = time.monotonic()
+        stale = [key for key in ranges if key not in self._snapshots or now - self._snapshots[key][0] > SYNC_SNAPSHOT_SECS]
+        current = dict(zip(stale, self.batch_read(stale, unformatted=True))) if stale else {}
+
+        clears, updates, snapshots, stats = [], {}, {}, {}
+        for key, values in ranges.items():
+            sheet_name, cell_range = key
+            old = current[key] if key in current else self._snapshots[key][1]
+            match = _A1_RANGE.match(cell_range)
+            if not match:
+                raise GoogleApiException(f"Unable to sync range {cell_range}: expected a range like F3:H. ")
+            start_column, first_row = match.group(1), int(match.group(2) or 1)
+            if match.group(3):
+                width = _column_number(match.group(3)) - _column_number(start_column) + 1
+            else:
+                width = max((len(row) for row in list(old) + list(values)), default=1)
+            end_column = _column_letters(_column_number(start_column) + width - 1)
+
+            if key in current:
+                old_typed = [_pad([_read_value(cell) for cell in row], width) for row in old]
+            else:
+                old_typed = old
+            new_typed = [_pad([_entered_value(cell) for cell in row], width) for row in values]
+            changed = [i for i in range(len(values)) if i >= len(old_typed) or new_typed[i] != old_typed[i]
+                       or _FORMULA in new_typed[i]]
+
+            # changed rows as [first, last] index runs, close runs merged
+            blocks = []
+            for i in changed:
+                if blocks and i - blocks[-1][1] <= SYNC_MERGE_GAP_ROWS + 1:
+                    blocks[-1][1] = i
+                else:
+                    blocks.append([i, i])
+            for first, last in blocks:
+                # short rows are padded so cells emptied since the last run are cleared too
+                updates[(sheet_name, f"{start_column}{first_row + first}")] = [_pad(row, width) for row in values[first:last + 1]]
+            if len(old) > len(values):
+                clears.append((sheet_name, f"{start_column}{first_row + len(values)}:{end_column}{first_row + len(old) - 1}"))
+
+            snapshots[key] = new_typed
+            stats[key] = {
+                'rows_written': sum(last - first + 1 for first, last in blocks),
+                'blocks': len(blocks),
+                'rows_cleared': max(0, len(old) - len(values))
+            }
+        return clears, updates, snapshots, stats
+
+    def write_buffer(self) -> 'WriteBuffer':
+        """ Returns a WriteBuffer collecting clears and updates for this sheet. """
+        return WriteBuffer(self)
+
+
+class WriteBuffer:
+    """
+    Collects clear_range / update_range / sync_range calls and sends them as one values.batchClear followed by
+    one values.batchUpdate, so clears always apply before updates. Synced ranges are read first (one
+    values.batchGet) and only add their changed rows and removed trailing rows. As a context manager it
+    flushes on exit, unless the block raised (then nothing is sent).
+    """
+
+    def __init__(self, session:GoogleSession):
+        self._session = session
+        self._clears = []
+        self._updates = {}
+        self._syncs = {}
+
+    def clear_range(self, sheet_name, cell_range) -> None:
+        self._clears.append((sheet_name, cell_range))
+
+    def update_range(self, sheet_name, cell_range, values) -> None:
+        """ Queues an update. A later update of the same range replaces the earlier one. """
+        self._updates[(sheet_name, cell_range)] = values
+
+    def sync_range(self, sheet_name, cell_range, values) -> None:
+        """ Queues a GoogleSession.sync_range: the range ends up holding exactly values. """
+        self._syncs[(sheet_name, cell_range)] = values
+
+    def pending(self) -> int:
+        """ Number of queued clears, updates and syncs. """
+        return len(self._clears) + len(self._updates) + len(self._syncs)
+
+    def flush(self) -> dict:
+        """ Sends the queued clears, then the queued updates. Returns the sync_range stats by (sheet_name, cell_range). """
+        clears, updates, syncs = self._clears, self._updates, self._syncs
+        self.discard()
+        snapshots, stats = {}, {}
+        if syncs:
+            sync_clears, sync_updates, snapshots, stats = self._session._plan_sync(syncs)
+            clears = clears + sync_clears
+            updates = {**updates, **sync_updates}
+        try:
+            self._session.batch_clear(clears)
+            self._session.batch_write(updates)
+        except Exception:
+            # the synced ranges may be half written, read them again next time
+            for key in syncs:
+                self._session._snapshots.pop(key, None)
+            raise
+        now = time.monotonic()
+        self._session._snapshots.update({key: (now, rows) for key, rows in snapshots.items()})
+        return stats
+
+    def discard(self) -> None:
+        self._clears = []
+        self._updates = {}
+        self._syncs = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.flush()
+        else:
+            self.discard()
+        return False
@@ -0,0 +1,266 @@
+"""
+Docstring for Common.Utils.Metrics
+Purpose:
+-   This file provides lightweight, dependency free metric primitives (counters, gauges and histograms) that can be
+    rendered in the Prometheus text exposition format.
+-   Clients in the common library record into the process wide REGISTRY, applications expose it with render_metrics().
+-   Metrics are in-process only. Each process keeps (and exposes) its own values.
+-   Histograms created with a timing name also feed the per-thread timing collector (start_timings/stop_timings),
+    which lets a web server break a single request down by where the time went (data layer, Fishbowl, ...).
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+# seconds, tuned for API calls that range from a few ms to several minutes.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+# bytes, for payload/file size histograms.
+BYTE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+_TIMINGS = threading.local()
+
+
+def start_timings() -> None:
+    """ Starts collecting named timings for the current thread (e.g. for the duration of a web request). """
+    _TIMINGS.current = {}
+
+
+def stop_timings() -> dict:
+    """ Stops collecting for the current thread and returns {timing name: total seconds}. """
+    current = getattr(_TIMINGS, "current", None)
+    _TIMINGS.current = None
+    return current or {}
+
+
+def record_timing(name:str, seconds:float) -> None:
+    """ Adds time to a named timing on the current thread. No-op when the thread is not collecting. """
+    current = getattr(_TIMINGS, "current", None)
+    if current is not None:
+        current[name] = current.get(name, 0.0) + seconds
+
+
+def _format_labels(labels:dict) -> str:
+    """ Formats a label dict as {key="value",...} with the values escaped. Returns '' for no labels. """
+    if not labels:
+        return ""
+    pairs = []
+    for key, value in labels.items():
+        value = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        pairs.append(f'{key}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+def _format_value(value:float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    """ Base class for a named metric with a fixed set of label names. """
+    metric_type = "untyped"
+
+    def __init__(self, name:str, documentation:str, labelnames:tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def spec(self) -> tuple:
+        """ What a second registration under the same name has to match: the type and the label names. """
+        return (self.metric_type, self.labelnames)
+
+    def _key(self, labels:dict) -> tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels(self, key:tuple, **extra) -> dict:
+        labels = dict(zip(self.labelnames, key))
+        labels.update(extra)
+        return labels
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values = {}
+
+    @property
+    def exposed_name(self) -> str:
+        return self.name
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.exposed_name} {self.documentation}", f"# TYPE {self.exposed_name} {self.metric_type}"]
+        with self._lock:
+            lines.extend(self._render_samples())
+        return lines
+
+    def _render_samples(self) -> list[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """
+    A monotonically increasing counter. Rendered with the conventional '_total' suffix.
+    """
+    metric_type = "counter"
+
+    @property
+    def exposed_name(self) -> str:
+        return f"{self.name}_total"
+
+    def inc(self, amount:float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, **labels) -> float:
+        """ Returns the current value for a label set (0 if never incremented). """
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def _render_samples(self) -> list[str]:
+        return [f"{self.exposed_name}{_format_labels(self._labels(key))} {_format_value(value)}"
+                for key, value in self._values.items()]
+
+
+class Gauge(_Metric):
+    """
+    A value that can go up and down (queue depth, last run timestamp...).
+    """
+    metric_type = "gauge"
+
+    def set(self, value:float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount:float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount:float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def get(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def _render_samples(self) -> list[str]:
+        return [f"{self.name}{_format_labels(self._labels(key))} {_format_value(value)}"
+                for key, value in self._values.items()]
+
+
+class Histogram(_Metric):
+    """
+    A cumulative histogram with fixed upper bounds. Use observe() directly or time() as a context manager.
+    """
+    metric_type = "histogram"
+
+    def __init__(self, name:str, documentation:str, labelnames:tuple = (), buckets:tuple = DEFAULT_BUCKETS,
+                 timing:str = None):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self.timing = timing
+
+    def spec(self) -> tuple:
+        return super().spec() + (self.buckets, self.timing)
+
+    def observe(self, value:float, **labels) -> None:
+        key = self._key(labels)
+        if self.timing:
+            record_timing(self.timing, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+                self._values[key] = state
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state["counts"][index] += 1
+                    break
+            state["sum"] += value
+            state["count"] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """ Observes the wall time spent inside the with block, including when it raises. """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def summary(self, **labels) -> dict:
+        """ Returns {count, sum} for a label set, useful for status endpoints. """
+        with self._lock:
+            state = self._values.get(self._key(labels))
+            if state is None:
+                return {"count": 0, "sum": 0.0}
+            return {"count": state["count"], "sum": state["sum"]}
+
+    def _render_samples(self) -> list[str]:
+        lines = []
+        for key, state in self._values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, state["counts"]):
+                cumulative += count
+                labels = self._labels(key, le=_format_value(bound))
+                lines.append(f"{self.name}_bucket{_format_labels(labels)} {cumulative}")
+            labels = _format_labels(self._labels(key))
+            lines.append(f"{self.name}_sum{labels} {_format_value(state['sum'])}")
+            lines.append(f"{self.name}_count{labels} {state['count']}")
+        return lines
+
+
+class Registry:
+    """
+    Holds every metric in the process. Registering the same name twice returns the existing metric
+    so modules can be imported (or reloaded) in any order; a second registration with another type, other
+    label names, buckets or timing raises ValueError instead of handing back a metric it does not describe.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def _register(self, cls, name:str, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            candidate = cls(name, *args, **kwargs)
+            if metric is None:
+                metric = candidate
+                self._metrics[name] = metric
+            elif metric.spec() != candidate.spec():
+                raise ValueError(f"Metric {name} is already registered as {metric.spec()}, not {candidate.spec()}")
+            return metric
+
+    def counter(self, name:str, documentation:str, labelnames:tuple = ()) -> Counter:
+        return self._register(Counter, name, documentation, labelnames)
+
+    def gauge(self, name:str, documentation:str, labelnames:tuple = ()) -> Gauge:
+        return self._register(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name:str, documentation:str, labelnames:tuple = (), buckets:tuple = DEFAULT_BUCKETS,
+                  timing:str = None) -> Histogram:
+        return self._register(Histogram, name, documentation, labelnames, buckets, timing)
+
+    def render(self) -> str:
+        """ Renders every registered metric in the Prometheus text exposition format (version 0.0.4). """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def render_metrics() -> str:
+    """ Renders the process wide registry. """
+    return REGISTRY.render()